@@ -0,0 +1,95 @@
+# benchmarks/serialization.py
+"""
+Payload size and encode/decode time of the wire codecs for GeoResponse-shaped
+trips of increasing size (the geo_api -> orchestrator -> map_api hop).
+
+    python -m benchmarks.serialization --landmarks 20 200 2000 --repeat 200
+"""
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from common.serialization import JSON_CODEC, MSGPACK_CODEC, STDLIB_JSON_CODEC, Codec
+
+CITY_NAMES = ["Paris", "Lyon", "Marseille", "Nice", "Bordeaux", "Toulouse", "Strasbourg", "Lille"]
+MODES = ["train", "car", "bus", "flight", "boat"]
+
+
+def _entity(rng: random.Random, name: str, kind: str) -> Dict[str, Any]:
+    return {"name": name, "lat": rng.uniform(42.0, 51.0), "lon": rng.uniform(-4.5, 8.0), "type": kind}
+
+
+def build_trip(landmarks: int, seed: int = 42) -> Dict[str, Any]:
+    """A GeoResponse dict with `landmarks` landmarks and hotels/roads in proportion"""
+    rng = random.Random(seed)
+    cities = [_entity(rng, name, "city") for name in CITY_NAMES]
+    segments = [
+        {"from_city": a, "to_city": b, "mode": rng.choice(MODES),
+         "duration": f"{rng.randint(1, 9)} hours", "notes": "Scenic route along the river"}
+        for a, b in zip(cities, cities[1:])
+    ]
+    lats = [c["lat"] for c in cities]
+    lons = [c["lon"] for c in cities]
+    return {
+        "cities": cities,
+        "landmarks": [_entity(rng, f"Landmark {i} of {rng.choice(CITY_NAMES)}", "landmark") for i in range(landmarks)],
+        "hotels": [_entity(rng, f"Hôtel {i}", "hotel") for i in range(max(1, landmarks // 4))],
+        "roads": [_entity(rng, f"Route D{i}", "road") for i in range(max(1, landmarks // 10))],
+        "transport_segments": segments,
+        "bounding_box": {"min_lat": min(lats), "max_lat": max(lats), "min_lon": min(lons), "max_lon": max(lons)},
+        "warnings": None,
+    }
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> float:
+    """Best-of-5 mean seconds per call"""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best
+
+
+def codecs() -> List[Codec]:
+    # The stdlib baseline is always measured, even when orjson replaces it on the wire
+    result = [STDLIB_JSON_CODEC]
+    if JSON_CODEC is not STDLIB_JSON_CODEC:
+        result.append(JSON_CODEC)
+    if MSGPACK_CODEC:
+        result.append(MSGPACK_CODEC)
+    return result
+
+
+def run(landmark_counts: List[int], repeat: int) -> List[Tuple[int, str, int, float, float]]:
+    rows = []
+    for count in landmark_counts:
+        trip = build_trip(count)
+        for codec in codecs():
+            encoded = codec.dumps(trip)
+            assert codec.loads(encoded) == trip, f"{codec.name} round trip changed the payload"
+            rows.append((
+                count, codec.name, len(encoded),
+                _time(lambda: codec.dumps(trip), repeat),
+                _time(lambda: codec.loads(encoded), repeat),
+            ))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'landmarks':>9} {'codec':<8} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    for count, name, size, encode, decode in run(args.landmarks, args.repeat):
+        print(f"{count:>9} {name:<8} {size:>10} {encode * 1000:>10.3f} {decode * 1000:>10.3f}")
+    if not MSGPACK_CODEC:
+        print("msgpack not installed; install it to benchmark the binary format")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+# common/health.py
+import time
+
+
+def install_health(app, service: str) -> None:
+    """Add a cheap GET /health route for the orchestrator's instance health checks"""
+    started = time.time()
+
+    @app.get("/health", include_in_schema=False)
+    def health():
+        return {"status": "ok", "service": service, "uptime_seconds": round(time.time() - started, 1)}
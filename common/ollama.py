@@ -0,0 +1,107 @@
+# common/ollama.py
+"""
+Settings and helpers shared by the Ollama clients of llm_api and parser_api:
+keep_alive, a common context size, start-up warm-up settings and the telemetry
+(token counts and load / prompt-eval / eval timings) Ollama reports with
+every generation.
+"""
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from common.metrics import REGISTRY
+
+# === Ollama model residency configuration ===
+# How long Ollama keeps the model loaded after a request ("30m", "-1" = forever, "0" = unload)
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# One context size for every caller: Ollama reloads the model whenever num_ctx changes
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "4096"))
+WARMUP_ENABLED = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "300"))
+
+NANOSECONDS = 1e9
+
+LOAD_TIME = REGISTRY.histogram(
+    "ollama_load_duration_seconds", "Model load time reported by Ollama (cold starts)", ("service",))
+PROMPT_EVAL_TIME = REGISTRY.histogram(
+    "ollama_prompt_eval_duration_seconds", "Prompt evaluation time reported by Ollama", ("service",))
+PROMPT_EVAL_TOKENS = REGISTRY.histogram(
+    "ollama_prompt_eval_tokens", "Prompt tokens Ollama had to evaluate (cached prefix tokens excluded)", ("service",),
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+EVAL_TOKENS = REGISTRY.histogram(
+    "ollama_eval_tokens", "Tokens generated per call", ("service",),
+    buckets=(8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+EVAL_RATE = REGISTRY.histogram(
+    "ollama_eval_tokens_per_second", "Generation throughput (eval_count / eval_duration)", ("service",),
+    buckets=(1, 2.5, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200))
+PROMPT_EVAL_RATE = REGISTRY.histogram(
+    "ollama_prompt_eval_tokens_per_second", "Prompt processing throughput", ("service",),
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+TOTAL_TIME = REGISTRY.histogram(
+    "ollama_total_duration_seconds", "Total generation time reported by Ollama", ("service",))
+TOKENS = REGISTRY.counter(
+    "ollama_tokens_total", "Tokens processed by Ollama", ("service", "kind"))
+WARMUP_TIME = REGISTRY.histogram(
+    "ollama_warmup_duration_seconds", "Start-up warm-up request latency", ("service",))
+COLD_STARTS = REGISTRY.counter(
+    "ollama_cold_starts_total", "Requests that had to wait for the model to load", ("service",))
+
+# Loads shorter than this are Ollama re-attaching an already resident model
+COLD_START_THRESHOLD = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def _rate(count: Optional[int], duration: Optional[int]) -> Optional[float]:
+    return round(count / (duration / NANOSECONDS), 2) if count and duration else None
+
+
+def summarize(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Ollama's nanosecond timings as milliseconds, plus throughput; fields Ollama omitted stay out"""
+    summary = {
+        "prompt_eval_count": result.get("prompt_eval_count"),
+        "eval_count": result.get("eval_count"),
+        "load_ms": result.get("load_duration"),
+        "prompt_eval_ms": result.get("prompt_eval_duration"),
+        "eval_ms": result.get("eval_duration"),
+        "total_ms": result.get("total_duration"),
+    }
+    for key in ("load_ms", "prompt_eval_ms", "eval_ms", "total_ms"):
+        if summary[key] is not None:
+            summary[key] = round(summary[key] / 1e6, 2)
+    summary["tokens_per_second"] = _rate(result.get("eval_count"), result.get("eval_duration"))
+    summary["prompt_tokens_per_second"] = _rate(result.get("prompt_eval_count"), result.get("prompt_eval_duration"))
+    return {k: v for k, v in summary.items() if v is not None}
+
+
+def record_timings(service: str, result: Dict[str, Any], telemetry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Observe the telemetry of a finished /api/generate response (or the final
+    stream chunk) and return its summary; `telemetry`, if given, is updated
+    in place for callers that only get the response text back.
+    """
+    load = result.get("load_duration")
+    if load is not None:
+        LOAD_TIME.observe(load / NANOSECONDS, service=service)
+        if load / NANOSECONDS >= COLD_START_THRESHOLD:
+            COLD_STARTS.inc(service=service)
+            logger.info(f"{service}: Ollama cold start, model load took {load / NANOSECONDS:.2f}s")
+    if result.get("prompt_eval_duration") is not None:
+        PROMPT_EVAL_TIME.observe(result["prompt_eval_duration"] / NANOSECONDS, service=service)
+    if result.get("prompt_eval_count") is not None:
+        PROMPT_EVAL_TOKENS.observe(result["prompt_eval_count"], service=service)
+        TOKENS.inc(result["prompt_eval_count"], service=service, kind="prompt")
+    if result.get("eval_count") is not None:
+        EVAL_TOKENS.observe(result["eval_count"], service=service)
+        TOKENS.inc(result["eval_count"], service=service, kind="generated")
+    if result.get("total_duration") is not None:
+        TOTAL_TIME.observe(result["total_duration"] / NANOSECONDS, service=service)
+    summary = summarize(result)
+    if "tokens_per_second" in summary:
+        EVAL_RATE.observe(summary["tokens_per_second"], service=service)
+    if "prompt_tokens_per_second" in summary:
+        PROMPT_EVAL_RATE.observe(summary["prompt_tokens_per_second"], service=service)
+    if telemetry is not None:
+        telemetry.update(summary)
+    return summary
+
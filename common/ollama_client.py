@@ -0,0 +1,304 @@
+# common/ollama_client.py
+"""
+Pooled Ollama client shared by llm_api and parser_api.
+
+Requests go to the least-loaded healthy backend in OLLAMA_BACKENDS that
+serves the requested model (learned from each backend's /api/tags), over
+long-lived keep-alive connections, with the same timeouts and retry policy
+for every caller. Scheduler capacity follows the backends: OLLAMA_MAX_INFLIGHT
+slots for each backend that passed its last health check, so adding a
+backend adds throughput. Admission through common.ollama_scheduler and telemetry
+through common.ollama happen here too, so the service clients only build
+payloads and map errors onto their HTTP responses.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+import httpx
+
+from common.metrics import REGISTRY
+from common.ollama import KEEP_ALIVE, NUM_CTX, WARMUP_ENABLED, WARMUP_TIME, WARMUP_TIMEOUT, record_timings
+from common.ollama_scheduler import get_scheduler
+
+# === Ollama backend configuration ===
+BACKENDS = [u.strip().rstrip("/") for u in os.getenv("OLLAMA_BACKENDS", "http://localhost:11434").split(",") if u.strip()]
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+RETRIES = int(os.getenv("OLLAMA_RETRIES", "2"))  # extra attempts, each on the next best backend
+RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.5"))  # seconds, full jitter, doubled per attempt
+MAX_CONNECTIONS = int(os.getenv("OLLAMA_POOL_MAX_CONNECTIONS", "20"))  # per backend
+KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_POOL_KEEPALIVE_EXPIRY", "60"))
+HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+FAILURE_COOLDOWN = float(os.getenv("OLLAMA_FAILURE_COOLDOWN", "15"))  # seconds a failing backend is skipped
+
+# 5xx worth another backend: overloaded, model failed to load, proxy in front of Ollama
+RETRY_STATUSES = {500, 502, 503, 504}
+
+BACKEND_OUTSTANDING = REGISTRY.gauge(
+    "ollama_backend_outstanding", "In-flight requests per Ollama backend", ("backend",))
+BACKEND_HEALTHY = REGISTRY.gauge(
+    "ollama_backend_healthy", "1 if the Ollama backend answered its last health check", ("backend",))
+BACKEND_REQUESTS = REGISTRY.counter(
+    "ollama_backend_requests_total", "Ollama requests per backend and outcome", ("backend", "outcome"))
+RETRIES_TOTAL = REGISTRY.counter(
+    "ollama_retries_total", "Ollama requests retried on another backend", ("service",))
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaStreamError(Exception):
+    """Ollama reported an error inside a streamed response"""
+
+
+def _model_matches(model: str, available: Set[str]) -> bool:
+    # /api/tags lists "llama3:latest"; callers usually say "llama3"
+    return model in available or f"{model}:latest" in available
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.failed_until = 0.0
+        self.models: Optional[Set[str]] = None  # None until the first health check
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.failed_until <= time.monotonic()
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or _model_matches(model, self.models)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "models": sorted(self.models) if self.models is not None else None,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+class OllamaClient:
+    def __init__(self, backends: List[str] = BACKENDS):
+        self.backends = [Backend(url) for url in backends]
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+        # Every backend counts as healthy until its first check
+        get_scheduler().scale(len(self.backends))
+        BACKEND_OUTSTANDING.set_function(lambda: [({"backend": b.url}, b.outstanding) for b in self.backends])
+        BACKEND_HEALTHY.set_function(lambda: [({"backend": b.url}, int(b.healthy)) for b in self.backends])
+
+    # --- connections and health ---
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=MAX_CONNECTIONS * len(self.backends),
+                max_keepalive_connections=MAX_CONNECTIONS * len(self.backends),
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+            self._client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(None, connect=CONNECT_TIMEOUT))
+        if self._health_task is None and (len(self.backends) > 1 or self.backends[0].models is None):
+            self._health_task = asyncio.create_task(self._health_loop())
+        return self._client
+
+    async def _check(self, backend: Backend) -> None:
+        try:
+            response = await self._client.get(f"{backend.url}/api/tags", timeout=CONNECT_TIMEOUT)
+            response.raise_for_status()
+            backend.models = {m["name"] for m in response.json().get("models", [])}
+            healthy = True
+        except Exception:
+            healthy = False
+        if healthy != backend.healthy:
+            logger.warning(f"Ollama backend {backend.url} is now {'healthy' if healthy else 'unhealthy'}")
+        backend.healthy = healthy
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check(b) for b in self.backends))
+            get_scheduler().scale(sum(1 for b in self.backends if b.healthy))
+            if len(self.backends) == 1 and self.backends[0].healthy:
+                # Only the model list is needed; with nowhere to fail over to, stop once it is known
+                return
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- routing ---
+
+    def pick(self, model: str, exclude: Set[str] = frozenset()) -> Backend:
+        """Least outstanding requests among available backends serving `model`, relaxing filters if none do"""
+        fresh = [b for b in self.backends if b.url not in exclude] or self.backends
+        candidates = (
+            [b for b in fresh if b.available and b.serves(model)]
+            or [b for b in fresh if b.available]
+            or fresh
+        )
+        random.shuffle(candidates)
+        return min(candidates, key=lambda b: b.outstanding)
+
+    @asynccontextmanager
+    async def _use(self, backend: Backend) -> AsyncIterator[Backend]:
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            yield backend
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.TransportError) or e.response.status_code in RETRY_STATUSES:
+                backend.failures += 1
+                if sum(1 for b in self.backends if b.available) > 1:
+                    backend.failed_until = time.monotonic() + FAILURE_COOLDOWN
+            BACKEND_REQUESTS.inc(backend=backend.url, outcome="error")
+            raise
+        except BaseException:
+            BACKEND_REQUESTS.inc(backend=backend.url, outcome="error")
+            raise
+        else:
+            BACKEND_REQUESTS.inc(backend=backend.url, outcome="ok")
+        finally:
+            backend.outstanding -= 1
+
+    @staticmethod
+    def _retryable(e: Exception) -> bool:
+        if isinstance(e, httpx.HTTPStatusError):
+            return e.response.status_code in RETRY_STATUSES
+        # Connection-level failures only: a read timeout mid-generation would just run it twice
+        return isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, httpx.PoolTimeout))
+
+    async def _backoff(self, service: str, attempt: int) -> None:
+        RETRIES_TOTAL.inc(service=service)
+        await asyncio.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+
+    # --- requests ---
+
+    async def generate(self, service: str, priority: str, payload: Dict[str, Any], timeout: float,
+                       telemetry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Non-streamed /api/generate; returns Ollama's full response body"""
+        payload = {**payload, "stream": False}
+        async with get_scheduler().slot(priority):
+            tried: Set[str] = set()
+            for attempt in range(RETRIES + 1):
+                backend = self.pick(payload["model"], tried)
+                tried.add(backend.url)
+                try:
+                    async with self._use(backend):
+                        response = await self._http().post(
+                            f"{backend.url}/api/generate", json=payload, timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT))
+                        response.raise_for_status()
+                        result = response.json()
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if attempt >= RETRIES or not self._retryable(e):
+                        raise
+                    logger.warning(f"{service}: Ollama backend {backend.url} failed ({e!r}), retrying")
+                    await self._backoff(service, attempt)
+                    continue
+                record_timings(service, result, telemetry)
+                return result
+
+    async def stream(self, service: str, priority: str, payload: Dict[str, Any], timeout: float,
+                     telemetry: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Streamed /api/generate yielding response fragments; retried only until the first byte arrives"""
+        payload = {**payload, "stream": True}
+        async with get_scheduler().slot(priority):
+            tried: Set[str] = set()
+            for attempt in range(RETRIES + 1):
+                backend = self.pick(payload["model"], tried)
+                tried.add(backend.url)
+                started = False
+                try:
+                    async with self._use(backend), self._http().stream(
+                            "POST", f"{backend.url}/api/generate", json=payload,
+                            timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)) as response:
+                        if response.is_error:
+                            await response.aread()
+                            response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.strip():
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise OllamaStreamError(chunk["error"])
+                            if chunk.get("response"):
+                                started = True
+                                yield chunk["response"]
+                            if chunk.get("done"):
+                                record_timings(service, chunk, telemetry)
+                                return
+                    return
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if started or attempt >= RETRIES or not self._retryable(e):
+                        raise
+                    logger.warning(f"{service}: Ollama backend {backend.url} failed ({e!r}), retrying")
+                    await self._backoff(service, attempt)
+
+    async def warm_up(self, service: str, model: str, system: Optional[str] = None) -> None:
+        """
+        Load the model on every backend before the first real request. With a
+        system prompt, one token is generated after it so Ollama's prompt cache
+        already holds the evaluated instruction prefix later requests share.
+        """
+        if not WARMUP_ENABLED:
+            return
+        payload: Dict[str, Any] = {"model": model, "keep_alive": KEEP_ALIVE, "stream": False}
+        if system:
+            payload.update({"system": system, "prompt": "{}", "options": {"num_ctx": NUM_CTX, "num_predict": 1}})
+        else:
+            # An empty prompt only loads the model
+            payload.update({"prompt": "", "options": {"num_ctx": NUM_CTX}})
+
+        async def warm(backend: Backend) -> None:
+            started = time.monotonic()
+            try:
+                response = await self._http().post(f"{backend.url}/api/generate", json=payload, timeout=WARMUP_TIMEOUT)
+                response.raise_for_status()
+                record_timings(service, response.json())
+            except Exception as e:
+                logger.warning(f"{service}: Ollama warm-up on {backend.url} failed: {str(e)}")
+                return
+            elapsed = time.monotonic() - started
+            WARMUP_TIME.observe(elapsed, service=service)
+            logger.info(f"{service}: Ollama model {model} warm on {backend.url} in {elapsed:.2f}s")
+
+        await asyncio.gather(*(warm(b) for b in self.backends))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backends": [b.stats() for b in self.backends],
+            "retries": RETRIES,
+            "capacity": get_scheduler().capacity
+        }
+
+
+_client: Optional[OllamaClient] = None
+
+
+def get_ollama() -> OllamaClient:
+    """Process-wide client, created on first use"""
+    global _client
+    if _client is None:
+        _client = OllamaClient()
+    return _client
+
+
+async def close_ollama() -> None:
+    if _client is not None:
+        await _client.close()
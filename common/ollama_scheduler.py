@@ -0,0 +1,375 @@
+# common/ollama_scheduler.py
+"""
+Admission control in front of the local Ollama shared by llm_api and
+parser_api. At most OLLAMA_MAX_INFLIGHT generations per healthy Ollama
+backend (see common.ollama_client) run at once; the rest wait in a bounded queue ordered by priority class, so short parser
+extractions overtake long itinerary generations instead of timing out
+behind them.
+
+The default "sqlite" backend coordinates separate service processes through
+a small ticket table (the same WAL/lease approach as the orchestrator's job
+queue); "local" only orders requests within one process, e.g. when the
+orchestrator runs all stages in-process.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from common.metrics import REGISTRY
+
+# === Ollama admission configuration ===
+SCHEDULER_BACKEND = os.getenv("OLLAMA_SCHEDULER", "sqlite").lower()  # sqlite | local
+# Absolute, so services started from different working directories still share one file;
+# the default sits at the root of the checkout both services import `common` from
+SCHEDULER_DB = os.path.abspath(os.getenv(
+    "OLLAMA_SCHEDULER_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ollama_scheduler.db")
+))
+MAX_INFLIGHT = int(os.getenv("OLLAMA_MAX_INFLIGHT", "2"))  # generations running at once per healthy backend
+MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", "64"))  # waiting requests before new ones are refused
+QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "60"))  # seconds a request may wait for a slot
+# A waiting request older than this is served as if it had the top priority, so generations never starve
+PRIORITY_AGING = float(os.getenv("OLLAMA_PRIORITY_AGING", "30"))
+SLOT_LEASE = float(os.getenv("OLLAMA_SLOT_LEASE", "15"))  # tickets of crashed processes expire after this
+# Waiting tickets re-check after POLL_INTERVAL, backing off to POLL_MAX; a release in this process wakes them at once
+POLL_INTERVAL = float(os.getenv("OLLAMA_SCHEDULER_POLL", "0.02"))
+POLL_MAX = float(os.getenv("OLLAMA_SCHEDULER_POLL_MAX", "0.5"))
+
+# Lower runs first
+PRIORITIES = {"parse": 0, "generate": 1}
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT = REGISTRY.histogram(
+    "ollama_queue_wait_seconds", "Time spent waiting for an Ollama slot", ("priority",))
+SERVICE_TIME = REGISTRY.histogram(
+    "ollama_service_seconds", "Time an Ollama slot was held", ("priority",))
+REJECTED = REGISTRY.counter(
+    "ollama_admission_rejected_total", "Requests refused by the Ollama scheduler", ("priority", "reason"))
+INFLIGHT = REGISTRY.gauge(
+    "ollama_requests_in_flight", "Ollama slots held by this process", ("priority",))
+WAITING = REGISTRY.gauge(
+    "ollama_requests_waiting", "Requests of this process waiting for an Ollama slot", ("priority",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ollama_tickets (
+    id TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL,
+    state TEXT NOT NULL,            -- waiting | running
+    created REAL NOT NULL,
+    lease_expires REAL NOT NULL     -- renewed while the owner is alive
+);
+CREATE INDEX IF NOT EXISTS ollama_tickets_state ON ollama_tickets (state, priority, created);
+"""
+
+
+class QueueFull(Exception):
+    """No slot could be granted: the wait queue is full or the wait timed out"""
+
+    def __init__(self, message: str, reason: str, retry_after: int = 5):
+        super().__init__(message)
+        self.reason = reason  # queue_full | timeout
+        self.retry_after = retry_after
+
+    def http_error(self):
+        """503 with Retry-After for the service endpoint that was refused"""
+        from fastapi import HTTPException
+        logger.warning(f"Ollama admission refused: {str(self)}")
+        return HTTPException(status_code=503, detail=str(self), headers={"Retry-After": str(self.retry_after)})
+
+
+class _Scheduler(ABC):
+    def __init__(self, capacity: int = MAX_INFLIGHT, max_queue: int = MAX_QUEUE, timeout: float = QUEUE_TIMEOUT):
+        self.per_backend = max(1, capacity)
+        self.capacity = self.per_backend
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.counts = {cls: {"running": 0, "waiting": 0} for cls in PRIORITIES}
+        INFLIGHT.set_function(lambda: [({"priority": c}, n["running"]) for c, n in self.counts.items()])
+        WAITING.set_function(lambda: [({"priority": c}, n["waiting"]) for c, n in self.counts.items()])
+
+    @abstractmethod
+    async def _acquire(self, priority: int) -> Any:
+        ...
+
+    @abstractmethod
+    async def _release(self, ticket: Any) -> None:
+        ...
+
+    def _capacity_grew(self) -> None:
+        """Called after scale() raised the capacity, so waiters can take the new slots"""
+
+    def scale(self, backends: int) -> None:
+        """Set the capacity to `per_backend` slots for each of `backends` (at least one) healthy backends"""
+        capacity = self.per_backend * max(1, backends)
+        if capacity == self.capacity:
+            return
+        logger.info(f"Ollama scheduler capacity {self.capacity} -> {capacity} ({max(1, backends)} backends)")
+        grew, self.capacity = capacity > self.capacity, capacity
+        if grew:
+            self._capacity_grew()
+
+    @asynccontextmanager
+    async def slot(self, priority_class: str) -> AsyncIterator[None]:
+        """Hold one Ollama slot for the duration of a (possibly streamed) generation"""
+        priority = PRIORITIES[priority_class]
+        counts = self.counts[priority_class]
+        started = time.monotonic()
+        counts["waiting"] += 1
+        try:
+            ticket = await self._acquire(priority)
+        except QueueFull as e:
+            REJECTED.inc(priority=priority_class, reason=e.reason)
+            raise
+        finally:
+            counts["waiting"] -= 1
+        QUEUE_WAIT.observe(time.monotonic() - started, priority=priority_class)
+        counts["running"] += 1
+        held = time.monotonic()
+        try:
+            yield
+        finally:
+            counts["running"] -= 1
+            SERVICE_TIME.observe(time.monotonic() - held, priority=priority_class)
+            await self._release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "capacity": self.capacity,
+            "per_backend": self.per_backend,
+            "max_queue": self.max_queue,
+            "classes": {cls: dict(n) for cls, n in self.counts.items()}
+        }
+
+
+class LocalScheduler(_Scheduler):
+    """Priority queue of asyncio futures; only coordinates callers in this process"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._running = 0
+        # (priority, enqueued, sequence, future); bounded by max_queue, so ranked with a linear scan
+        self._waiters: List[Tuple[int, float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _effective(self, priority: int, enqueued: float) -> int:
+        return 0 if time.monotonic() - enqueued > PRIORITY_AGING else priority
+
+    def _grant_next(self) -> None:
+        while self._running < self.capacity and self._waiters:
+            best = min(self._waiters, key=lambda w: (self._effective(w[0], w[1]), w[2]))
+            self._waiters.remove(best)
+            future = best[3]
+            if not future.done():
+                self._running += 1
+                future.set_result(None)
+
+    async def _acquire(self, priority: int) -> None:
+        if self._running < self.capacity and not self._waiters:
+            self._running += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            raise QueueFull("Ollama queue is full", "queue_full")
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, time.monotonic(), next(self._sequence), future)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted while timing out: hand the slot on
+                self._running -= 1
+                self._grant_next()
+            else:
+                future.cancel()
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                raise QueueFull("Timed out waiting for an Ollama slot", "timeout")
+            raise
+        return None
+
+    async def _release(self, ticket: None) -> None:
+        self._running -= 1
+        self._grant_next()
+
+    def _capacity_grew(self) -> None:
+        self._grant_next()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "running": self._running, "waiting": len(self._waiters)}
+
+
+class SQLiteScheduler(_Scheduler):
+    """
+    Tickets in a SQLite table shared by every process using the same
+    database file. A waiting ticket is granted when fewer than `capacity`
+    tickets are running and it ranks first by (priority, age); leases are
+    renewed by the owner so a crashed process cannot hold a slot for ever.
+
+    Waiters poll with a read-only query, which WAL lets run alongside
+    writers, backing off up to POLL_MAX; only the ticket at the head of the
+    queue, with a slot free, takes the write lock to claim it.
+    """
+
+    def __init__(self, path: str = SCHEDULER_DB, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._owned: Dict[str, asyncio.Task] = {}
+        # Set when this process frees a slot, so local waiters re-check immediately
+        self._released: Optional[asyncio.Event] = None
+        logger.info(f"Ollama scheduler shares {path} (capacity {self.capacity}, queue {self.max_queue})")
+
+    def _enqueue(self, ticket: str, priority: int) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM ollama_tickets WHERE lease_expires < ?", (now,))
+                waiting = self._conn.execute(
+                    "SELECT COUNT(*) FROM ollama_tickets WHERE state = 'waiting'").fetchone()[0]
+                if waiting >= self.max_queue:
+                    return False
+                self._conn.execute(
+                    "INSERT INTO ollama_tickets (id, priority, state, created, lease_expires) "
+                    "VALUES (?, ?, 'waiting', ?, ?)",
+                    (ticket, priority, now, now + SLOT_LEASE)
+                )
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def _may_grant(self, ticket: str) -> bool:
+        """Read-only check that a slot is free and `ticket` is next in line"""
+        now = time.time()
+        with self._lock:
+            running, head = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM ollama_tickets WHERE state = 'running' AND lease_expires >= ?), "
+                "(SELECT id FROM ollama_tickets WHERE state = 'waiting' AND lease_expires >= ? "
+                "ORDER BY CASE WHEN created < ? THEN 0 ELSE priority END, created LIMIT 1)",
+                (now, now, now - PRIORITY_AGING)
+            ).fetchone()
+        return running < self.capacity and head == ticket
+
+    def _try_grant(self, ticket: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM ollama_tickets WHERE lease_expires < ?", (now,))
+                running = self._conn.execute(
+                    "SELECT COUNT(*) FROM ollama_tickets WHERE state = 'running'").fetchone()[0]
+                if running >= self.capacity:
+                    return False
+                head = self._conn.execute(
+                    "SELECT id FROM ollama_tickets WHERE state = 'waiting' "
+                    "ORDER BY CASE WHEN created < ? THEN 0 ELSE priority END, created LIMIT 1",
+                    (now - PRIORITY_AGING,)
+                ).fetchone()
+                if head is None or head[0] != ticket:
+                    return False
+                self._conn.execute("UPDATE ollama_tickets SET state = 'running' WHERE id = ?", (ticket,))
+                return True
+            finally:
+                self._conn.execute("COMMIT")
+
+    def _renew(self, ticket: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ollama_tickets SET lease_expires = ? WHERE id = ?", (time.time() + SLOT_LEASE, ticket))
+
+    def _delete(self, ticket: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ollama_tickets WHERE id = ?", (ticket,))
+
+    async def _heartbeat(self, ticket: str) -> None:
+        while True:
+            await asyncio.sleep(SLOT_LEASE / 3)
+            try:
+                await asyncio.to_thread(self._renew, ticket)
+            except Exception as e:
+                # e.g. "database is locked": the lease has two more beats before it expires
+                logger.warning(f"Ollama ticket {ticket} heartbeat failed, retrying on the next beat: {str(e)}")
+
+    def _grant(self, ticket: str) -> bool:
+        return self._may_grant(ticket) and self._try_grant(ticket)
+
+    async def _acquire(self, priority: int) -> str:
+        ticket = uuid.uuid4().hex
+        if not await asyncio.to_thread(self._enqueue, ticket, priority):
+            raise QueueFull("Ollama queue is full", "queue_full")
+        if self._released is None:
+            self._released = asyncio.Event()
+        # Keeps the lease of the waiting ticket, and later of the granted slot, alive
+        heartbeat = asyncio.create_task(self._heartbeat(ticket))
+        deadline = time.monotonic() + self.timeout
+        delay = POLL_INTERVAL
+        try:
+            while not await asyncio.to_thread(self._grant, ticket):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise QueueFull("Timed out waiting for an Ollama slot", "timeout")
+                released = self._released
+                try:
+                    await asyncio.wait_for(released.wait(), min(delay, remaining))
+                    delay = POLL_INTERVAL
+                except asyncio.TimeoutError:
+                    delay = min(POLL_MAX, delay * 2)
+        except BaseException:
+            heartbeat.cancel()
+            await asyncio.shield(asyncio.to_thread(self._delete, ticket))
+            raise
+        self._owned[ticket] = heartbeat
+        return ticket
+
+    async def _release(self, ticket: str) -> None:
+        heartbeat = self._owned.pop(ticket, None)
+        if heartbeat is not None:
+            heartbeat.cancel()
+        await asyncio.shield(asyncio.to_thread(self._delete, ticket))
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._released is not None:
+            released, self._released = self._released, asyncio.Event()
+            released.set()
+
+    def _capacity_grew(self) -> None:
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, priority, COUNT(*) FROM ollama_tickets WHERE lease_expires >= ? "
+                "GROUP BY state, priority", (time.time(),)).fetchall()
+        names = {v: k for k, v in PRIORITIES.items()}
+        return {
+            **super().stats(),
+            "path": self.path,
+            "shared": {f"{state}_{names.get(priority, priority)}": n for state, priority, n in rows}
+        }
+
+
+_scheduler: Optional[_Scheduler] = None
+
+
+def get_scheduler() -> _Scheduler:
+    """Process-wide scheduler, created on first use"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = SQLiteScheduler() if SCHEDULER_BACKEND == "sqlite" else LocalScheduler()
+    return _scheduler
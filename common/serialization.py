@@ -0,0 +1,185 @@
+# common/serialization.py
+"""
+Content-negotiated wire encoding for the inter-service payloads.
+JSON stays the default everywhere; services additionally accept and emit
+msgpack when the `msgpack` package is installed, and JSON is encoded and
+decoded with `orjson` when that is installed. Both are optional.
+"""
+import contextvars
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional format
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+NDJSON = "application/x-ndjson"
+# Older clients still send the pre-registration media type
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+class Codec:
+    def __init__(self, name: str, media_type: str, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.name = name
+        self.media_type = media_type
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r}, {self.media_type!r})"
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid msgpack body: {e}") from e
+
+
+STDLIB_JSON_CODEC = Codec("json", JSON, _json_dumps, json.loads)
+JSON_CODEC = Codec("orjson", JSON, _orjson_dumps, orjson.loads) if orjson else STDLIB_JSON_CODEC
+MSGPACK_CODEC = Codec("msgpack", MSGPACK, lambda obj: msgpack.packb(obj, use_bin_type=True), _msgpack_loads) if msgpack else None
+
+CODECS: Dict[str, Codec] = {JSON: JSON_CODEC}
+if MSGPACK_CODEC:
+    CODECS[MSGPACK] = MSGPACK_CODEC
+
+
+def _media_type(value: Optional[str]) -> str:
+    media_type = (value or "").split(";", 1)[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def codec_for_content_type(content_type: Optional[str]) -> Optional[Codec]:
+    """Codec for a request/response Content-Type; None if it is not one we handle"""
+    media_type = _media_type(content_type)
+    if not media_type or media_type.endswith("+json"):
+        return JSON_CODEC
+    return CODECS.get(media_type)
+
+
+def negotiate(accept: Optional[str]) -> Codec:
+    """Pick the response codec from an Accept header, honouring q-values; JSON if nothing matches"""
+    if not accept:
+        return JSON_CODEC
+    candidates: List[Tuple[float, int, Codec]] = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        codec = CODECS.get(MEDIA_TYPE_ALIASES.get(media_type.lower(), media_type.lower()))
+        if codec and quality > 0:
+            # Highest quality wins; ties go to the first listed
+            candidates.append((-quality, position, codec))
+    return min(candidates, key=lambda c: c[:2])[2] if candidates else JSON_CODEC
+
+
+def accept_header(preferred: Codec) -> str:
+    """Accept header asking for `preferred` while still taking JSON from older services"""
+    if preferred is JSON_CODEC:
+        return JSON
+    return f"{preferred.media_type}, {JSON};q=0.5"
+
+
+def client_codec(name: str) -> Codec:
+    """Codec for outgoing requests by config name (json | msgpack); falls back to JSON"""
+    if name == "msgpack" and MSGPACK_CODEC:
+        return MSGPACK_CODEC
+    return JSON_CODEC
+
+
+def decode_body(content: bytes, content_type: Optional[str]) -> Any:
+    """Decode a response body by its Content-Type, treating unknown types as JSON"""
+    return (codec_for_content_type(content_type) or JSON_CODEC).loads(content)
+
+
+def ndjson_line(obj: Any) -> bytes:
+    return JSON_CODEC.dumps(obj) + b"\n"
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Decode a newline-delimited JSON byte stream one message at a time"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield JSON_CODEC.loads(line)
+    if pending.strip():
+        yield JSON_CODEC.loads(pending)
+
+
+# === FastAPI integration ===
+
+# Response codec negotiated for the request being handled
+_response_codec: contextvars.ContextVar[Codec] = contextvars.ContextVar("response_codec", default=JSON_CODEC)
+
+
+def install_serialization(app) -> None:
+    """
+    Decode msgpack/JSON request bodies and encode default responses per the
+    Accept header. Must be called before the app's routes are declared.
+    """
+    from fastapi import Request
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import APIRoute
+
+    class NegotiatedRequest(Request):
+        async def json(self) -> Any:
+            if not hasattr(self, "_json"):
+                codec = self.scope.get("wire_codec") or JSON_CODEC
+                self._json = codec.loads(await self.body())
+            return self._json
+
+    class NegotiatedResponse(JSONResponse):
+        def render(self, content: Any) -> bytes:
+            codec = _response_codec.get()
+            # init_headers runs after render, so this sets the Content-Type too
+            self.media_type = codec.media_type
+            return codec.dumps(content)
+
+    class NegotiatedRoute(APIRoute):
+        def get_route_handler(self):
+            handler = super().get_route_handler()
+
+            async def negotiated_handler(request: Request):
+                scope = request.scope
+                codec = codec_for_content_type(request.headers.get("content-type"))
+                if codec is not None and codec is not JSON_CODEC:
+                    # FastAPI only hands JSON bodies to request.json(); relabel and decode ourselves
+                    scope = dict(scope, headers=[
+                        (k, JSON.encode()) if k == b"content-type" else (k, v) for k, v in scope["headers"]
+                    ])
+                scope["wire_codec"] = codec
+                token = _response_codec.set(negotiate(request.headers.get("accept")))
+                try:
+                    return await handler(NegotiatedRequest(scope, request.receive))
+                finally:
+                    _response_codec.reset(token)
+
+            return negotiated_handler
+
+    app.router.route_class = NegotiatedRoute
+    app.router.default_response_class = NegotiatedResponse
@@ -0,0 +1,211 @@
+# common/tiered_cache.py
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A sweep trims the directory to this fraction of its cap, so it doesn't run again on the next write
+DISK_SWEEP_TARGET = 0.9
+
+
+class TieredCache:
+    """
+    Compressed blobs under a TTL in an LRU bounded by entries and bytes, in
+    front of an optional directory with one file per entry so hot entries
+    survive restarts. The directory is bounded too: once a write takes it
+    past disk_max_bytes, expired files go first, then the least recently
+    used ones. Subclasses encode their values into blobs.
+    """
+
+    def __init__(
+            self,
+            ttl: float,
+            max_entries: int,
+            max_bytes: int,
+            cache_dir: Optional[str],
+            disk_max_bytes: int,
+            suffix: str
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.suffix = suffix
+        # key -> (expires_at wall clock, compressed blob)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "disk_evictions": 0
+        }
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_files())
+
+    # --- memory tier ---
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _insert(self, key: str, expires_at: float, blob: bytes) -> None:
+        self._drop(key)
+        self._entries[key] = (expires_at, blob)
+        self._bytes += len(blob)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    # --- disk tier ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _disk_files(self) -> List[Tuple[str, float, int]]:
+        """(path, mtime, size) of every entry file; mtime is refreshed on disk hits"""
+        files = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if not item.name.endswith(self.suffix):
+                        continue
+                    try:
+                        stat = item.stat()
+                    except OSError:
+                        continue
+                    files.append((item.path, stat.st_mtime, stat.st_size))
+        except OSError as e:
+            logger.warning(f"Cannot list cache directory {self.cache_dir}: {str(e)}")
+        return files
+
+    @staticmethod
+    def _expires_at(path: str) -> float:
+        try:
+            with open(path, "rb") as f:
+                return float(f.readline())
+        except (OSError, ValueError):
+            return 0.0  # unreadable counts as expired
+
+    def _sweep_disk(self) -> None:
+        now = time.time()
+        files = self._disk_files()
+        total = sum(size for _, _, size in files)
+        target = self.disk_max_bytes * DISK_SWEEP_TARGET
+        # Expired first, then least recently written or read
+        files.sort(key=lambda f: (self._expires_at(f[0]) > now, f[1]))
+        for path, _, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.counters["disk_evictions"] += 1
+        self._disk_bytes = total
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, bytes]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header, blob = f.read().split(b"\n", 1)
+            os.utime(path)  # recency for the sweep
+            return float(header), blob
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable cache file {path}: {str(e)}")
+            return None
+
+    def _write_disk(self, key: str, expires_at: float, blob: bytes) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            data = f"{expires_at}\n".encode("ascii") + blob
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to persist cache entry {path}: {str(e)}")
+            return
+        self._disk_bytes += len(data) - replaced
+        if self._disk_bytes > self.disk_max_bytes:
+            self._sweep_disk()
+
+    def _remove_disk(self, key: str) -> None:
+        try:
+            path = self._path(key)
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+    # --- blobs ---
+
+    async def get_blob(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """(blob, tier) on a hit, tier being "memory" or "disk"; None on a miss"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1], "memory"
+            self._drop(key)
+            self.counters["expired"] += 1
+
+        if self.cache_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._insert(key, *entry)
+                    self.counters["disk_hits"] += 1
+                    return entry[1], "disk"
+                await asyncio.to_thread(self._remove_disk, key)
+                self.counters["expired"] += 1
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set_blob(self, key: str, blob: bytes) -> None:
+        expires_at = time.time() + self.ttl
+        self._insert(key, expires_at, blob)
+        self.counters["stores"] += 1
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_disk, key, expires_at, blob)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.counters["hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        return round(hits / lookups, 4) if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "persistent": bool(self.cache_dir),
+            "disk_bytes": self._disk_bytes if self.cache_dir else 0,
+            "hit_rate": self.hit_rate,
+            **self.counters
+        }
@@ -1,54 +1,142 @@
 import asyncio
 import httpx
 import logging
-from typing import List, Optional
+import os
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from geo_api.models import GeoEntity, GeoRequest, GeoResponse, GeoTransportSegment
+from common.metrics import REGISTRY
 
 NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
 HEADERS = {"User-Agent": "travel-app/1.0"}
 DELAY_BETWEEN_REQUESTS = 1  # seconds
 MAX_RETRIES = 3
+CACHE_SIZE = int(os.getenv("GEO_CACHE_SIZE", "10000"))  # remembered place names, incl. not-found
 
 logger = logging.getLogger(__name__)
 
+GEOCODE_LOOKUPS = REGISTRY.counter(
+    "geo_lookups_total", "Geocode lookups by source", ("source",))
+NOMINATIM_REQUESTS = REGISTRY.counter(
+    "geo_nominatim_requests_total", "HTTP requests sent to Nominatim", ("outcome",))
+NOMINATIM_LATENCY = REGISTRY.histogram(
+    "geo_nominatim_duration_seconds", "Nominatim HTTP latency")
+
+# Normalized name -> (lat, lon), or None for places Nominatim could not find
+_coordinate_cache: "OrderedDict[str, Optional[Tuple[float, float]]]" = OrderedDict()
+
+
+def _cache_key(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def is_cached(name: str) -> bool:
+    return _cache_key(name) in _coordinate_cache
+
+
+def _remember(name: str, coords: Optional[Tuple[float, float]]) -> None:
+    key = _cache_key(name)
+    _coordinate_cache[key] = coords
+    _coordinate_cache.move_to_end(key)
+    while len(_coordinate_cache) > CACHE_SIZE:
+        _coordinate_cache.popitem(last=False)
+
 
 async def fetch_coordinates(name: str) -> Optional[GeoEntity]:
     """Enhanced with retries and better error handling"""
+    key = _cache_key(name)
+    if key in _coordinate_cache:
+        GEOCODE_LOOKUPS.inc(source="cache")
+        _coordinate_cache.move_to_end(key)
+        coords = _coordinate_cache[key]
+        return GeoEntity(name=name, lat=coords[0], lon=coords[1]) if coords else None
+
+    GEOCODE_LOOKUPS.inc(source="http")
     params = {"q": name, "format": "json", "limit": 1}
 
     for attempt in range(MAX_RETRIES):
+        started = time.perf_counter()
         try:
             async with httpx.AsyncClient(timeout=10.0) as client:
                 response = await client.get(NOMINATIM_URL, params=params, headers=HEADERS)
+                NOMINATIM_LATENCY.observe(time.perf_counter() - started)
                 response.raise_for_status()
+                NOMINATIM_REQUESTS.inc(outcome="success")
 
                 if data := response.json():
-                    return GeoEntity(
+                    entity = GeoEntity(
                         name=name,
                         lat=float(data[0]["lat"]),
                         lon=float(data[0]["lon"])
                     )
+                    _remember(name, (entity.lat, entity.lon))
+                    return entity
 
                 logger.warning(f"No coordinates found for: {name}")
+                _remember(name, None)
                 return None
 
         except Exception as e:
+            NOMINATIM_REQUESTS.inc(outcome="error")
             if attempt == MAX_RETRIES - 1:
                 logger.error(f"Failed to geocode {name} after {MAX_RETRIES} attempts")
                 return None
             await asyncio.sleep(DELAY_BETWEEN_REQUESTS * (attempt + 1))
 
 
+async def geocode_rate_limited(name: str) -> Optional[GeoEntity]:
+    cached = is_cached(name)
+    entity = await fetch_coordinates(name)
+    if not cached:
+        # Only real Nominatim requests count against the rate limit
+        await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
+    return entity
+
+
 async def geocode_items(items: List[str]) -> List[GeoEntity]:
     """Batch geocoding with rate limiting"""
     results = []
     for item in set(items):  # Deduplicate first
-        if entity := await fetch_coordinates(item):
+        if entity := await geocode_rate_limited(item):
             results.append(entity)
-        await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
     return results
 
 
+async def geocode_feed(messages: AsyncIterator[Dict[str, Any]]) -> GeoResponse:
+    """
+    Geocode a parser entity feed ({"entity": {...}} messages, then
+    {"done": true, "parsed": {...}}) while it is still arriving. Lookups run
+    in feed order in the background; the final parse is then assembled by
+    geocode_all, which finds those names already cached.
+    """
+    names: asyncio.Queue = asyncio.Queue()
+
+    async def prefetch():
+        while (name := await names.get()) is not None:
+            try:
+                await geocode_rate_limited(name)
+            except Exception as e:
+                logger.warning(f"Prefetch of {name} failed: {str(e)}")
+
+    worker = asyncio.create_task(prefetch())
+    parsed = None
+    try:
+        async for message in messages:
+            if message.get("entity"):
+                names.put_nowait(message["entity"]["name"])
+            elif message.get("done"):
+                parsed = message["parsed"]
+        names.put_nowait(None)
+        await worker
+    finally:
+        worker.cancel()
+
+    if parsed is None:
+        raise ValueError("Entity feed ended without a final parse")
+    return await geocode_all(GeoRequest(**parsed))
+
+
 async def geocode_all(data: GeoRequest) -> GeoResponse:
     """Handle both model instances and raw dicts"""
     # Convert all cities to names (handles both dict and model input)
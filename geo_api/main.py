@@ -1,10 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from geo_api.models import GeoRequest, GeoResponse
-from geo_api.geocoder import geocode_all
+from geo_api.geocoder import geocode_all, geocode_feed
+from common.metrics import install_metrics
+from common.health import install_health
+from common.serialization import install_serialization, iter_ndjson
 import logging
 import httpx
 
 app = FastAPI(title="Geo API", version="1.0")
+install_metrics(app, "geo_api")
+install_health(app, "geo_api")
+install_serialization(app)
 
 # Configure logging
 logging.basicConfig(
@@ -30,4 +36,22 @@ async def geocode(data: dict):  # Accept raw dict input
         raise HTTPException(
             status_code=500,
             detail="Geocoding processing failed"
-        )
\ No newline at end of file
+        )
+
+@app.post("/geocode/stream", response_model=GeoResponse)
+async def geocode_stream(request: Request):
+    """
+    Accepts parser_api's /parse/stream NDJSON as the request body and starts
+    geocoding entities before the upload (i.e. parsing) has finished
+    """
+    try:
+        result = await geocode_feed(iter_ndjson(request.stream()))
+        logger.info(f"Streamed geocoding completed for {len(result.cities)} locations")
+        return result
+
+    except Exception as e:
+        logger.error(f"Streamed geocoding failed: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Geocoding processing failed"
+        )
@@ -0,0 +1,72 @@
+# llm_api/cache.py
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from common.tiered_cache import TieredCache
+
+# === Generation cache configuration ===
+CACHE_ENABLED = os.getenv("LLM_CACHE", "true").lower() == "true"
+# Requests at or below this temperature are cached by default; hotter ones only when they opt in
+CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.7"))
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 86400)))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", "llm_cache")  # empty = memory only
+CACHE_DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def make_key(prompt: str, model: str, temperature: float, max_tokens: Optional[int]) -> str:
+    material = json.dumps(
+        {"prompt": prompt, "model": model, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class GenerationCache(TieredCache):
+    """
+    Generated text by (sanitized prompt, model, temperature, max_length).
+    A zlib-compressed LRU in memory in front of one file per entry on disk,
+    so repeated demo and catalog prompts survive restarts. Whether a request
+    is cached at all is decided by should_cache().
+    """
+
+    def __init__(
+            self,
+            ttl: float = CACHE_TTL,
+            max_entries: int = CACHE_MAX_ENTRIES,
+            max_bytes: int = CACHE_MAX_BYTES,
+            cache_dir: Optional[str] = CACHE_DIR,
+            enabled: bool = CACHE_ENABLED,
+            max_temperature: float = CACHE_MAX_TEMPERATURE,
+            disk_max_bytes: int = CACHE_DISK_MAX_BYTES
+    ):
+        super().__init__(ttl, max_entries, max_bytes, cache_dir, disk_max_bytes, ".txt.z")
+        self.enabled = enabled
+        self.max_temperature = max_temperature
+        self.counters["bypassed"] = 0
+
+    def should_cache(self, temperature: float, opt_in: Optional[bool]) -> bool:
+        """Request flag first (True/False), otherwise only low-temperature generations"""
+        if not self.enabled or opt_in is False:
+            return False
+        return bool(opt_in) or temperature <= self.max_temperature
+
+    def bypass(self) -> None:
+        self.counters["bypassed"] += 1
+
+    async def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """(text, tier) on a hit, tier being "memory" or "disk"; None on a miss"""
+        hit = await self.get_blob(key)
+        if hit is None:
+            return None
+        return zlib.decompress(hit[0]).decode("utf-8"), hit[1]
+
+    async def set(self, key: str, text: str) -> None:
+        await self.set_blob(key, zlib.compress(text.encode("utf-8")))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "max_temperature": self.max_temperature, **super().stats()}
@@ -1,36 +1,236 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from llm_api.models import TravelIdeaRequest, GeneratedTravelPlan
-from llm_api.ollama_client import query_ollama
+from llm_api.cache import GenerationCache, make_key
+from llm_api.similarity import SimilarIdeaIndex
+from llm_api.ollama_client import MODEL_NAME, query_ollama, stream_ollama, warm_up_model
+from common.ollama_client import close_ollama, get_ollama
+from common.ollama_scheduler import get_scheduler
 from llm_api.utils import sanitize_input, validate_text_response
+from common.metrics import REGISTRY, install_metrics
+from common.health import install_health
+from common.serialization import NDJSON, install_serialization, ndjson_line
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="LLM Text Generation API", version="1.0")
+install_metrics(app, "llm_api")
+install_health(app, "llm_api")
+install_serialization(app)
+
+GENERATION_LATENCY = REGISTRY.histogram(
+    "llm_generation_duration_seconds", "Ollama itinerary generation latency", ("model",))
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds", "Time from a /generate/stream request to its first token", ("model",))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "llm_cache_lookups_total", "Generation cache lookups by result", ("result",))
+CACHE_HIT_RATE = REGISTRY.gauge(
+    "llm_cache_hit_ratio", "Generation cache hits over lookups since startup")
+CACHE_ENTRIES = REGISTRY.gauge(
+    "llm_cache_entries", "Generations held in the in-memory cache tier")
+
+SIMILAR_ENTRIES = REGISTRY.gauge(
+    "llm_similar_index_entries", "Past ideas in the near-duplicate index")
+
+generation_cache = GenerationCache()
+# Near-duplicate ideas ("Rome + Florence, 5 days" ~ "5 days Rome and Florence") behind the exact cache
+similar_ideas = SimilarIdeaIndex()
+CACHE_HIT_RATE.set_function(lambda: [({}, generation_cache.hit_rate)])
+CACHE_ENTRIES.set_function(lambda: [({}, len(generation_cache))])
+SIMILAR_ENTRIES.set_function(lambda: [({}, len(similar_ideas))])
+
+@app.on_event("startup")
+async def load_similar_ideas():
+    await asyncio.to_thread(similar_ideas.load)
+
+@app.on_event("startup")
+async def open_ollama_scheduler():
+    # Created up front so the shared scheduler database is logged at startup, not on the first request
+    get_scheduler()
+
+warmup_tasks = set()
+
+@app.on_event("startup")
+async def start_model_warm_up():
+    # Not awaited: startup must not block for the length of a model load
+    task = asyncio.create_task(warm_up_model())
+    warmup_tasks.add(task)
+    task.add_done_callback(warmup_tasks.discard)
+
+@app.on_event("shutdown")
+async def save_similar_ideas():
+    await asyncio.to_thread(similar_ideas.save)
+
+@app.on_event("shutdown")
+async def close_ollama_pool():
+    await close_ollama()
+
+def build_prompt(idea: str) -> str:
+    # Validate and sanitize input
+    clean_input = sanitize_input(idea)
+    return (
+        f"Create a detailed travel itinerary including cities, landmarks, transport, and accommodations for: {clean_input}"
+    )
+
+def similarity_namespace(request: TravelIdeaRequest) -> str:
+    # Only plans generated with the same settings are interchangeable
+    return f"{MODEL_NAME}|{request.creativity}|{request.max_length}"
+
+async def cached_generation(request: TravelIdeaRequest, prompt: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    (cache key, GeneratedTravelPlan fields of a cached plan). The key is None
+    when the cache policy skips this request; the fields are None on a miss.
+    """
+    if not generation_cache.should_cache(request.creativity, request.use_cache):
+        generation_cache.bypass()
+        CACHE_LOOKUPS.inc(result="bypass")
+        return None, None
+    key = make_key(prompt, MODEL_NAME, request.creativity, request.max_length)
+    hit = await generation_cache.get(key)
+    if hit:
+        CACHE_LOOKUPS.inc(result=f"{hit[1]}_hit")
+        return key, {"raw_text": hit[0], "cached": True}
+    similar = similar_ideas.lookup(request.idea, similarity_namespace(request))
+    if similar:
+        text, idea, score = similar
+        CACHE_LOOKUPS.inc(result="similar_hit")
+        logger.info(f"Reusing the plan of a similar idea ({score:.2f}): {idea!r}")
+        # Next time this exact prompt is a plain cache hit
+        await generation_cache.set(key, text)
+        return key, {"raw_text": text, "cached": True, "similar_to": idea, "similarity": score}
+    CACHE_LOOKUPS.inc(result="miss")
+    return key, None
+
+async def remember_generation(cache_key: Optional[str], request: TravelIdeaRequest, text: str) -> None:
+    if cache_key is None:
+        return
+    await generation_cache.set(cache_key, text)
+    similar_ideas.add(request.idea, similarity_namespace(request), text)
+    if similar_ideas.save_due():
+        await asyncio.to_thread(similar_ideas.save)
 
 @app.post("/generate", response_model=GeneratedTravelPlan)
 async def generate_travel_text(request: TravelIdeaRequest) -> GeneratedTravelPlan:
     """Generate natural language travel plan"""
     start_time = time.time()
 
-    # Validate and sanitize input
-    clean_input = sanitize_input(request.idea)
-    prompt = (
-        f"Create a detailed travel itinerary including cities, landmarks, transport, and accommodations for: {clean_input}"
-    )
+    prompt = build_prompt(request.idea)
+    cache_key, cached = await cached_generation(request, prompt)
+    if cached is not None:
+        return GeneratedTravelPlan(
+            user_input=request.idea,
+            generation_time_ms=int((time.time() - start_time) * 1000),
+            model=MODEL_NAME,
+            **cached
+        )
 
     # Pass creativity and max_length to the LLM
-    raw_response = await query_ollama(
-        prompt,
-        temperature=request.creativity,
-        max_tokens=request.max_length
-    )
+    telemetry = {}
+    with GENERATION_LATENCY.time(model=MODEL_NAME):
+        raw_response = await query_ollama(
+            prompt,
+            temperature=request.creativity,
+            max_tokens=request.max_length,
+            telemetry=telemetry
+        )
     validated_text = await validate_text_response(raw_response)
+    await remember_generation(cache_key, request, validated_text)
 
     return GeneratedTravelPlan(
         raw_text=validated_text,
         user_input=request.idea,
         generation_time_ms=int((time.time() - start_time) * 1000),
-        model="llama3"
-    )
\ No newline at end of file
+        model=MODEL_NAME,
+        telemetry=telemetry or None
+    )
+
+async def stream_generation(request: TravelIdeaRequest) -> AsyncIterator[dict]:
+    """
+    Messages of /generate/stream: {"token": ...} per Ollama token, then one
+    {"done": true, ...} carrying the full text and timings, or {"error": ...}
+    if generation fails after the response has started.
+    """
+    start_time = time.time()
+    prompt = build_prompt(request.idea)
+    cache_key, cached = await cached_generation(request, prompt)
+    if cached is not None:
+        # Replayed as a single token so stream consumers need no special case
+        yield {"token": cached["raw_text"]}
+        yield {
+            "done": True,
+            **GeneratedTravelPlan(
+                user_input=request.idea,
+                generation_time_ms=int((time.time() - start_time) * 1000),
+                model=MODEL_NAME,
+                **cached
+            ).model_dump(exclude_none=True),
+            "time_to_first_token_ms": int((time.time() - start_time) * 1000),
+            "tokens": 1
+        }
+        return
+
+    first_token_ms = None
+    parts = []
+    telemetry = {}
+    try:
+        with GENERATION_LATENCY.time(model=MODEL_NAME):
+            async for token in stream_ollama(
+                prompt,
+                temperature=request.creativity,
+                max_tokens=request.max_length,
+                telemetry=telemetry
+            ):
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - start_time) * 1000)
+                    TIME_TO_FIRST_TOKEN.observe(first_token_ms / 1000, model=MODEL_NAME)
+                parts.append(token)
+                yield {"token": token}
+        validated_text = await validate_text_response("".join(parts))
+        await remember_generation(cache_key, request, validated_text)
+    except HTTPException as e:
+        logger.error(f"Streamed generation failed: {e.detail}")
+        yield {"error": e.detail}
+        return
+    except Exception as e:
+        logger.error(f"Streamed generation failed: {str(e)}")
+        yield {"error": str(e)}
+        return
+
+    generation_time_ms = int((time.time() - start_time) * 1000)
+    logger.info(f"Streamed {len(parts)} tokens, first after {first_token_ms} ms, total {generation_time_ms} ms")
+    yield {
+        "done": True,
+        **GeneratedTravelPlan(
+            raw_text=validated_text,
+            user_input=request.idea,
+            generation_time_ms=generation_time_ms,
+            model=MODEL_NAME,
+            telemetry=telemetry or None
+        ).model_dump(exclude_none=True),
+        "time_to_first_token_ms": first_token_ms,
+        "tokens": len(parts)
+    }
+
+@app.post("/generate/stream")
+async def generate_travel_text_stream(request: TravelIdeaRequest):
+    """NDJSON variant of /generate: tokens as they are generated, then the full plan"""
+    messages = stream_generation(request)
+    return StreamingResponse(
+        (ndjson_line(message) async for message in messages),
+        media_type=NDJSON,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/debug/cache")
+def get_cache_stats():
+    """Generation cache policy, size and hit rate, and the near-duplicate index"""
+    return {**generation_cache.stats(), "similar": similar_ideas.stats()}
+
+@app.get("/debug/ollama")
+def get_ollama_stats():
+    """Ollama backends with their load, health and served models"""
+    return {"model": MODEL_NAME, **get_ollama().stats()}
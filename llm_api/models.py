@@ -1,11 +1,12 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Union
 
 class TravelIdeaRequest(BaseModel):
     """Input model for text generation"""
     idea: str
     creativity: float = 0.7  # Default temperature
     max_length: Optional[int] = 2000  # Token limit
+    use_cache: Optional[bool] = None  # True/False override the temperature-based cache policy
 
 class GeneratedTravelPlan(BaseModel):
     """Output model for generated text"""
@@ -13,4 +14,8 @@ class GeneratedTravelPlan(BaseModel):
     user_input: str  # Echo back for reference
     generation_time_ms: int
     model: str = "llama3"
-    warnings: Optional[list[str]] = None  # Quality warnings
\ No newline at end of file
+    warnings: Optional[list[str]] = None  # Quality warnings
+    cached: bool = False  # Served from the generation cache
+    similar_to: Optional[str] = None  # Past idea whose plan was reused (near-duplicate match)
+    similarity: Optional[float] = None
+    telemetry: Optional[dict[str, Union[int, float]]] = None  # Ollama token counts, timings (ms) and tokens/sec
\ No newline at end of file
@@ -1,32 +1,42 @@
 import httpx
 from fastapi import HTTPException
 import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional
 
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "llama3"
+from common.ollama import KEEP_ALIVE, NUM_CTX
+from common.ollama_client import OllamaStreamError, get_ollama
+from common.ollama_scheduler import QueueFull
+
+MODEL_NAME = os.getenv("LLM_OLLAMA_MODEL", "llama3")
 TIMEOUT = 120  # Longer timeout for text generation
 
 logger = logging.getLogger(__name__)
 
-async def query_ollama(prompt: str, temperature: float = 0.7, max_tokens: int = 2000) -> str:
-    """Call Ollama with custom temperature and max tokens."""
-    payload = {
+def _build_payload(prompt: str, temperature: float, max_tokens: int) -> dict:
+    return {
         "model": MODEL_NAME,
         "prompt": prompt,
-        "stream": False,
+        "keep_alive": KEEP_ALIVE,
         "options": {
             "temperature": temperature,
-            "num_ctx": 4096,
+            "num_ctx": NUM_CTX,
             "num_predict": max_tokens
         }
     }
 
+async def query_ollama(prompt: str, temperature: float = 0.7, max_tokens: int = 2000,
+                       telemetry: Optional[Dict[str, Any]] = None) -> str:
+    """Call Ollama with custom temperature and max tokens; `telemetry` receives Ollama's timings"""
+    payload = _build_payload(prompt, temperature, max_tokens)
+
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            response = await client.post(OLLAMA_API_URL, json=payload)
-            response.raise_for_status()
-            return response.json()["response"]
+        # Itinerary generations queue behind parser extractions for the shared Ollama
+        result = await get_ollama().generate("llm_api", "generate", payload, TIMEOUT, telemetry)
+        return result["response"]
 
+    except QueueFull as e:
+        raise e.http_error()
     except httpx.HTTPStatusError as e:
         logger.error(f"Ollama API error: {e.response.text}")
         raise HTTPException(
@@ -38,4 +48,35 @@ async def query_ollama(prompt: str, temperature: float = 0.7, max_tokens: int =
         raise HTTPException(
             status_code=503,
             detail="Ollama service unavailable"
-        )
\ No newline at end of file
+        )
+
+async def stream_ollama(prompt: str, temperature: float = 0.7, max_tokens: int = 2000,
+                        telemetry: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Same request as query_ollama, yielding tokens as Ollama produces them"""
+    payload = _build_payload(prompt, temperature, max_tokens)
+    try:
+        async for token in get_ollama().stream("llm_api", "generate", payload, TIMEOUT, telemetry):
+            yield token
+    except QueueFull as e:
+        raise e.http_error()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Ollama API error: {e.response.text}")
+        raise HTTPException(
+            status_code=502,
+            detail=f"Ollama generation failed: {e.response.text}"
+        )
+    except OllamaStreamError as e:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Ollama generation failed: {str(e)}"
+        )
+    except httpx.HTTPError as e:
+        logger.error(f"Ollama connection error: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Ollama service unavailable"
+        )
+
+async def warm_up_model() -> None:
+    """Load the model at start-up so the first itinerary does not pay for it"""
+    await get_ollama().warm_up("llm_api", MODEL_NAME)
@@ -0,0 +1,276 @@
+# llm_api/similarity.py
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from llm_api.cache import CACHE_DIR
+
+# === Near-duplicate reuse configuration ===
+SIMILAR_ENABLED = os.getenv("LLM_SIMILAR", "true").lower() == "true"
+SIMILAR_THRESHOLD = float(os.getenv("LLM_SIMILAR_THRESHOLD", "0.9"))  # Jaccard similarity of idea tokens
+SIMILAR_MAX_ENTRIES = int(os.getenv("LLM_SIMILAR_MAX_ENTRIES", "5000"))
+# Next to the generation cache by default; empty = memory only
+SIMILAR_INDEX_PATH = os.getenv("LLM_SIMILAR_INDEX_PATH", os.path.join(CACHE_DIR, "similar_index.json") if CACHE_DIR else "")
+SIMILAR_SAVE_INTERVAL = float(os.getenv("LLM_SIMILAR_SAVE_INTERVAL", "30"))  # seconds between snapshots
+NUM_PERM = 64
+BANDS = 16  # 16 bands of 4 rows: pairs above ~0.6 Jaccard almost always share a bucket
+
+MERSENNE_PRIME = (1 << 61) - 1
+STOPWORDS = frozenset(
+    "a an and at by for from in into of on or the to with via trip travel visit visiting plan "
+    "i we me my our want would like please".split()
+)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+DIRECTION_WORDS = ("to", "from")  # stopwords, but they decide which way a route goes
+ROUTE_SEP = ">"  # never produced by TOKEN_RE, so route tokens can't collide with words
+
+logger = logging.getLogger(__name__)
+
+
+def _stem(token: str) -> str:
+    # "days" == "day", "museums" == "museum"; digits and short words stay as they are
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+def _content(token: Optional[str]) -> bool:
+    return token is not None and token not in STOPWORDS
+
+
+def _routes(words: List[str]) -> Set[str]:
+    """Ordered "origin>destination" tokens: "Rome to Florence", "from Rome to Florence", "to Florence from Rome" """
+    routes = set()
+    for i, word in enumerate(words):
+        if word not in DIRECTION_WORDS:
+            continue
+        before = words[i - 1] if i > 0 else None
+        after = words[i + 1] if i + 1 < len(words) else None
+        if not (_content(before) and _content(after)):
+            continue
+        if word == "from" and (i < 2 or words[i - 2] != "to"):
+            # Only "to Y from X"; "from X to Y" is read at its "to", "wine from Rome" is no route
+            continue
+        origin, destination = (before, after) if word == "to" else (after, before)
+        routes.add(f"{_stem(origin)}{ROUTE_SEP}{_stem(destination)}")
+    return routes
+
+
+def idea_tokens(idea: str) -> FrozenSet[str]:
+    """
+    Content words, order-insensitive so "5 days Rome and Florence by train" ~
+    "Rome + Florence, 5 days, train", plus one ordered token per "X to Y" /
+    "from X to Y" route so "Rome to Florence" never matches "Florence to Rome".
+    """
+    words = TOKEN_RE.findall(idea.lower())
+    return frozenset({_stem(t) for t in words if t not in STOPWORDS} | _routes(words))
+
+
+def _numbers(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(t for t in tokens if t.isdigit())
+
+
+def _route_tokens(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    return frozenset(t for t in tokens if ROUTE_SEP in t)
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _permutations(count: int) -> List[Tuple[int, int]]:
+    # Fixed seed: signatures must stay comparable across restarts and processes
+    params = []
+    for i in range(count):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (MERSENNE_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+PERMUTATIONS = _permutations(NUM_PERM)
+
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [_hash64(t) for t in tokens] or [0]
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class _Entry:
+    __slots__ = ("idea", "tokens", "namespace", "bands", "blob")
+
+    def __init__(self, idea: str, tokens: FrozenSet[str], namespace: str, bands: List[Tuple], blob: bytes):
+        self.idea = idea
+        self.tokens = tokens
+        self.namespace = namespace
+        self.bands = bands
+        self.blob = blob
+
+
+class SimilarIdeaIndex:
+    """
+    MinHash/LSH index of past travel ideas and their generated plans. Ideas
+    are reduced to content-word sets; candidates sharing an LSH band are
+    confirmed with the exact Jaccard similarity and must mention the same
+    numbers (a 5-day and a 7-day trip are never interchangeable) and the
+    same directed routes (Rome to Florence is not Florence to Rome). Entries
+    live in an LRU bounded by max_entries and are snapshotted to disk.
+    Matches only count within a namespace (model, temperature, max_length).
+    """
+
+    def __init__(
+            self,
+            threshold: float = SIMILAR_THRESHOLD,
+            max_entries: int = SIMILAR_MAX_ENTRIES,
+            path: Optional[str] = SIMILAR_INDEX_PATH,
+            enabled: bool = SIMILAR_ENABLED
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path or None
+        self.enabled = enabled
+        self.rows = NUM_PERM // BANDS
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.counters = {"hits": 0, "misses": 0, "adds": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(namespace: str, tokens: FrozenSet[str]) -> str:
+        return hashlib.sha256(json.dumps([namespace, sorted(tokens)]).encode("utf-8")).hexdigest()
+
+    def _bands(self, namespace: str, tokens: FrozenSet[str]) -> List[Tuple]:
+        signature = minhash(tokens)
+        return [(namespace, band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(BANDS)]
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def add(self, idea: str, namespace: str, text: str) -> None:
+        if not self.enabled:
+            return
+        tokens = idea_tokens(idea)
+        if not tokens:
+            return
+        key = self._key(namespace, tokens)
+        entry = _Entry(idea, tokens, namespace, self._bands(namespace, tokens), zlib.compress(text.encode("utf-8")))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for band in entry.bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+            self.counters["adds"] += 1
+            self._dirty = True
+
+    def lookup(self, idea: str, namespace: str) -> Optional[Tuple[str, str, float]]:
+        """(plan text, matched idea, similarity) of the closest stored idea at or above the threshold"""
+        if not self.enabled:
+            return None
+        tokens = idea_tokens(idea)
+        if not tokens:
+            return None
+        bands = self._bands(namespace, tokens)
+        numbers = _numbers(tokens)
+        routes = _route_tokens(tokens)
+        with self._lock:
+            candidates = set()
+            for band in bands:
+                candidates |= self._buckets.get(band, set())
+            best: Optional[Tuple[float, str]] = None
+            for key in candidates:
+                entry = self._entries[key]
+                if _numbers(entry.tokens) != numbers or _route_tokens(entry.tokens) != routes:
+                    continue
+                score = jaccard(tokens, entry.tokens)
+                if score >= self.threshold and (best is None or score > best[0]):
+                    best = (score, key)
+            if best is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best[1])
+            self.counters["hits"] += 1
+            entry = self._entries[best[1]]
+        return zlib.decompress(entry.blob).decode("utf-8"), entry.idea, round(best[0], 4)
+
+    # --- persistence ---
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except Exception as e:
+            logger.warning(f"Unreadable similarity index {self.path}: {str(e)}")
+            return
+        # Oldest first, so the LRU order survives the round trip; signatures are recomputed
+        for record in records:
+            self.add(record["idea"], record["namespace"], record["text"])
+        with self._lock:
+            self._dirty = False
+            self.counters["adds"] = 0
+        logger.info(f"Loaded {len(self._entries)} ideas into the similarity index")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            records = [
+                {"idea": e.idea, "namespace": e.namespace, "text": zlib.decompress(e.blob).decode("utf-8")}
+                for e in self._entries.values()
+            ]
+            self._dirty = False
+            self._last_save = time.monotonic()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to persist similarity index: {str(e)}")
+
+    def save_due(self) -> bool:
+        return self._dirty and time.monotonic() - self._last_save >= SIMILAR_SAVE_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "persistent": bool(self.path),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            **self.counters
+        }
@@ -3,9 +3,15 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import HTMLResponse
 from map_api.models import MapRenderRequest
 from map_api.renderer import render_map
+from common.metrics import install_metrics
+from common.health import install_health
+from common.serialization import install_serialization
 import logging
 
 app = FastAPI(title="Map API", version="0.1")
+install_metrics(app, "map_api")
+install_health(app, "map_api")
+install_serialization(app)
 
 logging.basicConfig(level=logging.INFO)
 
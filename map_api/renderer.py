@@ -3,7 +3,9 @@ import folium
 from folium import Map, Marker
 from map_api.models import MapRenderRequest
 from map_api.utils import estimate_center
+from common.metrics import REGISTRY
 import logging
+import time
 from typing import List, Dict, Any, Tuple
 
 # Configure logging
@@ -17,6 +19,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+RENDER_LATENCY = REGISTRY.histogram(
+    "map_render_duration_seconds", "Folium map render time", ("outcome",))
+RENDER_MARKERS = REGISTRY.histogram(
+    "map_render_entities", "Entities with valid coordinates per rendered map", (),
+    buckets=(0, 5, 10, 25, 50, 100, 250, 500, 1000))
+
 # Default colors and icons for different entity types
 DEFAULT_COLORS = {
     'cities': 'blue',
@@ -198,6 +206,7 @@ def render_map(data: MapRenderRequest) -> str:
         str: HTML representation of the map
     """
     logger.info("Starting map rendering process")
+    started = time.perf_counter()
 
     try:
         if not isinstance(data, MapRenderRequest):
@@ -211,6 +220,7 @@ def render_map(data: MapRenderRequest) -> str:
         }
 
         valid_entities, valid_coordinates = extract_valid_entities(entities)
+        RENDER_MARKERS.observe(len(valid_entities))
 
         if not valid_coordinates:
             logger.warning("No valid coordinates found - using default center")
@@ -235,9 +245,12 @@ def render_map(data: MapRenderRequest) -> str:
         folium.TileLayer('OpenStreetMap').add_to(fmap)
         folium.LayerControl().add_to(fmap)
 
+        html = fmap._repr_html_()
+        RENDER_LATENCY.observe(time.perf_counter() - started, outcome="success")
         logger.info("Map rendering completed successfully")
-        return fmap._repr_html_()
+        return html
 
     except Exception as e:
+        RENDER_LATENCY.observe(time.perf_counter() - started, outcome="error")
         logger.error(f"❌ Map rendering failed: {str(e)}", exc_info=True)
         raise RuntimeError(f"Map rendering failed: {str(e)}") from e
\ No newline at end of file
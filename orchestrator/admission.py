@@ -0,0 +1,211 @@
+# orchestrator/admission.py
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+# === Admission control configuration ===
+# These limits are per host. In ORCH_EXECUTION=queue mode every job worker process and
+# the web process (streamed trips) enforce their own share (limit // (ORCH_JOB_WORKERS + 1),
+# at least 1), so the total stays within the limit as long as there are not more processes.
+MAX_PIPELINES = int(os.getenv("ORCH_MAX_PIPELINES", "64"))  # trips admitted at once (running + queued on stages)
+STAGE_LIMITS = {
+    "LLM_API": int(os.getenv("ORCH_LIMIT_LLM", "2")),
+    "PARSER_API": int(os.getenv("ORCH_LIMIT_PARSER", "4")),
+    "GEO_API": int(os.getenv("ORCH_LIMIT_GEO", "2")),
+    "MAP_API": int(os.getenv("ORCH_LIMIT_MAP", "4")),
+}
+DEFAULT_STAGE_LIMIT = int(os.getenv("ORCH_LIMIT_DEFAULT", "8"))
+STAGE_MAX_QUEUE = int(os.getenv("ORCH_STAGE_MAX_QUEUE", "64"))
+STAGE_QUEUE_TIMEOUT = float(os.getenv("ORCH_STAGE_QUEUE_TIMEOUT", "300"))  # seconds
+MAX_RETRY_AFTER = 120  # seconds
+
+# Upper bounds (seconds) of the queue-time histogram buckets
+QUEUE_TIME_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300)
+
+logger = logging.getLogger(__name__)
+
+
+class Saturated(Exception):
+    """Raised when a limiter cannot accept more work; carries a Retry-After hint"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is saturated, retry after {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Async semaphore with a bounded FIFO wait queue and queue-time metrics.
+    Callers beyond limit + max_queue are rejected immediately instead of
+    piling up behind a slow stage.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = STAGE_MAX_QUEUE,
+                 queue_timeout: float = STAGE_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # EWMA of how long a slot is held, used for Retry-After estimates
+        self._service_time = 1.0
+        self.metrics = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "queue_time_total": 0.0,
+            "queue_time_max": 0.0
+        }
+        self.queue_time_histogram = {le: 0 for le in QUEUE_TIME_BUCKETS}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def has_capacity(self) -> bool:
+        """True if a slot can be taken right now without queueing"""
+        return self.active < self.limit and not self._waiters
+
+    def retry_after(self) -> int:
+        estimate = self._service_time * (self.waiting + 1) / self.limit
+        return int(min(MAX_RETRY_AFTER, max(1, math.ceil(estimate))))
+
+    def _record_wait(self, waited: float) -> None:
+        self.metrics["admitted"] += 1
+        self.metrics["queue_time_total"] += waited
+        self.metrics["queue_time_max"] = max(self.metrics["queue_time_max"], waited)
+        for le in QUEUE_TIME_BUCKETS:
+            if waited <= le:
+                self.queue_time_histogram[le] += 1
+                break
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self._record_wait(0.0)
+            return
+        if self.waiting >= self.max_queue:
+            self.metrics["rejected"] += 1
+            raise Saturated(self.name, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                self.metrics["timed_out"] += 1
+                raise Saturated(self.name, self.retry_after())
+            # Slot was handed over just as we timed out: it is ours, keep it
+        except BaseException:
+            # Slot was handed over just as we were cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self._record_wait(time.monotonic() - started)
+
+    def release(self) -> None:
+        # Hand the slot directly to the next live waiter so nobody can barge in
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active = max(0, self.active - 1)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self.metrics["admitted"]
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            **self.metrics,
+            "queue_time_avg": round(self.metrics["queue_time_total"] / admitted, 4) if admitted else 0.0,
+            "queue_time_histogram": {str(le): n for le, n in self.queue_time_histogram.items()},
+            "service_time_ewma": round(self._service_time, 3)
+        }
+
+
+def worker_share(limit: int, workers: int) -> int:
+    """One process's part of a host-wide limit split across `workers` processes"""
+    return max(1, limit // max(1, workers))
+
+
+class AdmissionController:
+    """
+    Pipeline-level admission plus one ConcurrencyLimiter per downstream stage.
+    With workers > 1 the controller enforces this process's share of the limits.
+    """
+
+    def __init__(self, max_pipelines: int = MAX_PIPELINES, stage_limits: Optional[Dict[str, int]] = None,
+                 workers: int = 1):
+        self.workers = max(1, workers)
+        self.max_pipelines = worker_share(max_pipelines, self.workers)
+        self.pipelines = 0
+        self.rejected = 0
+        self._pipeline_time = 30.0
+        self.stages: Dict[str, ConcurrencyLimiter] = {
+            name: ConcurrencyLimiter(name, worker_share(limit, self.workers))
+            for name, limit in (stage_limits or STAGE_LIMITS).items()
+        }
+        for name, limit in (stage_limits or STAGE_LIMITS).items():
+            if limit < self.workers:
+                logger.warning(
+                    f"{name} limit {limit} is below the {self.workers} processes sharing it; "
+                    f"up to {self.workers} calls may run at once"
+                )
+
+    def stage(self, name: Optional[str]) -> ConcurrencyLimiter:
+        key = name or "DEFAULT"
+        if key not in self.stages:
+            self.stages[key] = ConcurrencyLimiter(key, worker_share(DEFAULT_STAGE_LIMIT, self.workers))
+        return self.stages[key]
+
+    def admit(self) -> None:
+        """Reserve a pipeline slot without waiting, or raise Saturated"""
+        if self.pipelines >= self.max_pipelines:
+            self.rejected += 1
+            # A pipeline slot frees up roughly every pipeline_time / max_pipelines seconds,
+            # but never sooner than the most backed-up stage can take new work
+            retry_after = math.ceil(self._pipeline_time / self.max_pipelines)
+            for limiter in self.stages.values():
+                retry_after = max(retry_after, limiter.retry_after())
+            raise Saturated("orchestrator", int(min(MAX_RETRY_AFTER, max(1, retry_after))))
+        self.pipelines += 1
+
+    def finish(self, duration: Optional[float] = None) -> None:
+        self.pipelines = max(0, self.pipelines - 1)
+        if duration is not None:
+            self._pipeline_time = 0.8 * self._pipeline_time + 0.2 * duration
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pipelines": self.pipelines,
+            "max_pipelines": self.max_pipelines,
+            "workers": self.workers,
+            "rejected": self.rejected,
+            "pipeline_time_ewma": round(self._pipeline_time, 3),
+            "stages": {name: limiter.stats() for name, limiter in self.stages.items()}
+        }
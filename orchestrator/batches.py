@@ -0,0 +1,148 @@
+# orchestrator/batches.py
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+# === Batch planning configuration ===
+BATCH_WORKERS = int(os.getenv("ORCH_BATCH_WORKERS", "4"))  # pipelines run concurrently for batches
+BATCH_MAX_ITEMS = int(os.getenv("ORCH_BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_TRACKED = int(os.getenv("ORCH_BATCH_MAX_TRACKED", "1000"))  # batches kept for /plan-trips/{id}
+# Seconds between admission attempts of an item while the orchestrator is saturated
+BATCH_ADMISSION_RETRY = float(os.getenv("ORCH_BATCH_ADMISSION_RETRY", "1"))
+
+Job = Callable[[], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+class FairScheduler:
+    """
+    Round-robin over users, FIFO within a user. A user submitting a batch of
+    thousands of items only gets one turn per round, so a small batch from
+    someone else is not stuck behind it.
+    """
+
+    def __init__(self):
+        self._queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.pending = 0
+
+    def submit(self, user_id: str, job: Job) -> None:
+        self._queues.setdefault(user_id, deque()).append(job)
+        self.pending += 1
+        self._ready.set()
+
+    async def next(self) -> Job:
+        while not self._queues:
+            self._ready.clear()
+            await self._ready.wait()
+        user_id, jobs = next(iter(self._queues.items()))
+        job = jobs.popleft()
+        # Move the user to the back of the rotation, or drop them if drained
+        del self._queues[user_id]
+        if jobs:
+            self._queues[user_id] = jobs
+        self.pending -= 1
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "users": {user_id: len(jobs) for user_id, jobs in self._queues.items()}
+        }
+
+
+class WorkerPool:
+    """Fixed number of tasks pulling jobs from a FairScheduler"""
+
+    def __init__(self, scheduler: FairScheduler, size: int = BATCH_WORKERS):
+        self.scheduler = scheduler
+        self.size = max(1, size)
+        self.busy = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.scheduler.next()
+            self.busy += 1
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Batch job failed: {str(e)}", exc_info=True)
+            finally:
+                self.busy -= 1
+
+
+class BatchTracker:
+    """Per-item status and aggregate progress for submitted batches"""
+
+    def __init__(self, max_tracked: int = BATCH_MAX_TRACKED):
+        self.max_tracked = max_tracked
+        self._batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create(self, batch_id: str, user_id: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        batch = {
+            "batch_id": batch_id,
+            "user_id": user_id,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "started": time.monotonic(),
+            "items": items
+        }
+        self._batches[batch_id] = batch
+        self._evict()
+        return batch
+
+    def _evict(self) -> None:
+        # Drop the oldest finished batches first; never forget one that is still running
+        for batch_id in list(self._batches):
+            if len(self._batches) <= self.max_tracked:
+                break
+            if self.summary(self._batches[batch_id])["status"] != "processing":
+                del self._batches[batch_id]
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        return self._batches.get(batch_id)
+
+    def items_finished(self, batch_id: str) -> None:
+        """Stamp the finish time once the last item of a batch is done"""
+        batch = self._batches.get(batch_id)
+        if batch and "finished" not in batch and all(
+                item["status"] in ("completed", "error") for item in batch["items"]):
+            batch["finished"] = time.monotonic()
+
+    @staticmethod
+    def summary(batch: Dict[str, Any]) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for item in batch["items"]:
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        total = len(batch["items"])
+        finished = counts.get("completed", 0) + counts.get("error", 0)
+        return {
+            "batch_id": batch["batch_id"],
+            "user_id": batch["user_id"],
+            "created": batch["created"],
+            "status": "processing" if finished < total else ("completed" if not counts.get("error") else "completed_with_errors"),
+            "total": total,
+            "counts": counts,
+            "progress": round(finished / total, 4) if total else 1.0,
+            "elapsed_seconds": round(batch.get("finished", time.monotonic()) - batch["started"], 3)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked": len(self._batches)}
@@ -0,0 +1,204 @@
+# orchestrator/discovery.py
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# === Service discovery / load balancing configuration ===
+# Per-service instance lists: ORCH_<SERVICE>_INSTANCES="http://host-a:8003,http://host-b:8003"
+BALANCER_STRATEGY = os.getenv("ORCH_BALANCER", "least_outstanding").lower()  # least_outstanding | p2c
+HEALTH_PATH = os.getenv("ORCH_HEALTH_PATH", "/health")
+HEALTH_INTERVAL = float(os.getenv("ORCH_HEALTH_INTERVAL", "5"))  # seconds between active checks
+HEALTH_TIMEOUT = float(os.getenv("ORCH_HEALTH_TIMEOUT", "2"))
+EJECT_FAILURES = int(os.getenv("ORCH_EJECT_FAILURES", "3"))  # consecutive failures before ejection
+EJECT_SECONDS = float(os.getenv("ORCH_EJECT_SECONDS", "10"))  # doubled on each repeated ejection
+EJECT_MAX_SECONDS = float(os.getenv("ORCH_EJECT_MAX_SECONDS", "120"))
+LATENCY_ALPHA = 0.2  # EWMA weight of the newest sample
+
+logger = logging.getLogger(__name__)
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """'http://host:8002/geocode' -> ('http://host:8002', '/geocode')"""
+    # ServiceURLs members are str subclasses, but str() of them is the member name
+    parts = urlsplit(getattr(url, "value", url))
+    return f"{parts.scheme}://{parts.netloc}", parts.path
+
+
+class Instance:
+    """One replica of a downstream service and what the balancer knows about it"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True  # last active health check
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.latency = 0.0  # EWMA seconds
+        self.requests = 0
+        self.failures = 0
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.ejected_until <= time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 3),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ewma": round(self.latency, 4)
+        }
+
+
+class ServiceBalancer:
+    """
+    Picks an instance per request: least outstanding requests, or the
+    better of two random choices (p2c). Instances failing their health
+    check, or failing requests EJECT_FAILURES times in a row, are taken out
+    of rotation; if that leaves nothing, all instances are used anyway.
+    """
+
+    def __init__(self, name: str, base_urls: Iterable[str], strategy: str = BALANCER_STRATEGY):
+        self.name = name
+        self.instances = [Instance(url) for url in base_urls]
+        self.strategy = strategy if strategy in ("least_outstanding", "p2c") else "least_outstanding"
+
+    def pick(self) -> Instance:
+        candidates = [i for i in self.instances if i.available] or self.instances
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "p2c":
+            candidates = random.sample(candidates, 2)
+        # Fewest in flight, then fastest; the shuffle spreads ties
+        random.shuffle(candidates)
+        return min(candidates, key=lambda i: (i.outstanding, i.latency))
+
+    def record_success(self, instance: Instance, seconds: float) -> None:
+        instance.consecutive_failures = 0
+        instance.ejections = 0
+        instance.latency = seconds if instance.latency == 0 else (
+            LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * instance.latency)
+
+    def record_failure(self, instance: Instance) -> None:
+        instance.failures += 1
+        instance.consecutive_failures += 1
+        if instance.consecutive_failures < EJECT_FAILURES or not instance.available:
+            return
+        if not any(i.available for i in self.instances if i is not instance):
+            # Never eject the last instance standing; retries would have nowhere to go
+            return
+        duration = min(EJECT_SECONDS * 2 ** instance.ejections, EJECT_MAX_SECONDS)
+        instance.ejections += 1
+        instance.ejected_until = time.monotonic() + duration
+        logger.warning(f"Ejected {self.name} instance {instance.base_url} for {duration:.0f}s "
+                       f"after {instance.consecutive_failures} failures")
+
+    @asynccontextmanager
+    async def instance(self) -> AsyncIterator[Instance]:
+        """Pick an instance and account the request against it"""
+        instance = self.pick()
+        instance.outstanding += 1
+        instance.requests += 1
+        started = time.monotonic()
+        try:
+            yield instance
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                self.record_failure(instance)
+            else:
+                self.record_success(instance, time.monotonic() - started)
+            raise
+        except httpx.RequestError:
+            self.record_failure(instance)
+            raise
+        else:
+            self.record_success(instance, time.monotonic() - started)
+        finally:
+            instance.outstanding -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "available": sum(1 for i in self.instances if i.available),
+            "instances": [i.stats() for i in self.instances]
+        }
+
+
+class ServiceRegistry:
+    """Instance lists for every downstream service plus a background health checker"""
+
+    def __init__(self, default_urls: Dict[str, str], strategy: str = BALANCER_STRATEGY):
+        self.balancers: Dict[str, ServiceBalancer] = {}
+        for name, url in default_urls.items():
+            configured = os.getenv(f"ORCH_{name}_INSTANCES", "")
+            base_urls = [u.strip() for u in configured.split(",") if u.strip()] or [split_url(url)[0]]
+            self.balancers[name] = ServiceBalancer(name, base_urls, strategy)
+        self._health_task: Optional[asyncio.Task] = None
+
+    def get(self, name: Optional[str]) -> Optional[ServiceBalancer]:
+        return self.balancers.get(name) if name else None
+
+    @asynccontextmanager
+    async def target(self, name: Optional[str], url: str) -> AsyncIterator[str]:
+        """URL to call for this request: `url`'s path on a balanced instance of `name`"""
+        balancer = self.get(name)
+        if balancer is None:
+            yield url
+            return
+        async with balancer.instance() as instance:
+            yield instance.url(split_url(url)[1])
+
+    def start(self, client_factory: Callable[[], httpx.AsyncClient]) -> None:
+        # A single instance per service has nothing to fail over to; skip the probes
+        if self._health_task is None and any(len(b.instances) > 1 for b in self.balancers.values()):
+            self._health_task = asyncio.create_task(self._health_loop(client_factory))
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    async def _check(self, client: httpx.AsyncClient, balancer: ServiceBalancer, instance: Instance) -> None:
+        try:
+            response = await client.get(instance.url(HEALTH_PATH), timeout=HEALTH_TIMEOUT)
+            healthy = response.status_code < 500
+        except Exception:
+            # Any failed probe, not only transport errors, counts against the instance
+            healthy = False
+        if healthy != instance.healthy:
+            logger.warning(f"{balancer.name} instance {instance.base_url} is now "
+                           f"{'healthy' if healthy else 'unhealthy'}")
+        instance.healthy = healthy
+
+    async def _health_loop(self, client_factory: Callable[[], httpx.AsyncClient]) -> None:
+        while True:
+            try:
+                client = client_factory()
+                await asyncio.gather(*(
+                    self._check(client, balancer, instance)
+                    for balancer in self.balancers.values() if len(balancer.instances) > 1
+                    for instance in balancer.instances
+                ))
+            except Exception as e:
+                # Never let one bad round end the loop: instances would stay as they are for good
+                logger.warning(f"Health check round failed: {str(e)}")
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: balancer.stats() for name, balancer in self.balancers.items()}
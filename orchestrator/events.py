@@ -0,0 +1,104 @@
+# orchestrator/events.py
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# === Progress event streaming configuration ===
+EVENT_QUEUE_SIZE = int(os.getenv("ORCH_EVENT_QUEUE_SIZE", "2000"))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("ORCH_SSE_HEARTBEAT", "15"))  # seconds
+SSE_POLL_INTERVAL = float(os.getenv("ORCH_SSE_POLL_INTERVAL", "1"))  # seconds between outcome checks
+
+# Events after which a request stream is finished
+TERMINAL_EVENTS = ("done", "error")
+
+logger = logging.getLogger(__name__)
+
+
+class RequestEventBus:
+    """
+    In-process fan-out of per-request progress events.
+    process_travel_request publishes stage transitions, LLM tokens and stage
+    payloads; SSE handlers subscribe with a bounded queue per connection.
+    Publishing is free when nobody is listening.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self.dropped = 0
+
+    def subscribe(self, request_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(request_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, request_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(request_id)
+        if not queues:
+            return
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            del self._subscribers[request_id]
+
+    def has_subscribers(self, request_id: str) -> bool:
+        return bool(self._subscribers.get(request_id))
+
+    def publish(self, request_id: str, event: str, data: Optional[Any] = None) -> None:
+        for queue in self._subscribers.get(request_id, []):
+            if queue.full():
+                if event not in TERMINAL_EVENTS:
+                    # Slow consumer: drop intermediate events, never the final one
+                    self.dropped += 1
+                    continue
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait((event, data))
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event frame"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# Checks whether a request already finished; returns its terminal (event, data) or None
+OutcomePoll = Callable[[], Awaitable[Optional[Tuple[str, Any]]]]
+
+
+async def sse_stream(bus: RequestEventBus, request_id: str, queue: asyncio.Queue,
+                     heartbeat: float = SSE_HEARTBEAT_INTERVAL, poll: Optional[OutcomePoll] = None,
+                     poll_interval: float = SSE_POLL_INTERVAL):
+    """
+    Yield SSE frames for one request until a terminal event arrives. With
+    `poll`, the request's stored outcome is checked whenever no event is
+    queued, for subscribers that joined after the pipeline finished or whose
+    pipeline publishes its events in another process.
+    """
+    wait = min(heartbeat, poll_interval) if poll is not None else heartbeat
+    idle = 0.0
+    try:
+        yield format_sse("accepted", {"request_id": request_id})
+        while True:
+            if poll is not None and queue.empty():
+                outcome = await poll()
+                if outcome is not None:
+                    yield format_sse(*outcome)
+                    break
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=wait)
+            except asyncio.TimeoutError:
+                idle += wait
+                if idle >= heartbeat:
+                    # Comment frame keeps proxies from closing an idle connection
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                continue
+            idle = 0.0
+            yield format_sse(event, data)
+            if event in TERMINAL_EVENTS:
+                break
+    finally:
+        bus.unsubscribe(request_id, queue)
@@ -0,0 +1,119 @@
+# orchestrator/http_clients.py
+import importlib.util
+import logging
+import os
+from typing import Dict, Optional, Any
+
+import httpx
+
+# === Connection pool configuration ===
+POOL_MAX_CONNECTIONS = int(os.getenv("ORCH_POOL_MAX_CONNECTIONS", "50"))
+POOL_MAX_KEEPALIVE = int(os.getenv("ORCH_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("ORCH_POOL_KEEPALIVE_EXPIRY", "30"))
+SERVICE_TIMEOUT = float(os.getenv("ORCH_SERVICE_TIMEOUT", "120"))
+CALLBACK_TIMEOUT = float(os.getenv("ORCH_CALLBACK_TIMEOUT", "2"))
+HTTP2_ENABLED = os.getenv("ORCH_HTTP2", "false").lower() == "true"
+
+CALLBACK_POOL = "CALLBACKS"
+DEFAULT_POOL = "DEFAULT"
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional 'h2' package (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ServiceClientPool:
+    """Long-lived keep-alive httpx clients, one per downstream service"""
+
+    def __init__(
+            self,
+            max_connections: int = POOL_MAX_CONNECTIONS,
+            max_keepalive: int = POOL_MAX_KEEPALIVE,
+            keepalive_expiry: float = POOL_KEEPALIVE_EXPIRY,
+            http2: bool = HTTP2_ENABLED
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        if http2 and not http2_available():
+            logger.warning("ORCH_HTTP2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._request_counts: Dict[str, int] = {}
+
+    def _new_client(self, timeout: float) -> httpx.AsyncClient:
+        return httpx.AsyncClient(timeout=timeout, limits=self.limits, http2=self.http2)
+
+    async def startup(self, service_names) -> None:
+        """Open one pool per service plus shared pools for callbacks and unknown URLs"""
+        for name in list(service_names) + [DEFAULT_POOL]:
+            if name not in self._clients:
+                self._clients[name] = self._new_client(SERVICE_TIMEOUT)
+        if CALLBACK_POOL not in self._clients:
+            self._clients[CALLBACK_POOL] = self._new_client(CALLBACK_TIMEOUT)
+        logger.info(
+            f"HTTP pools ready for {', '.join(self._clients)} "
+            f"(max_connections={self.limits.max_connections}, http2={self.http2})"
+        )
+
+    async def shutdown(self) -> None:
+        """Close every pool, draining keep-alive connections"""
+        for name, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP pool {name}: {str(e)}")
+        self._clients.clear()
+
+    def get(self, name: Optional[str] = None) -> httpx.AsyncClient:
+        """Return the pooled client for a service, creating it lazily if startup did not run"""
+        key = name or DEFAULT_POOL
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            timeout = CALLBACK_TIMEOUT if key == CALLBACK_POOL else SERVICE_TIMEOUT
+            client = self._clients[key] = self._new_client(timeout)
+        self._request_counts[key] = self._request_counts.get(key, 0) + 1
+        return client
+
+    def callback_client(self) -> httpx.AsyncClient:
+        return self.get(CALLBACK_POOL)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-pool connection counts taken from the underlying httpcore pool"""
+        pools = {}
+        for name, client in self._clients.items():
+            connections = []
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            if pool is not None:
+                connections = list(getattr(pool, "connections", []))
+            idle = sum(1 for c in connections if _safe_call(c, "is_idle"))
+            pools[name] = {
+                "connections": len(connections),
+                "idle": idle,
+                "active": len(connections) - idle,
+                "http2": sum(1 for c in connections if "HTTP/2" in repr(c)),
+                "requests": self._request_counts.get(name, 0),
+                "closed": client.is_closed
+            }
+        return {
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry
+            },
+            "http2": self.http2,
+            "pools": pools
+        }
+
+
+def _safe_call(obj: Any, method: str) -> bool:
+    try:
+        return bool(getattr(obj, method)())
+    except Exception:
+        return False
@@ -0,0 +1,89 @@
+# orchestrator/inprocess.py
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Union
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Fields MapRenderRequest shares with GeoResponse
+MAP_FIELDS = ("cities", "landmarks", "hotels", "roads", "transport_segments", "bounding_box")
+
+
+def as_dict(obj: Any) -> Any:
+    """Plain-dict view of a stage result, whether it came over HTTP or in-process"""
+    return obj.model_dump() if isinstance(obj, BaseModel) else obj
+
+
+class InProcessStages:
+    """
+    Runs the four pipeline stages as direct function calls into the service
+    packages instead of over localhost HTTP. Stage results stay pydantic
+    models, so nothing is serialized to JSON between stages and the geo
+    output reaches the map renderer without being validated again.
+    """
+
+    def __init__(self):
+        # Imported lazily: the service packages pull in spaCy, folium and friends
+        from llm_api.main import generate_travel_text
+        from llm_api.models import TravelIdeaRequest
+        from parser_api.main import parse_travel_plan, stream_parse_messages
+        from parser_api.models import ParserInput
+        from geo_api.geocoder import geocode_all, geocode_feed
+        from geo_api.models import GeoRequest
+        from map_api.models import MapRenderRequest
+        from map_api.renderer import render_map
+
+        self._generate_travel_text = generate_travel_text
+        self._travel_idea_request = TravelIdeaRequest
+        self._parse_travel_plan = parse_travel_plan
+        self._stream_parse_messages = stream_parse_messages
+        self._parser_input = ParserInput
+        self._geocode_all = geocode_all
+        self._geocode_feed = geocode_feed
+        self._geo_request = GeoRequest
+        self._map_render_request = MapRenderRequest
+        self._render_map = render_map
+        self._handlers = {
+            "LLM_API": self.generate,
+            "PARSER_API": self.parse,
+            "GEO_API": self.geocode,
+            "MAP_API": self.render,
+        }
+        logger.info("In-process pipeline stages loaded")
+
+    async def call(self, api_name: str, payload: Any) -> Any:
+        handler = self._handlers.get(api_name)
+        if handler is None:
+            raise ValueError(f"No in-process handler for {api_name}")
+        return await handler(payload)
+
+    async def generate(self, payload: Dict[str, Any]):
+        return await self._generate_travel_text(self._travel_idea_request(**payload))
+
+    async def parse(self, payload: Dict[str, Any]):
+        # Same hybrid LLMParser/ParserFallback path as parser_api's /parse
+        return await self._parse_travel_plan(self._parser_input(**payload))
+
+    def parse_stream(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Entity messages of parser_api's /parse/stream, without the NDJSON framing"""
+        return self._stream_parse_messages(self._parser_input(**payload))
+
+    async def geocode_stream(self, messages: AsyncIterator[Dict[str, Any]]):
+        return await self._geocode_feed(messages)
+
+    async def geocode(self, parsed: Union[BaseModel, Dict[str, Any]]):
+        request = self._geo_request.model_validate(as_dict(parsed))
+        return await self._geocode_all(request)
+
+    async def render(self, geo: Union[BaseModel, Dict[str, Any]]) -> str:
+        if isinstance(geo, BaseModel):
+            # Trust the GeoResponse models as they are; the renderer only reads attributes
+            data = self._map_render_request.model_construct(
+                **{field: getattr(geo, field, None) for field in MAP_FIELDS}
+            )
+        else:
+            data = self._map_render_request(**geo)
+        # Folium rendering is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self._render_map, data)
@@ -0,0 +1,238 @@
+# orchestrator/job_queue.py
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from orchestrator.state_store import pack_result, unpack_result
+
+# === Durable job queue configuration ===
+JOB_DB_PATH = os.getenv("ORCH_JOB_DB", "orchestrator_jobs.db")
+JOB_LEASE_SECONDS = float(os.getenv("ORCH_JOB_LEASE_SECONDS", "30"))  # renewed by heartbeats while running
+JOB_MAX_ATTEMPTS = int(os.getenv("ORCH_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY = float(os.getenv("ORCH_JOB_RETRY_DELAY", "5"))  # seconds, multiplied by the attempt number
+JOB_RETENTION = float(os.getenv("ORCH_JOB_RETENTION", "86400"))  # finished jobs kept for /status
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,           -- queued | running | completed | error
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,     -- not leased before this time (retry backoff)
+    lease_owner TEXT,
+    lease_expires REAL,
+    stage TEXT,                     -- last completed pipeline stage
+    checkpoint TEXT,                -- JSON outputs of the completed stages
+    result BLOB,                    -- pack_result() of the finished trip
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at, created);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker may have taken it over"""
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobQueue:
+    """
+    SQLite-backed queue shared by the web process and the worker processes.
+    Jobs are leased for a limited time and renewed by heartbeats; a lease
+    that runs out (crashed or killed worker) makes the job available again,
+    so delivery is at-least-once. Completed stage outputs are checkpointed
+    on the job row so a re-delivered job resumes after its last stage.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay: float = JOB_RETRY_DELAY,
+                 retention: float = JOB_RETENTION):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention = retention
+        # One connection per queue object, used from worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, payload, status, available_at, created, updated, start_time) "
+            "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, json.dumps(payload), now, now, now, _now_iso())
+        )
+
+    def lease(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Claim the oldest runnable job: queued, or running with an expired lease"""
+        now = time.time()
+        with self._lock:
+            # Expired leases that used up their attempts are failed rather than re-run forever
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = 'Lease expired on the last attempt', "
+                "lease_owner = NULL, end_time = ?, updated = ? "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (_now_iso(), now, now, self.max_attempts)
+            )
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated = ? "
+                "WHERE id = (SELECT id FROM jobs "
+                "            WHERE (status = 'queued' AND available_at <= ?) "
+                "               OR (status = 'running' AND lease_expires < ?) "
+                "            ORDER BY created LIMIT 1) "
+                "RETURNING id, payload, attempts, stage, checkpoint",
+                (owner, now + self.lease_seconds, now, now, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "payload": json.loads(row["payload"]),
+            "attempts": row["attempts"],
+            "stage": row["stage"],
+            "checkpoint": json.loads(row["checkpoint"]) if row["checkpoint"] else {}
+        }
+
+    def heartbeat(self, job_id: str, owner: str) -> None:
+        cursor = self._execute(
+            "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, time.time(), job_id, owner)
+        )
+        if cursor.rowcount == 0:
+            raise LeaseLost(job_id)
+
+    def checkpoint(self, job_id: str, owner: str, stage: str, completed: Dict[str, Any]) -> None:
+        """Record the outputs of the stages completed so far; also renews the lease"""
+        cursor = self._execute(
+            "UPDATE jobs SET stage = ?, checkpoint = ?, lease_expires = ?, updated = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (stage, json.dumps(completed, ensure_ascii=False), time.time() + self.lease_seconds,
+             time.time(), job_id, owner)
+        )
+        if cursor.rowcount == 0:
+            raise LeaseLost(job_id)
+
+    def complete(self, job_id: str, owner: str, result: Any) -> bool:
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'completed', result = ?, checkpoint = NULL, lease_owner = NULL, "
+            "error = NULL, end_time = ?, updated = ? WHERE id = ? AND lease_owner = ?",
+            (pack_result(result), _now_iso(), time.time(), job_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job_id: str, owner: str, error: str) -> bool:
+        """Requeue with backoff while attempts remain, otherwise mark the job as failed"""
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET "
+            "status = CASE WHEN attempts < ? THEN 'queued' ELSE 'error' END, "
+            "available_at = ? + attempts * ?, "
+            "end_time = CASE WHEN attempts < ? THEN NULL ELSE ? END, "
+            "error = ?, lease_owner = NULL, updated = ? "
+            "WHERE id = ? AND lease_owner = ?",
+            (self.max_attempts, now, self.retry_delay, self.max_attempts, _now_iso(), error, now, job_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def release(self, job_id: str, owner: str) -> None:
+        """Hand a job back untouched (worker shutting down); the attempt is not counted"""
+        self._execute(
+            "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+            "available_at = ?, updated = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (time.time(), time.time(), job_id, owner)
+        )
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job as /status reports it"""
+        row = self._execute(
+            "SELECT id, payload, status, attempts, stage, result, error, start_time, end_time "
+            "FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = {
+            "status": "processing" if row["status"] == "running" else row["status"],
+            "start_time": row["start_time"],
+            "user_id": json.loads(row["payload"]).get("user_id"),
+            "attempts": row["attempts"],
+            "last_completed_stage": row["stage"]
+        }
+        if row["end_time"]:
+            data["end_time"] = row["end_time"]
+        if row["error"]:
+            data["error"] = row["error"]
+        if row["result"] is not None:
+            data["result"] = unpack_result(row["result"])
+        return data
+
+    def pending(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def purge(self) -> int:
+        """Drop finished jobs older than the retention period"""
+        cursor = self._execute(
+            "DELETE FROM jobs WHERE status IN ('completed', 'error') AND updated < ?",
+            (time.time() - self.retention,)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {row["status"]: row["n"] for row in self._execute(
+            "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()}
+        oldest = self._execute("SELECT MIN(created) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "path": self.path,
+            "counts": counts,
+            "oldest_queued_seconds": round(time.time() - oldest, 3) if oldest else 0,
+            "lease_seconds": self.lease_seconds,
+            "max_attempts": self.max_attempts
+        }
+
+
+class JobCheckpoint:
+    """Completed-stage outputs of a leased job, persisted as each stage finishes"""
+
+    def __init__(self, queue: JobQueue, job_id: str, owner: str, completed: Optional[Dict[str, Any]] = None):
+        self.queue = queue
+        self.job_id = job_id
+        self.owner = owner
+        self.completed: Dict[str, Any] = dict(completed or {})
+
+    async def save(self, stage: str, data: Any) -> None:
+        self.completed[stage] = data
+        await asyncio.to_thread(self.queue.checkpoint, self.job_id, self.owner, stage, self.completed)
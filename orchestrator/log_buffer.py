@@ -0,0 +1,113 @@
+# orchestrator/log_buffer.py
+import logging
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+LOG_RING_SIZE = int(os.getenv("ORCH_LOG_RING_SIZE", "5000"))  # lines kept in memory
+TAIL_BLOCK_SIZE = 64 * 1024
+TAIL_MAX_SCAN_BYTES = int(os.getenv("ORCH_LOG_TAIL_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Request-scoped log lines start with "[<uuid>]" after the formatter prefix
+REQUEST_ID_RE = re.compile(r"\[([0-9a-fA-F-]{36})\]")
+# Matches both the text format (" - LEVEL - ") and JSON records ("level": "LEVEL")
+LEVEL_RE = re.compile(r'(?: - |"level": ")(DEBUG|INFO|WARNING|ERROR|CRITICAL)(?: - |")')
+
+# (levelno, request_id, formatted line)
+BufferedLine = Tuple[int, Optional[str], str]
+
+
+def parse_level(name: Optional[str]) -> int:
+    """Turn 'warning'/'WARNING'/'30' into a logging level number (0 = no filter)"""
+    if not name:
+        return 0
+    if name.isdigit():
+        return int(name)
+    level = logging.getLevelName(name.upper())
+    return level if isinstance(level, int) else 0
+
+
+def line_matches(line: str, request_id: Optional[str], min_level: int) -> bool:
+    """Filter for raw log file lines"""
+    if request_id and request_id not in line:
+        return False
+    if min_level:
+        match = LEVEL_RE.search(line)
+        if not match or logging.getLevelName(match.group(1)) < min_level:
+            return False
+    return True
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last N formatted log lines in memory for /debug/logs"""
+
+    def __init__(self, capacity: int = LOG_RING_SIZE):
+        super().__init__()
+        self.capacity = capacity
+        self.records: Deque[BufferedLine] = deque(maxlen=capacity)
+        self.total = 0
+        self._ring_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record)
+            request_id = getattr(record, "request_id", None)
+            if request_id is None:
+                match = REQUEST_ID_RE.search(record.getMessage())
+                request_id = match.group(1) if match else None
+            with self._ring_lock:
+                self.records.append((record.levelno, request_id, line + "\n"))
+                self.total += 1
+        except Exception:
+            self.handleError(record)
+
+    def tail(self, lines: int, request_id: Optional[str] = None, min_level: int = 0) -> List[str]:
+        with self._ring_lock:
+            snapshot = list(self.records)
+        result: List[str] = []
+        for levelno, rid, line in reversed(snapshot):
+            if len(result) >= lines:
+                break
+            if request_id and rid != request_id:
+                continue
+            if levelno < min_level:
+                continue
+            result.append(line)
+        result.reverse()
+        return result
+
+
+def tail_file(path: str, lines: int, predicate: Optional[Callable[[str], bool]] = None,
+              max_scan_bytes: int = TAIL_MAX_SCAN_BYTES) -> List[str]:
+    """
+    Return the last `lines` matching lines of a file by reading fixed-size
+    blocks backwards from the end, so cost depends on how far back the
+    matches are rather than on the file size.
+    """
+    result: List[str] = []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        scanned = 0
+        remainder = b""
+        while position > 0 and len(result) < lines and scanned < max_scan_bytes:
+            size = min(TAIL_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            scanned += size
+            chunks = block.split(b"\n")
+            # The first chunk may be a partial line; keep it for the next block
+            remainder = chunks.pop(0) if position > 0 else b""
+            for raw in reversed(chunks):
+                if not raw:
+                    continue
+                line = raw.decode("utf-8", errors="replace") + "\n"
+                if predicate is None or predicate(line):
+                    result.append(line)
+                    if len(result) >= lines:
+                        break
+    result.reverse()
+    return result
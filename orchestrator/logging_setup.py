@@ -0,0 +1,186 @@
+# orchestrator/logging_setup.py
+import copy
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, List, Optional
+
+from orchestrator.log_buffer import REQUEST_ID_RE
+
+# === Logging configuration ===
+LOG_FORMAT = os.getenv("ORCH_LOG_FORMAT", "json").lower()  # log file/ring format: json | text
+LOG_QUEUE_SIZE = int(os.getenv("ORCH_LOG_QUEUE_SIZE", "10000"))
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# === Payload logging (VERBOSE_API_LOG) configuration ===
+PAYLOAD_LOG_MAX_CHARS = int(os.getenv("ORCH_PAYLOAD_LOG_MAX_CHARS", "2000"))
+PAYLOAD_LOG_SAMPLE_RATE = float(os.getenv("ORCH_PAYLOAD_LOG_SAMPLE_RATE", "1.0"))
+PAYLOAD_LOG_SERVICES = [
+    s for s in os.getenv("ORCH_PAYLOAD_LOG_SERVICES", "LLM_API,PARSER_API,GEO_API,MAP_API").split(",") if s
+]
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _request_id(record: logging.LogRecord) -> Optional[str]:
+    request_id = getattr(record, "request_id", None)
+    if request_id is None:
+        match = REQUEST_ID_RE.search(record.getMessage())
+        request_id = match.group(1) if match else None
+    return request_id
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id plus any extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = _request_id(record)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key not in entry and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class PayloadTextFormatter(logging.Formatter):
+    """Console format; payload records keep their per-service ANSI colours"""
+
+    def __init__(self, colors: dict):
+        super().__init__(TEXT_FORMAT)
+        self.colors = colors
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        service = getattr(record, "service", None)
+        if service is not None and service in self.colors:
+            return f"{self.colors[service]}{text}{self.colors.get('ENDC', '')}"
+        return text
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread without formatting them on the
+    event loop. Records are dropped (and counted) when the queue is full
+    rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Freeze everything the caller may still mutate. Plain messages are
+        resolved here like QueueHandler does; payload records keep their
+        arguments, with the payload structurally copied, so only the JSON
+        serialization and truncation is left to the listener.
+        """
+        record = copy.copy(record)
+        if record.args:
+            if any(isinstance(arg, _TruncatedPayload) for arg in record.args):
+                record.args = tuple(
+                    arg.snapshot() if isinstance(arg, _TruncatedPayload) else arg for arg in record.args
+                )
+            else:
+                record.msg = record.getMessage()
+                record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(log_file: str, ring: logging.Handler, colors: dict) -> QueueListener:
+    """
+    Route all logging through a bounded queue to a background listener that
+    owns the file, console and ring-buffer handlers. Returns the started listener.
+    """
+    file_formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(file_formatter)
+    ring.setFormatter(file_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(PayloadTextFormatter(colors))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DeferredQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.handlers = [queue_handler]
+
+    listener = QueueListener(log_queue, file_handler, console_handler, ring, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def _snapshot(value: Any) -> Any:
+    """Copy of the containers in a payload; leaves (str, numbers, other objects) are shared"""
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_snapshot(v) for v in value]
+    return value
+
+
+class _TruncatedPayload:
+    """Serializes and truncates lazily, i.e. in the log listener thread"""
+
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload: Any, max_chars: int):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def snapshot(self) -> "_TruncatedPayload":
+        # Taken on the caller's thread: the listener must never see later mutations
+        return _TruncatedPayload(_snapshot(self.payload), self.max_chars)
+
+    def __str__(self) -> str:
+        if isinstance(self.payload, (dict, list)):
+            text = json.dumps(self.payload, ensure_ascii=False, separators=(",", ":"), default=str)
+        else:
+            text = str(self.payload)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [truncated {len(text) - self.max_chars} chars]"
+        return text
+
+
+class PayloadLogger:
+    """Sampled, size-capped request/response payload logging with per-service toggles"""
+
+    def __init__(self, enabled: bool, services: List[str] = PAYLOAD_LOG_SERVICES,
+                 sample_rate: float = PAYLOAD_LOG_SAMPLE_RATE, max_chars: int = PAYLOAD_LOG_MAX_CHARS):
+        self.enabled = enabled
+        self.services = set(services)
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.logger = logging.getLogger("orchestrator.payloads")
+
+    def should_log(self, api_name: Optional[str]) -> bool:
+        if not self.enabled or api_name not in self.services:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def log(self, api_name: Optional[str], label: str, payload: Any, request_id: Optional[str] = None) -> None:
+        self.logger.info(
+            "[%s] %s: %s", api_name, label, _TruncatedPayload(payload, self.max_chars),
+            extra={"service": api_name, "label": label, "request_id": request_id}
+        )
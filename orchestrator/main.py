@@ -1,8 +1,10 @@
 # orchestrator/main.py
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import httpx
 import logging
 from datetime import datetime, timezone
@@ -11,9 +13,44 @@ import json
 from enum import Enum
 import asyncio
 import os
+import time
 
 from fastapi.middleware.cors import CORSMiddleware
 
+from orchestrator.http_clients import ServiceClientPool
+from orchestrator.notifications import NotificationDispatcher
+from orchestrator.state_store import build_state_store
+from orchestrator.events import RequestEventBus, sse_stream
+from orchestrator.result_cache import PipelineResultCache, make_cache_key
+from orchestrator.admission import STAGE_LIMITS, AdmissionController, Saturated
+from orchestrator.resilience import ResilienceRegistry, jittered_backoff
+from orchestrator.discovery import ServiceRegistry
+from orchestrator.map_store import MAP_CACHE_MAX_AGE, MapStore, choose_encoding, etag, etag_matches
+from common.metrics import REGISTRY, install_metrics
+from common.health import install_health
+from common.serialization import NDJSON, accept_header, client_codec, decode_body, install_serialization, iter_ndjson, ndjson_line
+from orchestrator.log_buffer import RingBufferHandler, line_matches, parse_level, tail_file
+from orchestrator.logging_setup import PayloadLogger, configure_logging
+from orchestrator.inprocess import InProcessStages, as_dict
+from orchestrator.batches import BATCH_ADMISSION_RETRY, BATCH_MAX_ITEMS, BatchTracker, FairScheduler, WorkerPool
+from orchestrator.job_queue import JOB_MAX_ATTEMPTS, JobCheckpoint, JobQueue, LeaseLost
+from orchestrator.worker import JOB_WORKERS, start_worker_processes, stop_worker_processes
+
+
+# "http" calls each service over HTTP; "inprocess" runs all stages inside the orchestrator
+PIPELINE_MODE = os.getenv("ORCH_PIPELINE_MODE", "http").lower()
+# Encoding of inter-service request bodies: "json" (default) or "msgpack" (needs the msgpack package)
+WIRE_FORMAT = os.getenv("ORCH_WIRE_FORMAT", "json").lower()
+# Stream parser entities straight into geocoding instead of waiting for the full parse
+PIPELINED_STAGES = os.getenv("ORCH_PIPELINED_STAGES", "true").lower() == "true"
+# "background" runs trips as BackgroundTasks inside the web process; "queue" hands
+# /plan-trip and batches to worker processes through a durable SQLite job queue. The
+# limits are then split into one share per worker plus one for the web process, which
+# still runs /plan-trip/stream (see admission.py)
+EXECUTION_MODE = os.getenv("ORCH_EXECUTION", "background").lower()
+JOB_MAX_PENDING = int(os.getenv("ORCH_JOB_MAX_PENDING", "1000"))  # queued + running jobs before /plan-trip returns 429
+JOB_RETRY_AFTER = 5  # seconds suggested to clients when the job queue is full
+JOB_STATUS_POLL_INTERVAL = float(os.getenv("ORCH_JOB_STATUS_POLL", "1"))  # batch items / streams following a job
 
 # === BEGIN: VERBOSE API LOGGING SWITCH ===
 VERBOSE_API_LOG = os.getenv("VERBOSE_API_LOG", "true").lower() == "true"
@@ -28,26 +65,17 @@ API_COLORS = {
     "ENDC": "\033[0m"
 }
 
-def print_api_payload(api_name, label, payload):
+# Sampled, size-capped and serialized off the event loop (ORCH_PAYLOAD_LOG_* settings)
+payload_log = PayloadLogger(VERBOSE_API_LOG)
+
+def print_api_payload(api_name, label, payload, request_id=None):
     if VERBOSE_API_LOG:
-        color = API_COLORS.get(api_name, "")
-        endc = API_COLORS["ENDC"]
-        print(f"{color}[{api_name}] {label}:{endc}")
-        if isinstance(payload, (dict, list)):
-            print(json.dumps(payload, indent=2, ensure_ascii=False))
-        else:
-            print(str(payload))
-        print(f"{color}{'='*60}{endc}")
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('orchestrator.log'),
-        logging.StreamHandler()
-    ]
-)
+        payload_log.log(api_name, label, payload, request_id)
+
+# Configure logging: handlers run on a background listener thread fed by a bounded queue
+LOG_FILE = 'orchestrator.log'
+log_ring = RingBufferHandler()
+log_listener = configure_logging(LOG_FILE, log_ring, API_COLORS)
 logger = logging.getLogger(__name__)
 
 class ServiceURLs(str, Enum):
@@ -56,17 +84,48 @@ class ServiceURLs(str, Enum):
     GEO_API = "http://localhost:8002/geocode"
     MAP_API = "http://localhost:8003/render"
 
+# NDJSON token stream served next to /generate by llm_api
+LLM_STREAM_URL = ServiceURLs.LLM_API.value + "/stream"
+# Entity feed from parser_api, relayed as the request body of geo_api's streamed geocoding
+PARSER_STREAM_URL = ServiceURLs.PARSER_API.value + "/stream"
+GEO_STREAM_URL = ServiceURLs.GEO_API.value + "/stream"
+
 class NotificationType(str, Enum):
     INFO = "info"
     WARNING = "warning"
     ERROR = "error"
     SUCCESS = "success"
 
-class OrchestratorRequest(BaseModel):
+class GenerationOptions(BaseModel):
+    creativity: Optional[float] = None  # Passed to llm_api, default there if unset
+    max_length: Optional[int] = None
+
+    def generation_settings(self) -> Dict[str, Any]:
+        """LLM generation overrides that change the output (part of the cache key)"""
+        settings = {"creativity": self.creativity, "max_length": self.max_length}
+        return {k: v for k, v in settings.items() if v is not None}
+
+class OrchestratorRequest(GenerationOptions):
     user_input: str
     user_id: str
     session_id: Optional[str] = None
     callback_url: Optional[str] = None
+    use_cache: bool = True  # Allow serving/joining a cached pipeline result
+
+class BatchItem(GenerationOptions):
+    user_input: str
+
+class BatchTripRequest(BaseModel):
+    user_id: str
+    items: List[BatchItem]
+    callback_url: Optional[str] = None
+    use_cache: bool = True
+
+class BatchTripResponse(BaseModel):
+    batch_id: str
+    status: str
+    total: int
+    request_ids: List[str]
 
 class Notification(BaseModel):
     type: NotificationType
@@ -77,12 +136,14 @@ class Notification(BaseModel):
 class OrchestratorResponse(BaseModel):
     status: str
     travel_plan: Optional[str] = None
-    map_html: Optional[str] = None
+    map_id: Optional[str] = None  # content hash of the rendered map
+    map_url: Optional[str] = None  # served by GET /maps/{map_id}
     enriched_data: Optional[Dict[str, Any]] = None
     notifications: List[Notification] = []
     request_id: str
 
 app = FastAPI(title="Travel Orchestrator", version="1.0")
+install_serialization(app)
 
 app.add_middleware(
     CORSMiddleware,
@@ -94,25 +155,176 @@ app.add_middleware(
 
 class RequestState:
     def __init__(self):
-        self.active_requests = {}
+        # Bounded TTL/LRU store, see orchestrator/state_store.py
+        self.active_requests = build_state_store()
 
 state = RequestState()
+http_pool = ServiceClientPool()
+wire_codec = client_codec(WIRE_FORMAT)
+notifier = NotificationDispatcher(http_pool.callback_client)
+events = RequestEventBus()
+stream_tasks = set()
+result_cache = PipelineResultCache()
+admission = AdmissionController()
+resilience = ResilienceRegistry()
+# Instances per service from ORCH_<SERVICE>_INSTANCES, defaulting to the ServiceURLs host
+discovery = ServiceRegistry({api.name: api.value for api in ServiceURLs})
+local_stages: Optional[InProcessStages] = None
+batch_scheduler = FairScheduler()
+batch_workers = WorkerPool(batch_scheduler)
+batches = BatchTracker()
+job_queue: Optional[JobQueue] = None
+worker_processes = []
+# Rendered maps live on disk by content hash; results and /status only carry the reference
+map_store = MapStore()
+
+# === Metrics ===
+install_metrics(app, "orchestrator")
+install_health(app, "orchestrator")
+STAGE_LATENCY = REGISTRY.histogram(
+    "orchestrator_stage_duration_seconds", "Pipeline stage latency including retries", ("stage",))
+CALL_LATENCY = REGISTRY.histogram(
+    "orchestrator_service_call_duration_seconds", "Latency of a single call_service attempt", ("service", "outcome"))
+CALL_ATTEMPTS = REGISTRY.counter(
+    "orchestrator_service_call_attempts_total", "call_service attempts by outcome", ("service", "outcome"))
+PIPELINE_LATENCY = REGISTRY.histogram(
+    "orchestrator_pipeline_duration_seconds", "End-to-end trip latency", ("status",))
+PIPELINES_IN_FLIGHT = REGISTRY.gauge(
+    "orchestrator_pipelines_in_flight", "Admitted trips not yet finished")
+STAGE_ACTIVE = REGISTRY.gauge(
+    "orchestrator_stage_active", "Calls holding a stage slot", ("service",))
+STAGE_WAITING = REGISTRY.gauge(
+    "orchestrator_stage_waiting", "Calls queued for a stage slot", ("service",))
+BREAKER_OPEN = REGISTRY.gauge(
+    "orchestrator_circuit_open", "1 if the service circuit breaker is not closed", ("service",))
+RESULT_CACHE_EVENTS = REGISTRY.gauge(
+    "orchestrator_result_cache_events", "Pipeline result cache counters", ("event",))
+INSTANCE_OUTSTANDING = REGISTRY.gauge(
+    "orchestrator_instance_outstanding", "In-flight requests per downstream instance", ("service", "instance"))
+INSTANCE_AVAILABLE = REGISTRY.gauge(
+    "orchestrator_instance_available", "1 if the instance is healthy and not ejected", ("service", "instance"))
+
+PIPELINES_IN_FLIGHT.set_function(lambda: [({}, admission.pipelines)])
+STAGE_ACTIVE.set_function(lambda: [({"service": n}, s.active) for n, s in admission.stages.items()])
+STAGE_WAITING.set_function(lambda: [({"service": n}, s.waiting) for n, s in admission.stages.items()])
+BREAKER_OPEN.set_function(lambda: [
+    ({"service": n}, 0 if svc["breaker"]["state"] == "closed" else 1) for n, svc in resilience.stats().items()
+])
+RESULT_CACHE_EVENTS.set_function(lambda: [({"event": k}, v) for k, v in result_cache.counters.items()])
+INSTANCE_OUTSTANDING.set_function(lambda: [
+    ({"service": n, "instance": i.base_url}, i.outstanding) for n, b in discovery.balancers.items() for i in b.instances
+])
+INSTANCE_AVAILABLE.set_function(lambda: [
+    ({"service": n, "instance": i.base_url}, int(i.available)) for n, b in discovery.balancers.items() for i in b.instances
+])
+
+def use_worker_admission(workers: int) -> None:
+    """
+    Queue mode, in the web process and in every job worker: enforce this
+    process's share of the host-wide limits. There are `workers` job workers
+    plus the web process, which runs streamed trips itself.
+    """
+    global admission
+    admission = AdmissionController(workers=workers + 1)
+    limits = {name: limiter.limit for name, limiter in admission.stages.items()}
+    logger.info(f"Queue mode admission: {admission.max_pipelines} pipelines, stage limits {limits}")
+
+def rejected(request_id: str, e: Saturated) -> HTTPException:
+    """429 with a Retry-After hint for a trip the orchestrator has no room for"""
+    logger.warning(f"[{request_id}] Rejected: {str(e)}")
+    return HTTPException(
+        status_code=429,
+        detail="Orchestrator is at capacity, please retry later",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def admit_or_reject(request_id: str) -> None:
+    """Reserve a pipeline slot or fail fast with 429 and a Retry-After hint"""
+    try:
+        admission.admit()
+    except Saturated as e:
+        raise rejected(request_id, e)
+
+async def start_pipeline_resources():
+    """HTTP pools and in-process stages; shared by the web app and job worker processes"""
+    global local_stages
+    await http_pool.startup([api.name for api in ServiceURLs])
+    if PIPELINE_MODE == "inprocess":
+        local_stages = await asyncio.to_thread(InProcessStages)
+    else:
+        discovery.start(http_pool.get)
+
+async def stop_pipeline_resources():
+    await discovery.stop()
+    # Flush queued callbacks before the callback pool goes away
+    await notifier.close()
+    await http_pool.shutdown()
+    await asyncio.to_thread(state.active_requests.close)
+
+@app.on_event("startup")
+async def open_pipeline_resources():
+    await start_pipeline_resources()
+
+@app.on_event("startup")
+async def start_job_workers():
+    global job_queue, worker_processes
+    if EXECUTION_MODE == "queue":
+        job_queue = JobQueue()
+        # Every worker, and this process for streamed trips, needs at least one slot of each
+        # stage, so more processes than the tightest stage limit (LLM, Nominatim) would run
+        # more calls than the limit allows
+        workers = max(1, min(JOB_WORKERS, min(STAGE_LIMITS.values()) - 1))
+        if workers < JOB_WORKERS:
+            logger.warning(f"Starting {workers} job workers instead of {JOB_WORKERS} to honour the stage limits")
+        use_worker_admission(workers)
+        worker_processes = start_worker_processes(workers)
+
+@app.on_event("startup")
+async def start_batch_workers():
+    batch_workers.start()
+
+@app.on_event("shutdown")
+async def stop_batch_workers():
+    await batch_workers.stop()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    if worker_processes:
+        # Workers hand their running jobs back to the queue on SIGTERM
+        await asyncio.to_thread(stop_worker_processes, worker_processes)
+    if job_queue is not None:
+        job_queue.close()
+
+@app.on_event("shutdown")
+async def close_pipeline_resources():
+    await stop_pipeline_resources()
+    log_listener.stop()
+
+async def store_map(map_html: str) -> Dict[str, str]:
+    """Write a rendered map to the content-addressed store and return its reference"""
+    map_id = await asyncio.to_thread(map_store.put, map_html)
+    return {"map_id": map_id, "map_url": f"/maps/{map_id}"}
+
+def resolve_api_name(service_url: str) -> Optional[str]:
+    """Map a service URL back to its ServiceURLs key"""
+    api_name = None
+    for key in API_COLORS:
+        if key in service_url:
+            api_name = key
+            break
+    # fallback for exact endpoint match
+    for api_key in ["LLM_API", "PARSER_API", "GEO_API", "MAP_API"]:
+        if getattr(ServiceURLs, api_key).value in service_url:
+            api_name = api_key
+    return api_name
 
 async def send_notification(request_id: str, notification: Notification, callback_url: Optional[str] = None):
-    """Send notification to frontend and log it"""
+    """Log a notification and queue it for background delivery to the frontend"""
     logger.info(f"[{request_id}] {notification.type.upper()}: {notification.message}")
     if notification.details:
         logger.debug(f"[{request_id}] Details: {json.dumps(notification.details, indent=2)}")
     if callback_url:
-        try:
-            async with httpx.AsyncClient() as client:
-                await client.post(
-                    callback_url,
-                    json=notification.model_dump(),
-                    timeout=2
-                )
-        except Exception as e:
-            logger.warning(f"[{request_id}] Failed to send notification: {str(e)}")
+        notifier.enqueue(request_id, callback_url, notification.model_dump(mode="json"))
 
 async def call_service(
         request_id: str,
@@ -122,21 +334,44 @@ async def call_service(
         retries: int = 3,
         expect_json: bool = True
 ) -> Dict[str, Any]:
-    """Generic service caller with retries, notifications, and verbose payload logging"""
+    """
+    Generic service caller with circuit breaking, budgeted jittered retries,
+    optional hedging, notifications, and verbose payload logging
+    """
     last_error = None
 
     # Figure out which API is being called
-    api_name = None
-    for key in API_COLORS:
-        if key in service_url:
-            api_name = key
-            break
-    # fallback for exact endpoint match
-    for api_key in ["LLM_API", "PARSER_API", "GEO_API", "MAP_API"]:
-        if getattr(ServiceURLs, api_key).value in service_url:
-            api_name = api_key
+    api_name = resolve_api_name(service_url)
+    guard = resilience.get(api_name)
+    limiter = admission.stage(api_name)
+    client = http_pool.get(api_name)
+    guard.retry_budget.record_request()
+    # Sample once per call so a logged request always has its response logged too
+    log_payloads = payload_log.should_log(api_name)
+    # Encode once; hedged and retried attempts resend the same bytes
+    body = wire_codec.dumps(payload)
+    headers = {"Content-Type": wire_codec.media_type, "Accept": accept_header(wire_codec)}
+
+    async def post_once() -> httpx.Response:
+        async with limiter.slot():
+            # Each attempt (and each hedge) is balanced on its own, so retries can land elsewhere
+            async with discovery.target(api_name, service_url) as url:
+                started = time.monotonic()
+                response = await client.post(url, content=body, headers=headers)
+                response.raise_for_status()
+        guard.latency.record(time.monotonic() - started)
+        return response
 
     for attempt in range(retries):
+        if not guard.breaker.allow():
+            last_error = last_error or f"Circuit open for {service_url}"
+            logger.error(f"[{request_id}] Circuit open for {service_url}, not calling")
+            break
+        if attempt > 0 and not guard.retry_budget.can_retry():
+            logger.error(f"[{request_id}] Retry budget exhausted for {service_url}")
+            break
+        attempt_started = time.monotonic()
+        outcome = "error"
         try:
             notification = Notification(
                 type=NotificationType.INFO,
@@ -146,65 +381,292 @@ async def call_service(
             await send_notification(request_id, notification, callback_url)
 
             # === VERBOSE OUTGOING REQUEST ===
-            print_api_payload(api_name, "REQUEST", payload)
+            if log_payloads:
+                print_api_payload(api_name, "REQUEST", payload, request_id)
 
-            async with httpx.AsyncClient(timeout=120) as client:
-                response = await client.post(service_url, json=payload)
-                response.raise_for_status()
+            response = await guard.hedged(post_once, limiter.has_capacity)
+            guard.breaker.record_success()
+            outcome = "success"
 
-                # === VERBOSE INCOMING RESPONSE ===
-                if expect_json:
-                    resp_json = response.json()
-                else:
-                    resp_json = response.text
-                print_api_payload(api_name, "RESPONSE", resp_json)
-
-                notification = Notification(
-                    type=NotificationType.SUCCESS,
-                    message=f"Service {service_url} completed successfully",
-                    timestamp=datetime.now(timezone.utc).isoformat()
-                )
-                await send_notification(request_id, notification, callback_url)
+            # === VERBOSE INCOMING RESPONSE ===
+            if expect_json:
+                resp_json = decode_body(response.content, response.headers.get("content-type"))
+            else:
+                resp_json = response.text
+            if log_payloads:
+                print_api_payload(api_name, "RESPONSE", resp_json, request_id)
+
+            notification = Notification(
+                type=NotificationType.SUCCESS,
+                message=f"Service {service_url} completed successfully",
+                timestamp=datetime.now(timezone.utc).isoformat()
+            )
+            await send_notification(request_id, notification, callback_url)
 
-                return resp_json
+            return resp_json
 
+        except Saturated as e:
+            # Retrying immediately only adds to the queue; give up on this trip
+            outcome = "saturated"
+            last_error = str(e)
+            logger.error(f"[{request_id}] {last_error}")
+            break
         except httpx.HTTPStatusError as e:
+            outcome = "http_error"
             last_error = f"HTTP error from {service_url}: {e.response.text}"
             logger.error(f"[{request_id}] {last_error}")
+            status = e.response.status_code
+            if status >= 500:
+                guard.breaker.record_failure()
+            else:
+                # The service answered; a 4xx will not change on retry (except timeouts/throttling)
+                guard.breaker.record_success()
+                if status not in (408, 429):
+                    break
         except httpx.RequestError as e:
+            outcome = "connection_error"
             last_error = f"Connection error to {service_url}: {str(e)}"
             logger.error(f"[{request_id}] {last_error}")
+            guard.breaker.record_failure()
         except Exception as e:
             last_error = f"Unexpected error with {service_url}: {str(e)}"
             logger.error(f"[{request_id}] {last_error}")
+            guard.breaker.record_failure()
+        finally:
+            CALL_ATTEMPTS.inc(service=api_name or "unknown", outcome=outcome)
+            CALL_LATENCY.observe(time.monotonic() - attempt_started, service=api_name or "unknown", outcome=outcome)
 
         if attempt < retries - 1:
-            await asyncio.sleep(1 * (attempt + 1))
+            await asyncio.sleep(jittered_backoff(attempt))
 
     error_notification = Notification(
         type=NotificationType.ERROR,
-        message=f"Failed to call {service_url} after {retries} attempts",
+        message=f"Failed to call {service_url} after {attempt + 1} attempt(s)",
         timestamp=datetime.now(timezone.utc).isoformat(),
         details={"error": last_error}
     )
     await send_notification(request_id, error_notification, callback_url)
     raise HTTPException(status_code=503, detail=f"Service {service_url} unavailable")
 
+async def call_stage(
+        request_id: str,
+        service: ServiceURLs,
+        payload: Any,
+        callback_url: Optional[str] = None,
+        expect_json: bool = True
+) -> Any:
+    """Run one pipeline stage over HTTP, or as a direct call in in-process mode"""
+    if local_stages is None:
+        return await call_service(request_id, service, payload, callback_url, expect_json=expect_json)
+
+    api_name = service.name
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        async with admission.stage(api_name).slot():
+            result = await local_stages.call(api_name, payload)
+        outcome = "success"
+        return result
+    except Saturated as e:
+        outcome = "saturated"
+        logger.error(f"[{request_id}] {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Stage {api_name} saturated")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[{request_id}] In-process {api_name} failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Stage {api_name} failed")
+    finally:
+        CALL_ATTEMPTS.inc(service=api_name, outcome=outcome)
+        CALL_LATENCY.observe(time.monotonic() - started, service=api_name, outcome=outcome)
+
+async def stream_llm_text(request_id: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Generate the travel plan through llm_api's token stream, forwarding text
+    to SSE subscribers as it arrives. Returns None when streaming is not
+    available so the caller can fall back to the regular /generate call.
+    """
+    try:
+        client = http_pool.get("LLM_API")
+        async with admission.stage("LLM_API").slot(), discovery.target("LLM_API", LLM_STREAM_URL) as url:
+            async with client.stream("POST", url, json=payload) as response:
+                if response.status_code == 404:
+                    logger.info(f"[{request_id}] llm_api has no stream endpoint, using /generate")
+                    return None
+                response.raise_for_status()
+                parts = []
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("token"):
+                        parts.append(chunk["token"])
+                        events.publish(request_id, "llm_token", {"text": chunk["token"]})
+                    if chunk.get("done"):
+                        chunk.setdefault("raw_text", "".join(parts))
+                        return chunk
+        raise RuntimeError("LLM stream ended without a final chunk")
+    except Exception as e:
+        logger.warning(f"[{request_id}] LLM streaming failed, falling back to /generate: {str(e)}")
+        events.publish(request_id, "llm_reset", {"reason": str(e)})
+        return None
+
+def record_streamed_call(api_name: str, started: float, error: Optional[BaseException]) -> None:
+    """Breaker outcome and call metrics for a streamed call made outside call_service"""
+    breaker = resilience.get(api_name).breaker
+    if error is None:
+        outcome = "success"
+        breaker.record_success()
+    elif isinstance(error, httpx.HTTPStatusError):
+        outcome = "http_error"
+        if error.response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    else:
+        outcome = "connection_error" if isinstance(error, httpx.RequestError) else "error"
+        breaker.record_failure()
+    CALL_ATTEMPTS.inc(service=api_name, outcome=outcome)
+    CALL_LATENCY.observe(time.monotonic() - started, service=api_name, outcome=outcome)
+
+async def parse_and_geocode(request_id: str, parser_payload: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], Any]]:
+    """
+    Overlap parsing and geocoding: parser_api streams entities as the LLM
+    names them and the stream is relayed into geo_api, so rate-limited
+    Nominatim lookups start with the first city. Returns (parsed, geo), with
+    geo None if only the geocoding half failed, or None when the parse did
+    not complete and the stages should run one after another.
+
+    Over HTTP both calls count as first attempts for the services' circuit
+    breakers, retry budgets and call metrics, like call_service. Running a
+    failed half again one stage at a time is a retry and has to fit the budget.
+    """
+    parsed: Dict[str, Any] = {}
+    geo_response = None
+    parser_guard = resilience.get("PARSER_API")
+    geo_guard = resilience.get("GEO_API")
+    parser_started: Optional[float] = None
+    geo_started: Optional[float] = None
+    parser_error: Optional[BaseException] = None
+    geo_error: Optional[BaseException] = None
+
+    if local_stages is None:
+        if not (parser_guard.breaker.allow() and geo_guard.breaker.allow()):
+            logger.info(f"[{request_id}] Circuit open for parser_api or geo_api, parsing without pipelining")
+            return None
+        parser_guard.retry_budget.record_request()
+        geo_guard.retry_budget.record_request()
+
+    async def relay(messages):
+        async for message in messages:
+            if message.get("entity"):
+                # SSE clients can place provisional markers before geocoding finishes
+                events.publish(request_id, "entity", message["entity"])
+            elif message.get("done"):
+                parsed.update(message["parsed"])
+            yield message
+
+    if payload_log.should_log("PARSER_API"):
+        print_api_payload("PARSER_API", "REQUEST", parser_payload, request_id)
+    try:
+        async with admission.stage("PARSER_API").slot(), admission.stage("GEO_API").slot():
+            if local_stages is not None:
+                geo_response = await local_stages.geocode_stream(relay(local_stages.parse_stream(parser_payload)))
+            else:
+                parser_started = time.monotonic()
+                async with discovery.target("PARSER_API", PARSER_STREAM_URL) as parser_url, \
+                        http_pool.get("PARSER_API").stream("POST", parser_url, json=parser_payload) as parser_stream:
+                    if parser_stream.status_code == 404:
+                        logger.info(f"[{request_id}] parser_api has no stream endpoint, parsing without pipelining")
+                        return None
+                    parser_stream.raise_for_status()
+
+                    async def feed():
+                        nonlocal parser_error
+                        try:
+                            async for message in relay(iter_ndjson(parser_stream.aiter_bytes())):
+                                yield ndjson_line(message)
+                        except Exception as e:
+                            parser_error = e
+                            raise
+
+                    geo_started = time.monotonic()
+                    try:
+                        async with discovery.target("GEO_API", GEO_STREAM_URL) as geo_url:
+                            response = await http_pool.get("GEO_API").post(
+                                geo_url,
+                                content=feed(),
+                                headers={"Content-Type": NDJSON, "Accept": accept_header(wire_codec)}
+                            )
+                            response.raise_for_status()
+                        geo_response = decode_body(response.content, response.headers.get("content-type"))
+                    except Exception as e:
+                        if parser_error is not None:
+                            raise
+                        # Caught here so a geo_api failure is not charged to the parser instance
+                        geo_error = e
+                        logger.warning(f"[{request_id}] Streamed geocoding failed: {str(e)}")
+    except Saturated as e:
+        logger.warning(f"[{request_id}] Pipelined parse/geocode not started: {str(e)}")
+    except Exception as e:
+        parser_error = parser_error or e
+        logger.warning(f"[{request_id}] Pipelined parse/geocode failed: {str(e)}")
+    finally:
+        if parser_started is not None:
+            record_streamed_call("PARSER_API", parser_started, parser_error)
+        if geo_started is not None and parser_error is None:
+            record_streamed_call("GEO_API", geo_started, geo_error)
+
+    if local_stages is None and (parser_error is not None or geo_error is not None):
+        guard, url = (parser_guard, PARSER_STREAM_URL) if parser_error is not None else (geo_guard, GEO_STREAM_URL)
+        if not guard.retry_budget.can_retry():
+            logger.error(f"[{request_id}] Retry budget exhausted for {url}")
+            raise HTTPException(status_code=503, detail=f"Service {url} unavailable")
+    if not parsed:
+        return None
+    if payload_log.should_log("PARSER_API"):
+        print_api_payload("PARSER_API", "RESPONSE", parsed, request_id)
+    if geo_response is not None and payload_log.should_log("GEO_API"):
+        print_api_payload("GEO_API", "RESPONSE", as_dict(geo_response), request_id)
+    return parsed, geo_response
+
 async def process_travel_request(
         request_id: str,
         user_input: str,
-        callback_url: Optional[str] = None
+        callback_url: Optional[str] = None,
+        generation: Optional[Dict[str, Any]] = None,
+        checkpoint: Optional[JobCheckpoint] = None
 ) -> Dict[str, Any]:
-    """Orchestrate the entire travel planning workflow"""
+    """
+    Orchestrate the entire travel planning workflow. With a job checkpoint,
+    stages already completed by an earlier attempt are skipped and each
+    newly completed stage is saved.
+    """
     try:
-        llm_response = await call_service(
-            request_id,
-            ServiceURLs.LLM_API,
-            {"idea": user_input},
-            callback_url,
-            expect_json=True
-        )
-        travel_plan_text = llm_response.get("raw_text", "")
+        completed = checkpoint.completed if checkpoint is not None else {}
+        if "travel_plan" in completed:
+            travel_plan_text = completed["travel_plan"]
+        else:
+            llm_payload = {"idea": user_input, **(generation or {})}
+            events.publish(request_id, "stage", {"stage": "llm", "status": "started"})
+            llm_response = None
+            with STAGE_LATENCY.time(stage="llm"):
+                if events.has_subscribers(request_id) and local_stages is None:
+                    llm_response = await stream_llm_text(request_id, llm_payload)
+                if llm_response is None:
+                    llm_response = await call_stage(
+                        request_id,
+                        ServiceURLs.LLM_API,
+                        llm_payload,
+                        callback_url,
+                        expect_json=True
+                    )
+            travel_plan_text = as_dict(llm_response).get("raw_text", "")
+            if checkpoint is not None:
+                await checkpoint.save("travel_plan", travel_plan_text)
+        events.publish(request_id, "travel_plan", {"travel_plan": travel_plan_text})
 
         notification = Notification(
             type=NotificationType.SUCCESS,
@@ -214,63 +676,97 @@ async def process_travel_request(
         )
         await send_notification(request_id, notification, callback_url)
 
-        parser_response = await call_service(
-            request_id,
-            ServiceURLs.PARSER_API,
-            {
+        geo_response = completed.get("geo")
+        if "parsed" in completed:
+            parser_response = completed["parsed"]
+        else:
+            parser_payload = {
                 "raw_text": travel_plan_text,
                 "user_input": user_input
-            },
-            callback_url,
-            expect_json=True
-        )
+            }
+            events.publish(request_id, "stage", {"stage": "parser", "status": "started"})
+            pipelined = None
+            if PIPELINED_STAGES:
+                events.publish(request_id, "stage", {"stage": "geo", "status": "started"})
+                with STAGE_LATENCY.time(stage="parser_geo"):
+                    pipelined = await parse_and_geocode(request_id, parser_payload)
+            if pipelined is not None:
+                parser_response, geo_response = pipelined
+            else:
+                with STAGE_LATENCY.time(stage="parser"):
+                    parser_response = await call_stage(
+                        request_id,
+                        ServiceURLs.PARSER_API,
+                        parser_payload,
+                        callback_url,
+                        expect_json=True
+                    )
+        # In in-process mode the stage returns a model; keep it for geo and use a dict view here
+        parser_data = as_dict(parser_response)
+        if checkpoint is not None and "parsed" not in completed:
+            await checkpoint.save("parsed", parser_data)
         notification = Notification(
             type=NotificationType.SUCCESS,
             message="Travel plan parsed successfully",
             timestamp=datetime.now(timezone.utc).isoformat(),
-            details={"parsed_data": {k: len(v) if isinstance(v, list) else v for k, v in parser_response.items()}}
+            details={"parsed_data": {k: len(v) if isinstance(v, list) else v for k, v in parser_data.items()}}
         )
         await send_notification(request_id, notification, callback_url)
+        events.publish(request_id, "parsed", parser_data)
 
-        geo_response = await call_service(
-            request_id,
-            ServiceURLs.GEO_API,
-            parser_response,
-            callback_url,
-            expect_json=True
-        )
+        if geo_response is None:
+            events.publish(request_id, "stage", {"stage": "geo", "status": "started"})
+            with STAGE_LATENCY.time(stage="geo"):
+                geo_response = await call_stage(
+                    request_id,
+                    ServiceURLs.GEO_API,
+                    parser_response,
+                    callback_url,
+                    expect_json=True
+                )
+        geo_data = as_dict(geo_response)
+        if checkpoint is not None and "geo" not in completed:
+            await checkpoint.save("geo", geo_data)
         notification = Notification(
             type=NotificationType.SUCCESS,
             message="Geotagging completed successfully",
             timestamp=datetime.now(timezone.utc).isoformat(),
-            details={"geo_data": {k: len(v) if isinstance(v, list) else v for k, v in geo_response.items()}}
+            details={"geo_data": {k: len(v) if isinstance(v, list) else v for k, v in geo_data.items()}}
         )
         await send_notification(request_id, notification, callback_url)
+        events.publish(request_id, "geocoded", geo_data)
 
-        map_response = await call_service(
-            request_id,
-            ServiceURLs.MAP_API,
-            geo_response,
-            callback_url,
-            expect_json=False
-        )
+        events.publish(request_id, "stage", {"stage": "map", "status": "started"})
+        with STAGE_LATENCY.time(stage="map"):
+            map_response = await call_stage(
+                request_id,
+                ServiceURLs.MAP_API,
+                geo_response,
+                callback_url,
+                expect_json=False
+            )
         notification = Notification(
             type=NotificationType.SUCCESS,
             message="Map rendered successfully",
             timestamp=datetime.now(timezone.utc).isoformat()
         )
         await send_notification(request_id, notification, callback_url)
+        map_ref = await store_map(map_response)
+        events.publish(request_id, "map", map_ref)
 
         return {
             "status": "completed",
             "travel_plan": travel_plan_text,
-            "map_html": map_response,
-            "enriched_data": geo_response
+            **map_ref,
+            "enriched_data": geo_data
         }
 
     except HTTPException as e:
         logger.error(f"[{request_id}] Orchestration failed: {str(e)}")
         raise
+    except LeaseLost:
+        # Not a failure of the trip: the job worker hands it over to the new lease owner
+        raise
     except Exception as e:
         logger.error(f"[{request_id}] Unexpected orchestration error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Orchestration process failed")
@@ -284,15 +780,28 @@ async def plan_trip(
     request_id = str(uuid.uuid4())
     request.session_id = request.session_id or str(uuid.uuid4())
 
+    if job_queue is not None:
+        try:
+            await enqueue_trip_job(request_id, trip_job_payload(
+                request.user_id,
+                request.user_input,
+                request.callback_url,
+                request.generation_settings(),
+                request.use_cache
+            ))
+        except Saturated as e:
+            raise rejected(request_id, e)
+    else:
+        admit_or_reject(request_id)
+        state.active_requests.put(request_id, {
+            "status": "processing",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+            "user_id": request.user_id
+        })
+
     logger.info(f"[{request_id}] Starting trip planning for user {request.user_id}")
     logger.debug(f"[{request_id}] User input: {request.user_input}")
 
-    state.active_requests[request_id] = {
-        "status": "processing",
-        "start_time": datetime.now(timezone.utc).isoformat(),
-        "user_id": request.user_id
-    }
-
     notification = Notification(
         type=NotificationType.INFO,
         message="Starting trip planning process",
@@ -301,12 +810,15 @@ async def plan_trip(
     )
     await send_notification(request_id, notification, request.callback_url)
 
-    background_tasks.add_task(
-        process_request_background,
-        request_id,
-        request.user_input,
-        request.callback_url
-    )
+    if job_queue is None:
+        background_tasks.add_task(
+            process_request_background,
+            request_id,
+            request.user_input,
+            request.callback_url,
+            request.generation_settings(),
+            request.use_cache
+        )
 
     return OrchestratorResponse(
         status="processing",
@@ -314,40 +826,462 @@ async def plan_trip(
         notifications=[notification]
     )
 
+def trip_job_payload(
+        user_id: str,
+        user_input: str,
+        callback_url: Optional[str],
+        generation: Optional[Dict[str, Any]],
+        use_cache: bool
+) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "user_input": user_input,
+        "callback_url": callback_url,
+        "generation": generation,
+        "use_cache": use_cache
+    }
+
+async def enqueue_trip_job(request_id: str, payload: Dict[str, Any]):
+    """Persist the trip as a job for the worker processes, or raise Saturated when the queue is full"""
+    pending = await asyncio.to_thread(job_queue.pending)
+    if pending >= JOB_MAX_PENDING:
+        raise Saturated(f"job queue ({pending} pending)", JOB_RETRY_AFTER)
+    await asyncio.to_thread(job_queue.enqueue, request_id, payload)
+    if state.active_requests.shared:
+        # Replicas without access to this host's job store answer /status from here
+        state.active_requests.put(request_id, {
+            "status": "queued",
+            "start_time": datetime.now(timezone.utc).isoformat(),
+            "user_id": payload["user_id"]
+        })
+
+async def wait_for_job(request_id: str) -> Dict[str, Any]:
+    """Result of a queued trip once a worker finishes it; raises with the job's error if it failed"""
+    while True:
+        job = await asyncio.to_thread(job_queue.status, request_id)
+        if job is None:
+            raise RuntimeError("Job disappeared from the queue")
+        if job["status"] == "completed":
+            return job["result"]
+        if job["status"] == "error":
+            raise RuntimeError(job.get("error") or "Job failed")
+        await asyncio.sleep(JOB_STATUS_POLL_INTERVAL)
+
+async def run_trip_job(job: Dict[str, Any], checkpoint: JobCheckpoint) -> Dict[str, Any]:
+    """Job handler of the worker processes: one /plan-trip pipeline, resumed from its checkpoint"""
+    payload = job["payload"]
+    request_id = job["id"]
+    # Worker-local memory would be invisible to the web processes; only mirror into shared stores
+    mirror = state.active_requests.shared
+    if mirror:
+        state.active_requests.update(request_id, {"status": "processing", "attempts": job["attempts"]})
+    # Never rejects: the worker leases at most admission.max_pipelines jobs at a time
+    admission.admit()
+    started = time.monotonic()
+    status = "error"
+    try:
+        result = await run_cached_pipeline(
+            request_id,
+            payload["user_input"],
+            payload.get("callback_url"),
+            payload.get("generation"),
+            payload.get("use_cache", True),
+            checkpoint
+        )
+        status = "completed"
+        if mirror:
+            state.active_requests.update(request_id, {
+                "status": "completed",
+                "end_time": datetime.now(timezone.utc).isoformat(),
+                "result": result
+            })
+        return result
+    except LeaseLost:
+        # The status now belongs to whichever worker took the job over
+        raise
+    except Exception as e:
+        if mirror:
+            final = job["attempts"] >= JOB_MAX_ATTEMPTS
+            state.active_requests.update(request_id, {
+                "status": "error" if final else "queued",
+                "end_time": datetime.now(timezone.utc).isoformat() if final else None,
+                "error": str(e)
+            })
+        raise
+    finally:
+        admission.finish(time.monotonic() - started)
+        PIPELINE_LATENCY.observe(time.monotonic() - started, status=status)
+
+async def run_cached_pipeline(
+        request_id: str,
+        user_input: str,
+        callback_url: Optional[str] = None,
+        generation: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        checkpoint: Optional[JobCheckpoint] = None
+) -> Dict[str, Any]:
+    """Serve from the result cache, join an identical in-flight run, or run the pipeline"""
+    if not use_cache:
+        return await process_travel_request(request_id, user_input, callback_url, generation, checkpoint)
+
+    key = make_cache_key(user_input, generation)
+    result = await result_cache.get(key)
+    source = "cache"
+    if result is None:
+        result, joined = await result_cache.single_flight(
+            key,
+            lambda: process_travel_request(request_id, user_input, callback_url, generation, checkpoint)
+        )
+        if not joined:
+            return result
+        source = "coalesced"
+
+    notification = Notification(
+        type=NotificationType.SUCCESS,
+        message="Travel plan served from cache" if source == "cache" else "Travel plan shared with an identical request",
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        details={"source": source}
+    )
+    await send_notification(request_id, notification, callback_url)
+    events.publish(request_id, "stage", {"stage": source, "status": "completed"})
+    events.publish(request_id, "travel_plan", {"travel_plan": result.get("travel_plan")})
+    events.publish(request_id, "geocoded", result.get("enriched_data"))
+    if "map_html" in result:
+        # Cached on disk before maps moved to the map store
+        result = dict(result)
+        result.update(await store_map(result.pop("map_html") or ""))
+    events.publish(request_id, "map", {"map_id": result.get("map_id"), "map_url": result.get("map_url")})
+    return result
+
 async def process_request_background(
         request_id: str,
         user_input: str,
-        callback_url: Optional[str]
+        callback_url: Optional[str],
+        generation: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True
 ):
-    """Background task handler for request processing"""
+    """Background task handler for request processing; releases the admission slot when done"""
+    started = time.monotonic()
+    status = "error"
     try:
-        result = await process_travel_request(request_id, user_input, callback_url)
-        state.active_requests[request_id].update({
+        result = await run_cached_pipeline(request_id, user_input, callback_url, generation, use_cache)
+        status = "completed"
+        state.active_requests.update(request_id, {
             "status": "completed",
             "end_time": datetime.now(timezone.utc).isoformat(),
             "result": result
         })
+        events.publish(request_id, "done", {"request_id": request_id, "status": "completed"})
     except Exception as e:
-        state.active_requests[request_id].update({
+        state.active_requests.update(request_id, {
             "status": "error",
             "end_time": datetime.now(timezone.utc).isoformat(),
             "error": str(e)
         })
+        events.publish(request_id, "error", {"request_id": request_id, "error": str(e)})
+    finally:
+        admission.finish(time.monotonic() - started)
+        PIPELINE_LATENCY.observe(time.monotonic() - started, status=status)
+
+@app.post("/plan-trip/stream")
+async def plan_trip_stream(request: OrchestratorRequest):
+    """Trip planning with progress, LLM text and stage payloads streamed as Server-Sent Events"""
+    request_id = str(uuid.uuid4())
+    request.session_id = request.session_id or str(uuid.uuid4())
+
+    admit_or_reject(request_id)
+
+    logger.info(f"[{request_id}] Starting streamed trip planning for user {request.user_id}")
+
+    state.active_requests.put(request_id, {
+        "status": "processing",
+        "start_time": datetime.now(timezone.utc).isoformat(),
+        "user_id": request.user_id
+    })
+
+    # Subscribe before the pipeline starts so no event is missed
+    queue = events.subscribe(request_id)
+    task = asyncio.create_task(process_request_background(
+        request_id,
+        request.user_input,
+        request.callback_url,
+        request.generation_settings(),
+        request.use_cache
+    ))
+    # Keep a strong reference so the pipeline is not garbage collected mid-flight
+    stream_tasks.add(task)
+    task.add_done_callback(stream_tasks.discard)
+
+    return StreamingResponse(
+        sse_stream(events, request_id, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/plan-trip/{request_id}/stream")
+async def follow_trip_stream(request_id: str):
+    """
+    Server-Sent Events for a trip that was already submitted, e.g. a /plan-trips
+    item. Stage events arrive while the pipeline runs in this process; trips
+    run by job workers or already finished only report their final outcome.
+    """
+    if await asyncio.to_thread(lookup_status, request_id) is None:
+        raise HTTPException(status_code=404, detail="Request ID not found")
+    queue = events.subscribe(request_id)
+
+    async def outcome():
+        req = await asyncio.to_thread(lookup_status, request_id) or {}
+        if req.get("status") == "completed":
+            return "done", {"request_id": request_id, "status": "completed"}
+        if req.get("status") == "error":
+            return "error", {"request_id": request_id, "error": req.get("error")}
+        return None
+
+    return StreamingResponse(
+        sse_stream(events, request_id, queue, poll=outcome),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def run_batch_pipeline(
+        request_id: str,
+        user_id: str,
+        user_input: str,
+        callback_url: Optional[str],
+        generation: Optional[Dict[str, Any]],
+        use_cache: bool
+) -> Dict[str, Any]:
+    """
+    One batch pipeline through the same admission and execution path as
+    /plan-trip: a durable job in queue mode, an admitted pipeline otherwise.
+    Batch items are already queued, so when the orchestrator is saturated
+    the item waits for room instead of failing with a 429.
+    """
+    while True:
+        try:
+            if job_queue is not None:
+                await enqueue_trip_job(request_id, trip_job_payload(
+                    user_id, user_input, callback_url, generation, use_cache))
+            else:
+                admission.admit()
+            break
+        except Saturated as e:
+            # Retry-After is sized for clients; a queued item rechecks sooner to take the next free slot
+            logger.debug(f"[{request_id}] Batch item waiting for admission: {str(e)}")
+            await asyncio.sleep(min(e.retry_after, BATCH_ADMISSION_RETRY))
+
+    if job_queue is not None:
+        return await wait_for_job(request_id)
+    started = time.monotonic()
+    status = "error"
+    try:
+        result = await run_cached_pipeline(request_id, user_input, callback_url, generation, use_cache)
+        status = "completed"
+        return result
+    finally:
+        admission.finish(time.monotonic() - started)
+        PIPELINE_LATENCY.observe(time.monotonic() - started, status=status)
+
+async def run_batch_group(
+        batch_id: str,
+        user_id: str,
+        items: List[Dict[str, Any]],
+        callback_url: Optional[str],
+        use_cache: bool
+):
+    """Run one pipeline for a group of identical batch items and fan the result out to all of them"""
+    leader = items[0]
+    for item in items:
+        item["status"] = "processing"
+        state.active_requests.update(item["request_id"], {"status": "processing"})
+    try:
+        result = await run_batch_pipeline(
+            leader["request_id"],
+            user_id,
+            leader["user_input"],
+            callback_url,
+            leader["generation"],
+            use_cache
+        )
+        update = {"status": "completed", "result": result}
+    except Exception as e:
+        update = {"status": "error", "error": str(e)}
+    update["end_time"] = datetime.now(timezone.utc).isoformat()
+    for item in items:
+        item["status"] = update["status"]
+        state.active_requests.update(item["request_id"], update)
+        events.publish(item["request_id"], "done" if update["status"] == "completed" else "error",
+                       {"request_id": item["request_id"], "status": update["status"]})
+    batches.items_finished(batch_id)
+    logger.info(f"[{leader['request_id']}] Batch {batch_id} item group of {len(items)} finished: {update['status']}")
+
+@app.post("/plan-trips", response_model=BatchTripResponse)
+async def plan_trips(request: BatchTripRequest):
+    """Plan many trips as one batch, fairly interleaved with other users' batches"""
+    if not request.items:
+        raise HTTPException(status_code=422, detail="Batch has no items")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+
+    batch_id = str(uuid.uuid4())
+    start_time = datetime.now(timezone.utc).isoformat()
+    items = []
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for index, entry in enumerate(request.items):
+        generation = entry.generation_settings()
+        item = {
+            "index": index,
+            "request_id": str(uuid.uuid4()),
+            "user_input": entry.user_input,
+            "generation": generation,
+            "status": "queued"
+        }
+        items.append(item)
+        state.active_requests.put(item["request_id"], {
+            "status": "queued",
+            "start_time": start_time,
+            "user_id": request.user_id,
+            "batch_id": batch_id
+        })
+        # Identical prompts in one batch share a single LLM/geo/map run
+        key = make_cache_key(entry.user_input, generation) if request.use_cache else item["request_id"]
+        groups.setdefault(key, []).append(item)
+
+    batches.create(batch_id, request.user_id, items)
+    for group in groups.values():
+        batch_scheduler.submit(
+            request.user_id,
+            lambda group=group: run_batch_group(batch_id, request.user_id, group, request.callback_url, request.use_cache)
+        )
+
+    logger.info(f"Batch {batch_id}: {len(items)} items ({len(groups)} unique) queued for user {request.user_id}")
+    return BatchTripResponse(
+        batch_id=batch_id,
+        status="queued",
+        total=len(items),
+        request_ids=[item["request_id"] for item in items]
+    )
+
+@app.get("/plan-trips/{batch_id}")
+def get_batch_status(batch_id: str, include_items: bool = True):
+    """Aggregate progress of a batch, with per-item status"""
+    batch = batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch ID not found")
+    summary = BatchTracker.summary(batch)
+    if include_items:
+        summary["items"] = [
+            {"index": item["index"], "request_id": item["request_id"],
+             "user_input": item["user_input"], "status": item["status"]}
+            for item in batch["items"]
+        ]
+    return summary
+
+def lookup_status(request_id: str) -> Optional[Dict[str, Any]]:
+    # Queued trips live in the job store, which survives restarts and is shared with the workers
+    req = job_queue.status(request_id) if job_queue is not None else None
+    return req or state.active_requests.get(request_id)
 
 @app.get("/status/{request_id}")
 def get_status(request_id: str):
     """Check the status of a trip planning request"""
-    req = state.active_requests.get(request_id)
+    req = lookup_status(request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request ID not found")
     return req
 
+@app.api_route("/maps/{map_id}", methods=["GET", "HEAD"])
+def get_map(map_id: str, request: Request):
+    """Rendered map HTML by content hash: immutable, with strong ETags and precompressed encodings"""
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    stored = map_store.open(map_id, encoding)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Map not found")
+    path, encoding = stored
+    headers = {
+        "ETag": etag(map_id, encoding),
+        "Cache-Control": f"public, max-age={MAP_CACHE_MAX_AGE}, immutable",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("if-none-match"), map_id):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return FileResponse(path, media_type="text/html; charset=utf-8", headers=headers)
+
+@app.get("/debug/resilience")
+def get_resilience_stats():
+    """Circuit breaker states, retry budgets, latency percentiles and hedging counters"""
+    return resilience.stats()
+
+@app.get("/debug/jobs")
+def get_job_stats():
+    """Durable job queue depth and worker processes"""
+    if job_queue is None:
+        return {"mode": EXECUTION_MODE}
+    return {
+        "mode": EXECUTION_MODE,
+        "queue": job_queue.stats(),
+        "workers": [{"name": p.name, "pid": p.pid, "alive": p.is_alive()} for p in worker_processes]
+    }
+
+@app.get("/debug/discovery")
+def get_discovery_stats():
+    """Instances per downstream service with health, ejection and load"""
+    return discovery.stats()
+
+@app.get("/debug/maps")
+def get_map_store_stats():
+    """Rendered map store location, encodings and write/dedup counters"""
+    return map_store.stats()
+
+@app.get("/debug/batches")
+def get_batch_stats():
+    """Fair scheduler queue depth per user and batch worker utilisation"""
+    return {
+        **batch_scheduler.stats(),
+        **batches.stats(),
+        "workers": batch_workers.size,
+        "busy_workers": batch_workers.busy
+    }
+
+@app.get("/debug/admission")
+def get_admission_stats():
+    """Pipeline admission and per-stage concurrency/queue-time metrics"""
+    return admission.stats()
+
+@app.get("/debug/cache")
+def get_cache_stats():
+    """Pipeline result cache and single-flight statistics"""
+    return result_cache.stats()
+
+@app.get("/debug/state")
+def get_state_stats():
+    """Request state store size and eviction counters"""
+    return state.active_requests.stats()
+
+@app.get("/debug/pools")
+def get_pool_stats():
+    """Connection pool statistics for every downstream service"""
+    return http_pool.stats()
+
+@app.get("/debug/notifications")
+def get_notification_stats():
+    """Callback delivery metrics and queue depth"""
+    return notifier.stats()
+
 @app.get("/debug/logs")
-def get_logs(lines: int = 100):
-    """Retrieve recent logs for debugging"""
+def get_logs(lines: int = 100, request_id: Optional[str] = None, level: Optional[str] = None):
+    """Retrieve recent logs for debugging, optionally filtered by request_id and minimum level"""
+    lines = max(0, lines)
+    min_level = parse_level(level)
     try:
-        with open('orchestrator.log', 'r') as f:
-            log_lines = f.readlines()
-        return {"logs": log_lines[-lines:]}
+        log_lines = log_ring.tail(lines, request_id, min_level)
+        # The ring only holds this process's lines since startup; the file also has
+        # earlier runs and the job worker processes, so go to disk whenever it falls short
+        if len(log_lines) >= lines or not os.path.exists(LOG_FILE):
+            return {"logs": log_lines, "source": "memory"}
+        log_lines = tail_file(LOG_FILE, lines, lambda line: line_matches(line, request_id, min_level))
+        return {"logs": log_lines, "source": "file"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,203 @@
+# orchestrator/map_store.py
+import gzip
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+# === Rendered map store configuration ===
+MAP_STORE_DIR = os.getenv("ORCH_MAP_STORE_DIR", "orchestrator_maps")
+MAP_RETENTION = float(os.getenv("ORCH_MAP_RETENTION", str(7 * 86400)))  # seconds since a map was last stored
+MAP_PURGE_INTERVAL = float(os.getenv("ORCH_MAP_PURGE_INTERVAL", "3600"))
+MAP_CACHE_MAX_AGE = int(os.getenv("ORCH_MAP_CACHE_MAX_AGE", str(365 * 86400)))  # Cache-Control max-age
+MAP_GZIP_LEVEL = int(os.getenv("ORCH_MAP_GZIP_LEVEL", "9"))
+MAP_BROTLI_QUALITY = int(os.getenv("ORCH_MAP_BROTLI_QUALITY", "11"))
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Content-Encoding -> file suffix; "identity" is the plain HTML
+ENCODINGS: Dict[str, str] = {"identity": ".html", "gzip": ".html.gz"}
+if brotli:
+    ENCODINGS["br"] = ".html.br"
+# Server preference when the client accepts several equally
+ENCODING_PREFERENCE = ["br", "gzip", "identity"]
+
+logger = logging.getLogger(__name__)
+
+
+def map_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def etag(digest: str, encoding: str) -> str:
+    """Strong ETag; each encoding is a different byte sequence and so gets its own tag"""
+    return f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], digest: str) -> bool:
+    """If-None-Match check: any encoding of the same content counts as a match"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == digest or tag.startswith(digest + "-"):
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Best stored encoding for an Accept-Encoding header, honouring q-values"""
+    qualities: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    wildcard = qualities.get("*")
+    best, best_quality = "identity", 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in ENCODINGS:
+            continue
+        quality = qualities.get(encoding, wildcard if wildcard is not None else (1.0 if encoding == "identity" else 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class MapStore:
+    """
+    Content-addressed store of rendered map HTML on local disk. Each map is
+    written once under its SHA-256, together with precompressed gzip (and
+    brotli, when the package is installed) copies, so /maps/{hash} serves
+    static bytes and identical maps share one set of files. The web process
+    and the job worker processes use the same directory.
+    """
+
+    def __init__(self, root: str = MAP_STORE_DIR, retention: float = MAP_RETENTION):
+        self.root = root
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.counters = {"stored": 0, "deduplicated": 0, "purged": 0}
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str, encoding: str = "identity") -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.root, digest[:2], digest + ENCODINGS[encoding])
+
+    def _write(self, path: str, data: bytes) -> None:
+        """Atomic write so concurrent readers never see a partial file"""
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def put(self, html: str) -> str:
+        """Store a rendered map and return its hash"""
+        digest = map_hash(html)
+        plain = self._path(digest)
+        if os.path.exists(plain):
+            # Already stored; refresh the timestamp so retention counts from the latest use
+            os.utime(plain)
+            with self._lock:
+                self.counters["deduplicated"] += 1
+        else:
+            os.makedirs(os.path.dirname(plain), exist_ok=True)
+            data = html.encode("utf-8")
+            # Compressed copies first: the plain file marks the map as complete
+            self._write(self._path(digest, "gzip"), gzip.compress(data, MAP_GZIP_LEVEL, mtime=0))
+            if brotli:
+                self._write(self._path(digest, "br"), brotli.compress(data, quality=MAP_BROTLI_QUALITY))
+            self._write(plain, data)
+            with self._lock:
+                self.counters["stored"] += 1
+        self._maybe_purge()
+        return digest
+
+    def exists(self, digest: str) -> bool:
+        return bool(HASH_RE.match(digest)) and os.path.exists(self._path(digest))
+
+    def open(self, digest: str, encoding: str) -> Optional[Tuple[str, str]]:
+        """(file path, encoding actually served) or None for an unknown or invalid hash"""
+        if not self.exists(digest):
+            return None
+        path = self._path(digest, encoding)
+        if encoding != "identity" and not os.path.exists(path):
+            # e.g. stored before brotli was installed
+            encoding, path = "identity", self._path(digest)
+        return path, encoding
+
+    def read(self, digest: str) -> Optional[str]:
+        if not self.exists(digest):
+            return None
+        with open(self._path(digest), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def _maybe_purge(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._last_purge < MAP_PURGE_INTERVAL:
+                return
+            self._last_purge = time.monotonic()
+        self.purge()
+
+    def purge(self) -> int:
+        """Remove maps not stored again within the retention period"""
+        cutoff = time.time() - self.retention
+        removed = 0
+        for digest, mtime in self._iter_maps():
+            if mtime >= cutoff:
+                continue
+            for encoding in ENCODINGS:
+                try:
+                    os.remove(self._path(digest, encoding))
+                except FileNotFoundError:
+                    pass
+            removed += 1
+        if removed:
+            logger.info(f"Purged {removed} rendered maps older than {self.retention:.0f}s")
+        with self._lock:
+            self.counters["purged"] += removed
+        return removed
+
+    def _iter_maps(self) -> List[Tuple[str, float]]:
+        maps = []
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith(ENCODINGS["identity"]) and HASH_RE.match(name[:64]) and len(name) == 69:
+                    try:
+                        maps.append((name[:64], os.path.getmtime(os.path.join(shard_dir, name))))
+                    except FileNotFoundError:
+                        pass
+        return maps
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "root": self.root,
+            "encodings": list(ENCODINGS),
+            "retention_seconds": self.retention,
+            **self.counters
+        }
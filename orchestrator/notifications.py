@@ -0,0 +1,187 @@
+# orchestrator/notifications.py
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import httpx
+
+# === Callback dispatcher configuration ===
+NOTIFY_BATCH_SIZE = int(os.getenv("ORCH_NOTIFY_BATCH_SIZE", "20"))
+NOTIFY_BATCH_WINDOW = float(os.getenv("ORCH_NOTIFY_BATCH_WINDOW", "0.25"))  # seconds
+NOTIFY_QUEUE_SIZE = int(os.getenv("ORCH_NOTIFY_QUEUE_SIZE", "200"))  # per callback_url
+NOTIFY_MAX_URLS = int(os.getenv("ORCH_NOTIFY_MAX_URLS", "1000"))
+NOTIFY_IDLE_TIMEOUT = float(os.getenv("ORCH_NOTIFY_IDLE_TIMEOUT", "30"))  # seconds
+NOTIFY_DRAIN_TIMEOUT = float(os.getenv("ORCH_NOTIFY_DRAIN_TIMEOUT", "5"))  # seconds on shutdown
+
+INFO_TYPE = "info"
+
+logger = logging.getLogger(__name__)
+
+# (request_id, serialized notification)
+QueuedNotification = Tuple[str, Dict[str, Any]]
+
+
+class _CallbackQueue:
+    """Bounded queue and worker for a single callback_url"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.items: Deque[QueuedNotification] = deque()
+        self.wakeup = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+        self.last_activity = time.monotonic()
+
+
+class NotificationDispatcher:
+    """
+    Delivers callback notifications off the request path.
+    Each callback_url gets its own bounded queue drained by a background worker
+    that coalesces queued notifications into batched POSTs. When a queue fills
+    up, INFO notifications are compacted and dropped first so that SUCCESS,
+    WARNING and ERROR messages still get through.
+    """
+
+    def __init__(
+            self,
+            client_factory: Callable[[], httpx.AsyncClient],
+            batch_size: int = NOTIFY_BATCH_SIZE,
+            batch_window: float = NOTIFY_BATCH_WINDOW,
+            queue_size: int = NOTIFY_QUEUE_SIZE,
+            max_urls: int = NOTIFY_MAX_URLS,
+            idle_timeout: float = NOTIFY_IDLE_TIMEOUT
+    ):
+        self.client_factory = client_factory
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.queue_size = max(1, queue_size)
+        self.max_urls = max(1, max_urls)
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[str, _CallbackQueue] = {}
+        self._closing = False
+        self.metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "batches": 0,
+            "failed": 0,
+            "dropped": 0,
+            "compacted": 0,
+            "rejected_urls": 0
+        }
+
+    def enqueue(self, request_id: str, callback_url: str, notification: Dict[str, Any]) -> bool:
+        """Queue a notification for delivery; never blocks the caller"""
+        if self._closing:
+            self.metrics["dropped"] += 1
+            return False
+
+        queue = self._queues.get(callback_url)
+        if queue is None:
+            if len(self._queues) >= self.max_urls:
+                self.metrics["rejected_urls"] += 1
+                self.metrics["dropped"] += 1
+                logger.warning(f"[{request_id}] Too many callback URLs in flight, dropping notification")
+                return False
+            queue = self._queues[callback_url] = _CallbackQueue(callback_url)
+
+        if len(queue.items) >= self.queue_size and not self._make_room(queue, notification):
+            self.metrics["dropped"] += 1
+            return False
+
+        queue.items.append((request_id, notification))
+        queue.last_activity = time.monotonic()
+        self.metrics["enqueued"] += 1
+        queue.wakeup.set()
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._run(queue))
+        return True
+
+    def _make_room(self, queue: _CallbackQueue, incoming: Dict[str, Any]) -> bool:
+        """Free a slot under backpressure. Returns False if the incoming item should be dropped."""
+        # First compact: keep only the newest INFO per request
+        seen = set()
+        compacted: Deque[QueuedNotification] = deque()
+        for request_id, item in reversed(queue.items):
+            if item.get("type") == INFO_TYPE:
+                if request_id in seen:
+                    self.metrics["compacted"] += 1
+                    continue
+                seen.add(request_id)
+            compacted.appendleft((request_id, item))
+        queue.items = compacted
+        if len(queue.items) < self.queue_size:
+            return True
+
+        # Then drop the oldest INFO, or the incoming INFO if nothing else can go
+        for i, (_, item) in enumerate(queue.items):
+            if item.get("type") == INFO_TYPE:
+                del queue.items[i]
+                self.metrics["dropped"] += 1
+                return True
+        if incoming.get("type") == INFO_TYPE:
+            return False
+        queue.items.popleft()
+        self.metrics["dropped"] += 1
+        return True
+
+    async def _run(self, queue: _CallbackQueue) -> None:
+        """Worker loop: wait for items, batch them for a short window, POST, repeat"""
+        try:
+            while True:
+                if not queue.items:
+                    if self._closing:
+                        break
+                    queue.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(queue.wakeup.wait(), timeout=self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if not queue.items:
+                            break
+                    continue
+
+                if len(queue.items) < self.batch_size and self.batch_window > 0 and not self._closing:
+                    await asyncio.sleep(self.batch_window)
+
+                batch = [queue.items.popleft() for _ in range(min(self.batch_size, len(queue.items)))]
+                await self._deliver(queue.url, batch)
+        finally:
+            if self._queues.get(queue.url) is queue and not queue.items:
+                del self._queues[queue.url]
+
+    async def _deliver(self, url: str, batch) -> None:
+        if len(batch) == 1:
+            # Single notifications keep the original callback payload shape
+            body = batch[0][1]
+        else:
+            body = {
+                "notifications": [dict(item, request_id=request_id) for request_id, item in batch]
+            }
+        try:
+            response = await self.client_factory().post(url, json=body)
+            response.raise_for_status()
+            self.metrics["delivered"] += len(batch)
+            self.metrics["batches"] += 1
+        except Exception as e:
+            self.metrics["failed"] += len(batch)
+            logger.warning(f"[{batch[0][0]}] Failed to send {len(batch)} notification(s) to {url}: {str(e)}")
+
+    async def close(self, timeout: float = NOTIFY_DRAIN_TIMEOUT) -> None:
+        """Flush pending notifications, then stop all workers"""
+        self._closing = True
+        for queue in self._queues.values():
+            queue.wakeup.set()
+        workers = [q.worker for q in self._queues.values() if q.worker and not q.worker.done()]
+        if workers:
+            done, pending = await asyncio.wait(workers, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._queues.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "queues": len(self._queues),
+            "pending": sum(len(q.items) for q in self._queues.values())
+        }
@@ -0,0 +1,210 @@
+# orchestrator/resilience.py
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+# === Circuit breaker / retry / hedging configuration ===
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("ORCH_BREAKER_FAILURES", "5"))  # consecutive failures to open
+BREAKER_OPEN_SECONDS = float(os.getenv("ORCH_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_PROBE_INTERVAL = float(os.getenv("ORCH_BREAKER_PROBE_INTERVAL", "5"))  # seconds between half-open probes
+RETRY_BUDGET_RATIO = float(os.getenv("ORCH_RETRY_BUDGET_RATIO", "0.2"))  # retries earned per request
+RETRY_BUDGET_MAX = float(os.getenv("ORCH_RETRY_BUDGET_MAX", "10"))
+BACKOFF_BASE = float(os.getenv("ORCH_BACKOFF_BASE", "0.5"))  # seconds
+BACKOFF_CAP = float(os.getenv("ORCH_BACKOFF_CAP", "8"))
+# Idempotent, locally bound stages only. GEO_API is left out: it sits behind Nominatim's rate
+# limit, so a hedge doubles upstream load exactly when it is slow and can get the app throttled
+HEDGE_SERVICES = [s for s in os.getenv("ORCH_HEDGE_SERVICES", "MAP_API").split(",") if s]
+HEDGE_MIN_DELAY = float(os.getenv("ORCH_HEDGE_MIN_DELAY", "0.05"))  # seconds
+HEDGE_MIN_SAMPLES = int(os.getenv("ORCH_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. While open every call is refused; after
+    open_seconds it goes half-open and lets one probe through per
+    probe_interval until a probe succeeds (closed) or fails (open again).
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 open_seconds: float = BREAKER_OPEN_SECONDS, probe_interval: float = BREAKER_PROBE_INTERVAL):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.probe_interval = probe_interval
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_probe = 0.0
+        self.times_opened = 0
+        self.refused = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.last_probe = 0.0
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and now - self.last_probe >= self.probe_interval:
+            self.last_probe = now
+            return True
+        self.refused += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} failure(s)")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "refused": self.refused
+        }
+
+
+class RetryBudget:
+    """Token bucket: every first attempt earns `ratio` retries, each retry spends one"""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def can_retry(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies for hedge delay estimation"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def jittered_backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class ServiceResilience:
+    """Breaker, retry budget, latency window and hedging counters for one service"""
+
+    def __init__(self, name: str, hedge: bool = False):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self.retry_budget = RetryBudget()
+        self.latency = LatencyTracker()
+        self.hedge_enabled = hedge
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95-based delay before a hedge is sent, or None if hedging does not apply yet"""
+        if not self.hedge_enabled or len(self.latency.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.latency.percentile(0.95))
+
+    async def hedged(self, call: Callable[[], Awaitable[Any]],
+                     can_hedge: Callable[[], bool] = lambda: True) -> Any:
+        """
+        Run `call`; if it has not finished after the hedge delay, start a
+        second identical call and return whichever succeeds first.
+        """
+        delay = self.hedge_delay()
+        if delay is None:
+            return await call()
+
+        first = asyncio.create_task(call())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not can_hedge():
+            return await first
+
+        self.hedges += 1
+        second = asyncio.create_task(call())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        return {
+            "breaker": self.breaker.stats(),
+            "retry_tokens": round(self.retry_budget.tokens, 2),
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+            "latency_p50": round(p50, 4) if p50 is not None else None,
+            "latency_p95": round(p95, 4) if p95 is not None else None,
+            "hedge_enabled": self.hedge_enabled,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+class ResilienceRegistry:
+    def __init__(self, hedge_services=HEDGE_SERVICES):
+        self.hedge_services = set(hedge_services)
+        self._services: Dict[str, ServiceResilience] = {}
+
+    def get(self, name: Optional[str]) -> ServiceResilience:
+        key = name or "DEFAULT"
+        if key not in self._services:
+            self._services[key] = ServiceResilience(key, hedge=key in self.hedge_services)
+        return self._services[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: svc.stats() for name, svc in self._services.items()}
@@ -0,0 +1,104 @@
+# orchestrator/result_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import re
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from common.tiered_cache import TieredCache
+
+# === Pipeline result cache configuration ===
+RESULT_CACHE_ENABLED = os.getenv("ORCH_RESULT_CACHE", "true").lower() == "true"
+RESULT_CACHE_TTL = float(os.getenv("ORCH_RESULT_CACHE_TTL", "86400"))  # seconds
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("ORCH_RESULT_CACHE_MAX_ENTRIES", "500"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("ORCH_RESULT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+RESULT_CACHE_DIR = os.getenv("ORCH_RESULT_CACHE_DIR")  # unset = memory only
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv("ORCH_RESULT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def normalize_user_input(text: str) -> str:
+    """Case-fold and collapse whitespace/punctuation so trivially different prompts share a key"""
+    text = text.lower().strip()
+    text = re.sub(r"[^\w\s,]", " ", text)
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return re.sub(r"\s+", " ", text).strip(" ,")
+
+
+def make_cache_key(user_input: str, generation: Optional[Dict[str, Any]] = None) -> str:
+    material = json.dumps(
+        {"input": normalize_user_input(user_input), "generation": generation or {}},
+        sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class PipelineResultCache(TieredCache):
+    """
+    TTL + LRU cache of finished pipeline results with single-flight execution.
+    Entries are kept zlib-compressed in memory and optionally mirrored to disk
+    so that popular trips survive restarts.
+    """
+
+    def __init__(
+            self,
+            ttl: float = RESULT_CACHE_TTL,
+            max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+            max_bytes: int = RESULT_CACHE_MAX_BYTES,
+            cache_dir: Optional[str] = RESULT_CACHE_DIR,
+            enabled: bool = RESULT_CACHE_ENABLED,
+            disk_max_bytes: int = RESULT_CACHE_DISK_MAX_BYTES
+    ):
+        super().__init__(ttl, max_entries, max_bytes, cache_dir, disk_max_bytes, ".json.z")
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters["coalesced"] = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        hit = await self.get_blob(key)
+        return json.loads(zlib.decompress(hit[0])) if hit is not None else None
+
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        await self.set_blob(key, zlib.compress(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+
+    async def single_flight(
+            self,
+            key: str,
+            run: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run the pipeline once per key. Concurrent callers with the same key
+        await the leader's result. Returns (result, joined_existing_run).
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run()
+        except BaseException as e:
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Mark retrieved so an unobserved failure is not reported at GC time
+                    future.exception()
+            raise
+        else:
+            future.set_result(result)
+            await self.set(key, result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "in_flight": len(self._inflight), **super().stats()}
@@ -0,0 +1,489 @@
+# orchestrator/state_store.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# === Request state store configuration ===
+STATE_STORE_BACKEND = os.getenv("ORCH_STATE_STORE", "memory")
+STATE_TTL = float(os.getenv("ORCH_STATE_TTL", "3600"))  # seconds a finished request stays visible
+STATE_INFLIGHT_TTL = float(os.getenv("ORCH_STATE_INFLIGHT_TTL", "21600"))  # safety net for leaked requests
+STATE_MAX_ENTRIES = int(os.getenv("ORCH_STATE_MAX_ENTRIES", "10000"))
+STATE_MAX_BYTES = int(os.getenv("ORCH_STATE_MAX_BYTES", str(256 * 1024 * 1024)))
+STATE_SWEEP_INTERVAL = float(os.getenv("ORCH_STATE_SWEEP_INTERVAL", "5"))
+
+# === Shared backends (sqlite / redis), used when several workers or replicas serve /status ===
+STATE_DB_PATH = os.getenv("ORCH_STATE_DB", "orchestrator_state.db")
+STATE_REDIS_URL = os.getenv("ORCH_STATE_REDIS_URL", "redis://localhost:6379/0")
+STATE_KEY_PREFIX = os.getenv("ORCH_STATE_KEY_PREFIX", "orch:state:")
+STATE_FLUSH_INTERVAL = float(os.getenv("ORCH_STATE_FLUSH_INTERVAL", "0.05"))  # seconds writes are batched for
+STATE_FLUSH_BATCH = int(os.getenv("ORCH_STATE_FLUSH_BATCH", "500"))
+
+FINISHED_STATUSES = ("completed", "error")
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore(ABC):
+    """Interface for request status storage used by /plan-trip and /status"""
+
+    # True when every orchestrator process sees the same data
+    shared = False
+
+    @abstractmethod
+    def put(self, request_id: str, data: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, request_id: str, fields: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        """Flush pending writes and release connections"""
+
+
+def pack_result(result: Any) -> bytes:
+    """Compact a finished result (map HTML, enriched data) into compressed JSON"""
+    return zlib.compress(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_result(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class _Entry:
+    __slots__ = ("data", "blob", "size", "expires_at")
+
+    def __init__(self, data: Dict[str, Any], blob: Optional[bytes], expires_at: float):
+        self.data = data
+        self.blob = blob
+        self.expires_at = expires_at
+        self.size = len(json.dumps(data, default=str)) + (len(blob) if blob else 0)
+
+    @property
+    def finished(self) -> bool:
+        return self.data.get("status") in FINISHED_STATUSES
+
+
+class InMemoryStateStore(StateStore):
+    """
+    LRU dict with TTL expiry and entry/byte caps.
+    Finished results are stored compressed and only in-flight requests are
+    exempt from LRU eviction, so /status keeps working for anything still
+    running and for recently finished requests.
+    """
+
+    def __init__(
+            self,
+            ttl: float = STATE_TTL,
+            inflight_ttl: float = STATE_INFLIGHT_TTL,
+            max_entries: int = STATE_MAX_ENTRIES,
+            max_bytes: int = STATE_MAX_BYTES,
+            sweep_interval: float = STATE_SWEEP_INTERVAL
+    ):
+        self.ttl = ttl
+        self.inflight_ttl = inflight_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evicted_ttl": 0,
+            "evicted_entries": 0,
+            "evicted_bytes": 0
+        }
+
+    def _store(self, request_id: str, data: Dict[str, Any]) -> None:
+        data = dict(data)
+        blob = None
+        if data.get("status") in FINISHED_STATUSES:
+            if "result" in data:
+                blob = pack_result(data.pop("result"))
+            expires_at = time.monotonic() + self.ttl
+        else:
+            expires_at = time.monotonic() + self.inflight_ttl
+
+        self._discard(request_id)
+        entry = _Entry(data, blob, expires_at)
+        self._entries[request_id] = entry
+        self._bytes += entry.size
+        self._enforce_limits()
+
+    def _discard(self, request_id: str) -> Optional[_Entry]:
+        entry = self._entries.pop(request_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _materialize(self, entry: _Entry) -> Dict[str, Any]:
+        data = dict(entry.data)
+        if entry.blob is not None:
+            data["result"] = unpack_result(entry.blob)
+        return data
+
+    def _sweep(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for request_id in [rid for rid, e in self._entries.items() if e.expires_at <= now]:
+            self._discard(request_id)
+            self.counters["evicted_ttl"] += 1
+
+    def _enforce_limits(self) -> None:
+        if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        self._sweep(force=True)
+        # Oldest finished entries go first; in-flight requests are never evicted
+        for request_id in [rid for rid, e in self._entries.items() if e.finished]:
+            if len(self._entries) > self.max_entries:
+                self.counters["evicted_entries"] += 1
+            elif self._bytes > self.max_bytes:
+                self.counters["evicted_bytes"] += 1
+            else:
+                break
+            self._discard(request_id)
+
+    def put(self, request_id: str, data: Dict[str, Any]) -> None:
+        self._sweep()
+        self._store(request_id, data)
+
+    def update(self, request_id: str, fields: Dict[str, Any]) -> None:
+        self._sweep()
+        entry = self._entries.get(request_id)
+        data = self._materialize(entry) if entry is not None else {}
+        data.update(fields)
+        self._store(request_id, data)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        self._sweep()
+        entry = self._entries.get(request_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self.counters["misses"] += 1
+            return None
+        self.counters["hits"] += 1
+        self._entries.move_to_end(request_id)
+        return self._materialize(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        inflight = sum(1 for e in self._entries.values() if not e.finished)
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "in_flight": inflight,
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            **self.counters
+        }
+
+
+# A pending write: (replace the whole entry?, fields)
+PendingWrite = Tuple[bool, Dict[str, Any]]
+
+
+class BatchedStateStore(StateStore):
+    """
+    Base for shared backends. put/update only record the change in memory
+    and a background thread writes everything pending in one batch every
+    flush interval, so request handlers never wait on the backend. Reads
+    see this process's unflushed writes on top of the stored entry.
+    """
+
+    shared = True
+
+    def __init__(self, ttl: float = STATE_TTL, inflight_ttl: float = STATE_INFLIGHT_TTL,
+                 flush_interval: float = STATE_FLUSH_INTERVAL, flush_batch: int = STATE_FLUSH_BATCH):
+        self.ttl = ttl
+        self.inflight_ttl = inflight_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._pending: "OrderedDict[str, PendingWrite]" = OrderedDict()
+        # Writes taken by the flush in progress; still visible to get() until they are committed
+        self._inflight: Dict[str, PendingWrite] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.counters = {"hits": 0, "misses": 0, "flushes": 0, "written": 0, "flush_errors": 0}
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"{type(self).__name__}-flush", daemon=True)
+        self._flusher.start()
+
+    def _ttl_for(self, data: Dict[str, Any]) -> float:
+        return self.ttl if data.get("status") in FINISHED_STATUSES else self.inflight_ttl
+
+    # --- backend hooks ---
+
+    @abstractmethod
+    def _write_batch(self, writes: List[Tuple[str, bool, Dict[str, Any]]]) -> None:
+        ...
+
+    @abstractmethod
+    def _read(self, request_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    def _count(self) -> Optional[int]:
+        return None
+
+    # --- StateStore ---
+
+    def put(self, request_id: str, data: Dict[str, Any]) -> None:
+        with self._pending_lock:
+            self._pending[request_id] = (True, dict(data))
+            full = len(self._pending) >= self.flush_batch
+        if full:
+            self._wake.set()
+
+    def update(self, request_id: str, fields: Dict[str, Any]) -> None:
+        with self._pending_lock:
+            replace, pending = self._pending.get(request_id, (False, {}))
+            self._pending[request_id] = (replace, {**pending, **fields})
+            full = len(self._pending) >= self.flush_batch
+        if full:
+            self._wake.set()
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            # Oldest first: the write being flushed, then anything written since
+            layers = [w for w in (self._inflight.get(request_id), self._pending.get(request_id)) if w is not None]
+        data = None if any(replace for replace, _ in layers) else self._read(request_id)
+        for replace, fields in layers:
+            data = dict(fields) if replace else {**(data or {}), **fields}
+        self.counters["hits" if data is not None else "misses"] += 1
+        return data
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            while True:
+                with self._pending_lock:
+                    if not self._pending:
+                        return
+                    batch = []
+                    while self._pending and len(batch) < self.flush_batch:
+                        request_id, write = self._pending.popitem(last=False)
+                        self._inflight[request_id] = write
+                        batch.append((request_id, *write))
+                try:
+                    self._write_batch(batch)
+                    self.counters["flushes"] += 1
+                    self.counters["written"] += len(batch)
+                except Exception as e:
+                    self.counters["flush_errors"] += 1
+                    logger.error(f"State store flush of {len(batch)} writes failed: {str(e)}")
+                    # Put the batch back unless newer writes for the same requests arrived meanwhile
+                    with self._pending_lock:
+                        self._inflight.clear()
+                        for request_id, replace, fields in batch:
+                            if request_id in self._pending:
+                                newer_replace, newer = self._pending[request_id]
+                                if not newer_replace:
+                                    self._pending[request_id] = (replace, {**fields, **newer})
+                            else:
+                                self._pending[request_id] = (replace, fields)
+                    return
+                with self._pending_lock:
+                    self._inflight.clear()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            pending = len(self._pending) + len(self._inflight)
+        return {
+            "entries": self._count(),
+            "pending_writes": pending,
+            "ttl_seconds": self.ttl,
+            "flush_interval": self.flush_interval,
+            **self.counters
+        }
+
+
+class SQLiteStateStore(BatchedStateStore):
+    """State shared by all orchestrator processes on one host through a SQLite file"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS request_state (
+        request_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,     -- JSON without the result
+        result BLOB,            -- pack_result() of the finished result
+        expires REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS request_state_expires ON request_state (expires);
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, **kwargs):
+        self.path = path
+        self._conn_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._last_sweep = 0.0
+        super().__init__(**kwargs)
+
+    def _select(self, request_id: str) -> Optional[Tuple[Dict[str, Any], Optional[bytes]]]:
+        row = self._conn.execute(
+            "SELECT data, result FROM request_state WHERE request_id = ? AND expires > ?",
+            (request_id, time.time())
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _write_batch(self, writes: List[Tuple[str, bool, Dict[str, Any]]]) -> None:
+        now = time.time()
+        with self._conn_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for request_id, replace, fields in writes:
+                    data, blob = {}, None
+                    if not replace:
+                        existing = self._select(request_id)
+                        if existing:
+                            data, blob = existing
+                    data.update(fields)
+                    if "result" in data:
+                        blob = pack_result(data.pop("result"))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO request_state (request_id, data, result, expires) VALUES (?, ?, ?, ?)",
+                        (request_id, json.dumps(data, ensure_ascii=False, default=str), blob, now + self._ttl_for(data))
+                    )
+                if now - self._last_sweep > STATE_SWEEP_INTERVAL:
+                    self._last_sweep = now
+                    self._conn.execute("DELETE FROM request_state WHERE expires <= ?", (now,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._conn_lock:
+            existing = self._select(request_id)
+        if existing is None:
+            return None
+        data, blob = existing
+        if blob is not None:
+            data["result"] = unpack_result(blob)
+        return data
+
+    def _count(self) -> Optional[int]:
+        with self._conn_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM request_state WHERE expires > ?", (time.time(),)).fetchone()[0]
+
+    def close(self) -> None:
+        super().close()
+        with self._conn_lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path, **super().stats()}
+
+
+class RedisStateStore(BatchedStateStore):
+    """
+    State shared across hosts through Redis or any server speaking its
+    protocol (Valkey, KeyDB, ...). Each request is a hash of JSON-encoded
+    fields, so an update is a plain HSET and needs no read-modify-write.
+    """
+
+    def __init__(self, url: str = STATE_REDIS_URL, prefix: str = STATE_KEY_PREFIX, client=None, **kwargs):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("ORCH_STATE_STORE=redis needs the 'redis' package") from e
+            client = redis.Redis.from_url(url)
+        self.url = url
+        self.prefix = prefix
+        self.client = client
+        super().__init__(**kwargs)
+
+    def _key(self, request_id: str) -> str:
+        return f"{self.prefix}{request_id}"
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, bytes]:
+        encoded = {}
+        for name, value in fields.items():
+            if name == "result":
+                encoded[name] = pack_result(value)
+            else:
+                encoded[name] = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        return encoded
+
+    def _write_batch(self, writes: List[Tuple[str, bool, Dict[str, Any]]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for request_id, replace, fields in writes:
+            key = self._key(request_id)
+            if replace:
+                pipe.delete(key)
+            if fields:
+                pipe.hset(key, mapping=self._encode(fields))
+            if replace or "status" in fields:
+                pipe.expire(key, int(self._ttl_for(fields)))
+        pipe.execute()
+
+    def _read(self, request_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.hgetall(self._key(request_id))
+        if not raw:
+            return None
+        data = {}
+        for name, value in raw.items():
+            name = name.decode("utf-8") if isinstance(name, bytes) else name
+            data[name] = unpack_result(value) if name == "result" else json.loads(value)
+        return data
+
+    def _count(self) -> Optional[int]:
+        # SCAN would walk the whole keyspace; not worth it for a debug endpoint
+        return None
+
+    def close(self) -> None:
+        super().close()
+        self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "url": self.url, "prefix": self.prefix, **super().stats()}
+
+
+STATE_STORES = {
+    "memory": InMemoryStateStore,
+    "sqlite": SQLiteStateStore,
+    "redis": RedisStateStore,
+}
+
+
+def build_state_store(backend: str = STATE_STORE_BACKEND) -> StateStore:
+    """Instantiate the configured state store backend"""
+    store_cls = STATE_STORES.get(backend)
+    if store_cls is None:
+        logger.warning(f"Unknown ORCH_STATE_STORE '{backend}', using in-memory store")
+        store_cls = InMemoryStateStore
+    return store_cls()
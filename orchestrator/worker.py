@@ -0,0 +1,174 @@
+# orchestrator/worker.py
+"""
+Worker processes for the durable job queue.
+
+The web process starts ORCH_JOB_WORKERS of these on startup; more can be run
+on their own (e.g. on another core set) with:
+
+    python -m orchestrator.worker
+
+ORCH_MAX_PIPELINES and the ORCH_LIMIT_* stage limits are divided into
+ORCH_JOB_WORKERS + 1 shares: one per worker and one for the web process,
+which still runs /plan-trip/stream itself. Each process enforces its share,
+and workers lease no more jobs than their pipeline share. The web process
+starts at most one worker fewer than the tightest stage limit, since every
+process needs a slot of every stage. Standalone workers must run with
+ORCH_JOB_WORKERS set to the total number of worker processes on the host, or
+the limits are exceeded.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from orchestrator.job_queue import JOB_DB_PATH, JobCheckpoint, JobQueue, LeaseLost, worker_id
+
+# === Worker pool configuration ===
+JOB_WORKERS = int(os.getenv("ORCH_JOB_WORKERS", str(min(4, os.cpu_count() or 1))))  # processes
+JOB_CONCURRENCY = int(os.getenv("ORCH_JOB_CONCURRENCY", "4"))  # jobs in flight per process
+JOB_POLL_INTERVAL = float(os.getenv("ORCH_JOB_POLL_INTERVAL", "0.5"))
+JOB_PURGE_INTERVAL = float(os.getenv("ORCH_JOB_PURGE_INTERVAL", "300"))
+
+JobHandler = Callable[[Dict[str, Any], JobCheckpoint], Awaitable[Any]]
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Leases jobs and runs up to `concurrency` of them at a time on one event loop"""
+
+    def __init__(self, queue: JobQueue, handler: JobHandler, concurrency: int = JOB_CONCURRENCY):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.owner = worker_id()
+        self._running: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info(f"Job worker {self.owner} started ({self.concurrency} concurrent jobs)")
+        last_purge = 0.0
+        while not self._stopping.is_set():
+            if time.monotonic() - last_purge > JOB_PURGE_INTERVAL:
+                last_purge = time.monotonic()
+                await asyncio.to_thread(self.queue.purge)
+            job = None
+            if len(self._running) < self.concurrency:
+                job = await asyncio.to_thread(self.queue.lease, self.owner)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._run_job(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        # Jobs still running go back to the queue and resume from their checkpoint elsewhere
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        logger.info(f"Job worker {self.owner} stopped")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.queue.heartbeat, job_id, self.owner)
+            except LeaseLost:
+                raise
+            except Exception as e:
+                # e.g. "database is locked": the lease has two more beats before it expires
+                logger.warning(f"[{job_id}] Heartbeat failed, retrying on the next beat: {str(e)}")
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        if job["stage"]:
+            logger.info(f"[{job_id}] Resuming job after stage '{job['stage']}' (attempt {job['attempts']})")
+        checkpoint = JobCheckpoint(self.queue, job_id, self.owner, job["checkpoint"])
+        work = asyncio.create_task(self.handler(job, checkpoint))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            done, _ = await asyncio.wait({work, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+            if heartbeat in done:
+                # Only a lost lease ends the heartbeat loop; someone else owns the job now
+                work.cancel()
+                heartbeat.result()
+            result = work.result()
+            await asyncio.to_thread(self.queue.complete, job_id, self.owner, result)
+        except asyncio.CancelledError:
+            work.cancel()
+            await asyncio.to_thread(self.queue.release, job_id, self.owner)
+            raise
+        except LeaseLost:
+            logger.warning(f"[{job_id}] Lease lost, leaving the job to its new owner")
+        except Exception as e:
+            logger.error(f"[{job_id}] Job attempt {job['attempts']} failed: {str(e)}")
+            await asyncio.to_thread(self.queue.fail, job_id, self.owner, str(e))
+        finally:
+            heartbeat.cancel()
+
+
+async def _serve(db_path: str, concurrency: int, workers: int) -> None:
+    # Imported here: the orchestrator module wires up logging, clients and the pipeline
+    from orchestrator import main as orchestrator
+
+    orchestrator.use_worker_admission(workers)
+    # Leasing more than the pipeline share would only park jobs in this process's stage queues
+    concurrency = min(concurrency, orchestrator.admission.max_pipelines)
+    await orchestrator.start_pipeline_resources()
+    queue = JobQueue(db_path)
+    worker = JobWorker(queue, orchestrator.run_trip_job, concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await orchestrator.stop_pipeline_resources()
+        queue.close()
+
+
+def run_worker_process(db_path: str = JOB_DB_PATH, concurrency: int = JOB_CONCURRENCY,
+                       workers: int = JOB_WORKERS) -> None:
+    """Process entry point; `workers` is the number of worker processes sharing the host limits"""
+    asyncio.run(_serve(db_path, concurrency, workers))
+
+
+def start_worker_processes(count: int = JOB_WORKERS, db_path: str = JOB_DB_PATH) -> List[multiprocessing.Process]:
+    # spawn, not fork: the parent's event loop, sockets and threads must not leak into workers
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(count):
+        process = context.Process(
+            target=run_worker_process,
+            args=(db_path, JOB_CONCURRENCY, count),
+            name=f"orchestrator-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        processes.append(process)
+    logger.info(f"Started {count} job worker processes on {db_path}")
+    return processes
+
+
+def stop_worker_processes(processes: List[multiprocessing.Process], timeout: float = 10) -> None:
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    run_worker_process()
@@ -1,43 +1,133 @@
 # parser_api/main.py
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from .services.llm_parser import LLMParser
 from .parser_fallback import ParserFallback
 from .models import ParserInput, ParsedOutput
 from .utils import validate_parsed_output
+from .ollama_client import stream_ollama, warm_up_model
+from common.ollama_client import close_ollama
+from common.ollama_scheduler import get_scheduler
+from .streaming import EntityScanner
+from common.metrics import REGISTRY, install_metrics
+from common.health import install_health
+from common.serialization import NDJSON, install_serialization, ndjson_line
+from typing import AsyncIterator, Optional
+import asyncio
 import logging
+import time
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+install_metrics(app, "parser_api")
+install_health(app, "parser_api")
+install_serialization(app)
+
+PARSE_REQUESTS = REGISTRY.counter(
+    "parser_requests_total", "Parse requests by strategy used", ("strategy",))
+PARSE_LATENCY = REGISTRY.histogram(
+    "parser_duration_seconds", "Parse latency by strategy used", ("strategy",))
+
+@app.on_event("startup")
+async def open_ollama_scheduler():
+    # Created up front so the shared scheduler database is logged at startup, not on the first request
+    get_scheduler()
+
+warmup_tasks = set()
+
+@app.on_event("startup")
+async def start_model_warm_up():
+    # In the background: /parse falls back to spaCy until the model is ready anyway
+    task = asyncio.create_task(warm_up_model(LLMParser.SYSTEM_PROMPT))
+    warmup_tasks.add(task)
+    task.add_done_callback(warmup_tasks.discard)
+
+@app.on_event("shutdown")
+async def close_ollama_pool():
+    await close_ollama()
+
+async def _hybrid_output(llm_result: dict, raw_text: str, started: float,
+                         telemetry: Optional[dict] = None) -> ParsedOutput:
+    validated_data = await ParserFallback.apply_fallbacks(
+        llm_result,
+        raw_text
+    )
+
+    # Telemetry comes from Ollama's response, never from the model's JSON
+    validated_data.pop("telemetry", None)
+    if errors := validate_parsed_output(validated_data):
+        logger.warning("Validation issues: %s", errors)
+
+    output = ParsedOutput(
+        **validated_data,
+        parse_strategy="hybrid",
+        confidence_score=0.9,
+        telemetry=telemetry or None
+    )
+    PARSE_REQUESTS.inc(strategy="hybrid")
+    PARSE_LATENCY.observe(time.perf_counter() - started, strategy="hybrid")
+    return output
+
+
+async def _fallback_output(raw_text: str, started: float) -> ParsedOutput:
+    fallback_data = await ParserFallback.full_fallback_parse(raw_text)
+    PARSE_REQUESTS.inc(strategy="fallback")
+    PARSE_LATENCY.observe(time.perf_counter() - started, strategy="fallback")
+    return ParsedOutput(
+        **fallback_data,
+        parse_strategy="fallback",
+        confidence_score=0.6
+    )
+
 
 @app.post("/parse", response_model=ParsedOutput)
 async def parse_travel_plan(data: ParserInput):
+    started = time.perf_counter()
+    telemetry = {}
     try:
         llm_result = await LLMParser.extract_structured_info(
             data.raw_text,
-            data.user_input
+            data.user_input,
+            telemetry
         )
+        return await _hybrid_output(llm_result, data.raw_text, started, telemetry)
 
-        validated_data = await ParserFallback.apply_fallbacks(
-            llm_result,
-            data.raw_text
-        )
+    except Exception as e:
+        logger.error("LLM parsing failed: %s", str(e), exc_info=True)
+        return await _fallback_output(data.raw_text, started)
 
-        if errors := validate_parsed_output(validated_data):
-            logger.warning("Validation issues: %s", errors)
 
-        return ParsedOutput(
-            **validated_data,
-            parse_strategy="hybrid",
-            confidence_score=0.9
-        )
+async def stream_parse_messages(data: ParserInput) -> AsyncIterator[dict]:
+    """
+    Messages of /parse/stream: {"entity": {"kind", "name"}} as soon as the
+    LLM has written a place name, then {"done": true, "parsed": ParsedOutput}
+    """
+    started = time.perf_counter()
+    scanner = EntityScanner()
+    chunks = []
+    telemetry = {}
+    try:
+        prompt = LLMParser.build_prompt(data.raw_text, data.user_input)
+        async for chunk in stream_ollama(prompt, system=LLMParser.SYSTEM_PROMPT, telemetry=telemetry):
+            chunks.append(chunk)
+            for entity in scanner.feed(chunk):
+                yield {"entity": entity}
+        output = await _hybrid_output(LLMParser.parse_output("".join(chunks)), data.raw_text, started, telemetry)
 
     except Exception as e:
-        logger.error("LLM parsing failed: %s", str(e), exc_info=True)
-        fallback_data = await ParserFallback.full_fallback_parse(data.raw_text)
-        return ParsedOutput(
-            **fallback_data,
-            parse_strategy="fallback",
-            confidence_score=0.6
-        )
\ No newline at end of file
+        logger.error("LLM stream parsing failed: %s", str(e), exc_info=True)
+        output = await _fallback_output(data.raw_text, started)
+
+    parsed = output.model_dump()
+    for entity in scanner.remaining(parsed):
+        yield {"entity": entity}
+    yield {"done": True, "parsed": parsed}
+
+
+@app.post("/parse/stream")
+async def parse_travel_plan_stream(data: ParserInput):
+    """NDJSON variant of /parse for pipelining parsing with geocoding"""
+    messages = stream_parse_messages(data)
+    return StreamingResponse((ndjson_line(message) async for message in messages), media_type=NDJSON)
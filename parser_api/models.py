@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Literal
+from typing import List, Dict, Optional, Literal, Union
 
 class ParserInput(BaseModel):
     raw_text: str
@@ -24,4 +24,5 @@ class ParsedOutput(BaseModel):
     roads: List[str]
     transport_segments: List[TransportSegment]
     parse_strategy: str = "hybrid"
-    confidence_score: float = 1.0
\ No newline at end of file
+    confidence_score: float = 1.0
+    telemetry: Optional[Dict[str, Union[int, float]]] = None  # Ollama token counts and timings of the LLM parse
\ No newline at end of file
@@ -2,33 +2,49 @@
 import httpx
 from fastapi import HTTPException
 import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional
 
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "llama3"
+from common.ollama import KEEP_ALIVE, NUM_CTX
+from common.ollama_client import OllamaStreamError, get_ollama
+from common.ollama_scheduler import QueueFull
+
+# Extraction is a much smaller job than itinerary writing; a lighter model can serve it
+MODEL_NAME = os.getenv("PARSER_OLLAMA_MODEL", "llama3")
 TIMEOUT = 60  # Shorter timeout for parsing
 
 logger = logging.getLogger(__name__)
 
 
-async def query_ollama(prompt: str) -> str:
-    """Optimized for structured parsing with strict output"""
+def _build_payload(prompt: str, system: Optional[str] = None) -> dict:
     payload = {
         "model": MODEL_NAME,
         "prompt": prompt,
-        "stream": False,
+        "keep_alive": KEEP_ALIVE,
         "options": {
             "temperature": 0.3,  # More deterministic output
-            "num_ctx": 2048,  # Smaller context sufficient
+            "num_ctx": NUM_CTX,  # Shared with llm_api; a different size would reload the model
             "format": "json"  # Hint for JSON output
         }
     }
+    if system:
+        # Identical on every request, so Ollama reuses its evaluated prefix instead of re-reading it
+        payload["system"] = system
+    return payload
+
+
+async def query_ollama(prompt: str, system: Optional[str] = None,
+                       telemetry: Optional[Dict[str, Any]] = None) -> str:
+    """Optimized for structured parsing with strict output; `telemetry` receives Ollama's timings"""
+    payload = _build_payload(prompt, system=system)
 
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            response = await client.post(OLLAMA_API_URL, json=payload)
-            response.raise_for_status()
-            return response.json()["response"]
+        # Short extractions run ahead of queued itinerary generations
+        result = await get_ollama().generate("parser_api", "parse", payload, TIMEOUT, telemetry)
+        return result["response"]
 
+    except QueueFull as e:
+        raise e.http_error()
     except httpx.HTTPStatusError as e:
         logger.error(f"Ollama parsing error: {e.response.text}")
         raise HTTPException(
@@ -40,4 +56,27 @@ async def query_ollama(prompt: str) -> str:
         raise HTTPException(
             status_code=503,
             detail="Parser service unavailable"
-        )
\ No newline at end of file
+        )
+
+
+async def stream_ollama(prompt: str, system: Optional[str] = None,
+                        telemetry: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Same request as query_ollama, yielding response fragments as Ollama produces them"""
+    try:
+        async for chunk in get_ollama().stream("parser_api", "parse", _build_payload(prompt, system=system), TIMEOUT, telemetry):
+            yield chunk
+    except QueueFull as e:
+        raise e.http_error()
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Ollama parsing error: {e.response.text}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Failed to parse travel plan: {e.response.text}"
+        )
+    except OllamaStreamError as e:
+        raise ValueError(f"Ollama stream error: {str(e)}")
+
+
+async def warm_up_model(system: Optional[str] = None) -> None:
+    """Load the model and evaluate the static instructions once at start-up"""
+    await get_ollama().warm_up("parser_api", MODEL_NAME, system)
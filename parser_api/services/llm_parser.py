@@ -1,5 +1,5 @@
 # parser_api/services/llm_parser.py
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ..ollama_client import query_ollama
 import json
 from ..utils import repair_json_structure
@@ -8,27 +8,27 @@ from ..utils import repair_json_structure
 class LLMParser:
     """Handles all LLM-based structured extraction with validation"""
 
-    @staticmethod
-    async def extract_structured_info(text: str, user_input: str) -> Dict[str, Any]:
-        prompt = f"""
+    # Static instructions, sent as Ollama's system prompt: the same bytes on every
+    # request, so they are evaluated once and served from Ollama's prompt cache
+    SYSTEM_PROMPT = """
 You are a structured data extraction engine.
 
 Your task is to analyze a block of natural language text describing a travel plan and extract the required fields into a strict JSON format.
 
 Do not explain. Do not comment. Return only a valid JSON object with the following structure:
 
-{{
+{
   "sequence": ["city1", "city2", ...],
   "cities": [
-    {{"name": "CityName", "priority": "mandatory" | "optional"}}
+    {"name": "CityName", "priority": "mandatory" | "optional"}
   ],
   "landmarks": ["Landmark 1", "Landmark 2", ...],
   "hotels": ["Hotel 1", "Hotel 2", ...],
   "roads": ["A2", "R66", "E40"...],
   "transport_segments": [
-    {{"from_city": "CityA", "to_city": "CityB", "mode": "transport mode" , "time": "number of hours", "notes": "optional text"}}
+    {"from_city": "CityA", "to_city": "CityB", "mode": "transport mode" , "time": "number of hours", "notes": "optional text"}
   ]
-}}
+}
 
 Field definitions:
 - "sequence": order of cities as mentioned in the trip.
@@ -40,8 +40,15 @@ Field definitions:
 - "roads": name of roads or highways.
 - "transport_segments": describe how the user moves between cities. "mode": "train" or "car" or "bus" or "flight" or "boat" or "ferry" or any other mode of transport
 
-Make sure to cross-check against the user input below for city priority tagging.
+Make sure to cross-check against the user input in each request for city priority tagging.
+
+Return only the JSON.
+"""
 
+    @staticmethod
+    def build_prompt(text: str, user_input: str) -> str:
+        """Per-request part of the extraction prompt; the instructions are SYSTEM_PROMPT"""
+        return f"""
 User input:
 \"\"\"
 {user_input}
@@ -55,17 +62,27 @@ Text to analyze:
 Return only the JSON.
 """
 
-        try:
-            # Get raw LLM response
-            llm_output = await query_ollama(prompt)
+    @staticmethod
+    def parse_output(llm_output: str) -> Dict[str, Any]:
+        """Repair and validate the JSON structure of a raw LLM response"""
+        parsed_data = repair_json_structure(llm_output)
+
+        if not parsed_data:
+            raise ValueError("LLM returned invalid JSON structure")
+
+        return parsed_data
 
-            # Repair and validate JSON structure
-            parsed_data = repair_json_structure(llm_output)
+    @staticmethod
+    async def extract_structured_info(text: str, user_input: str,
+                                      telemetry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        prompt = LLMParser.build_prompt(text, user_input)
+        llm_output = None
 
-            if not parsed_data:
-                raise ValueError("LLM returned invalid JSON structure")
+        try:
+            # Get raw LLM response
+            llm_output = await query_ollama(prompt, system=LLMParser.SYSTEM_PROMPT, telemetry=telemetry)
 
-            return parsed_data
+            return LLMParser.parse_output(llm_output)
 
         except Exception as e:
             # Log detailed error for debugging
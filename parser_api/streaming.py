@@ -0,0 +1,99 @@
+# parser_api/streaming.py
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Top-level keys of the extraction JSON (see LLMParser.SYSTEM_PROMPT)
+SECTIONS = ("sequence", "cities", "landmarks", "hotels", "roads", "transport_segments")
+WHITESPACE = " \t\r\n"
+
+# Section -> entity kind sent to geocoding; transport segments only repeat city names
+SECTION_KINDS = {"sequence": "city", "cities": "city", "landmarks": "landmark", "hotels": "hotel", "roads": "road"}
+
+
+def _unescape(raw: str) -> str:
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        return raw
+
+
+class EntityScanner:
+    """
+    Picks place names out of the parser LLM's JSON while it is still being
+    generated. Only fully written strings are reported, each (kind, name)
+    once, so geocoding can start on the first city long before the JSON is
+    complete.
+
+    A small incremental tokenizer: every chunk is read once, and only the
+    string being written when a chunk ends is carried over to the next one.
+    List sections report strings followed by "," or "]"; "cities" reports
+    the values of its "name" keys.
+    """
+
+    def __init__(self):
+        self.seen: Set[Tuple[str, str]] = set()
+        self.section: Optional[str] = None
+        self._in_string = False
+        self._escaped = False
+        self._raw: List[str] = []  # the string being written
+        self._last: Optional[str] = None  # completed string, until the next token says key or item
+        self._name_value = False  # right after a "name": key
+
+    def _new(self, kind: str, name: str, found: List[Dict[str, str]]) -> None:
+        name = name.strip()
+        key = (kind, name.lower())
+        if name and key not in self.seen:
+            self.seen.add(key)
+            found.append({"kind": kind, "name": name})
+
+    def _string_done(self, raw: str, found: List[Dict[str, str]]) -> None:
+        if self._name_value and self.section == "cities":
+            self._new("city", _unescape(raw), found)
+        self._name_value = False
+        self._last = raw
+
+    def _token(self, char: str, found: List[Dict[str, str]]) -> None:
+        last, self._last = self._last, None
+        self._name_value = False
+        if last is None:
+            return
+        if char == ":":
+            if last in SECTIONS:
+                self.section = last
+            self._name_value = last == "name"
+        elif char in ",]":
+            kind = SECTION_KINDS.get(self.section)
+            if kind is not None and self.section != "cities":
+                self._new(kind, _unescape(last), found)
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """Add generated text; returns entities completed since the last call"""
+        found: List[Dict[str, str]] = []
+        for char in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string_done("".join(self._raw), found)
+                    continue
+                self._raw.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._raw = []
+                self._last = None
+            elif char not in WHITESPACE:
+                self._token(char, found)
+        return found
+
+    def remaining(self, parsed: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Entities of the final parse (e.g. filled in by fallbacks) that were never streamed"""
+        found: List[Dict[str, str]] = []
+        for section, kind in SECTION_KINDS.items():
+            for item in parsed.get(section) or []:
+                name = item.get("name") if isinstance(item, dict) else item
+                if isinstance(name, str):
+                    self._new(kind, name, found)
+        return found
@@ -0,0 +1,119 @@
+# tests/test_admission.py
+import asyncio
+from unittest import mock
+
+import pytest
+
+from orchestrator import admission
+from orchestrator.admission import AdmissionController, ConcurrencyLimiter, Saturated, worker_share
+
+
+def test_queued_callers_get_slots_in_order():
+    async def scenario():
+        limiter = ConcurrencyLimiter("stage", 1)
+        order = []
+
+        async def run(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(run(n) for n in "abc"))
+        return order, limiter
+
+    order, limiter = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert limiter.active == 0 and limiter.waiting == 0
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        limiter = ConcurrencyLimiter("stage", 1, max_queue=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Saturated):
+            await limiter.acquire()
+        limiter.release()
+        await waiter
+        limiter.release()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 0
+    assert limiter.metrics["rejected"] == 1
+
+
+def test_queue_timeout_gives_no_slot_away():
+    async def scenario():
+        limiter = ConcurrencyLimiter("stage", 1, queue_timeout=0.01)
+        await limiter.acquire()
+        with pytest.raises(Saturated):
+            await limiter.acquire()
+        limiter.release()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 0 and limiter.waiting == 0
+    assert limiter.metrics["timed_out"] == 1
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_kept():
+    async def scenario():
+        limiter = ConcurrencyLimiter("stage", 1)
+        await limiter.acquire()
+
+        async def release_then_time_out(waiter, timeout):
+            # The holder releases, handing the slot to this waiter, right as the timeout fires
+            limiter.release()
+            raise asyncio.TimeoutError
+
+        with mock.patch.object(admission.asyncio, "wait_for", release_then_time_out):
+            await limiter.acquire()
+        assert limiter.active == 1
+        limiter.release()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 0
+    assert limiter.metrics["timed_out"] == 0
+    assert limiter.metrics["admitted"] == 2
+
+
+def test_cancelled_waiter_passes_a_handed_over_slot_on():
+    async def scenario():
+        limiter = ConcurrencyLimiter("stage", 1)
+        await limiter.acquire()
+
+        async def release_then_cancel(waiter, timeout):
+            # The holder hands the slot to this waiter just as it is cancelled
+            limiter.release()
+            raise asyncio.CancelledError
+
+        with mock.patch.object(admission.asyncio, "wait_for", release_then_cancel):
+            with pytest.raises(asyncio.CancelledError):
+                await limiter.acquire()
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.active == 0 and limiter.waiting == 0
+    assert limiter.has_capacity()
+
+
+def test_worker_share():
+    assert worker_share(64, 4) == 16
+    assert worker_share(2, 4) == 1
+    assert worker_share(5, 0) == 5
+
+
+def test_controller_enforces_its_share():
+    controller = AdmissionController(max_pipelines=8, stage_limits={"LLM_API": 4, "GEO_API": 2}, workers=2)
+    assert controller.max_pipelines == 4
+    assert controller.stage("LLM_API").limit == 2
+    assert controller.stage("GEO_API").limit == 1
+    for _ in range(4):
+        controller.admit()
+    with pytest.raises(Saturated):
+        controller.admit()
+    controller.finish(1.0)
+    controller.admit()
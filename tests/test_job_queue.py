@@ -0,0 +1,134 @@
+# tests/test_job_queue.py
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from orchestrator import worker
+from orchestrator.job_queue import JobQueue, LeaseLost
+from orchestrator.worker import JobWorker
+
+LEASE = 0.2
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.db"), lease_seconds=LEASE, max_attempts=3, retry_delay=0)
+    yield queue
+    queue.close()
+
+
+def test_expired_lease_is_taken_over_with_its_checkpoint(queue):
+    queue.enqueue("j1", {"user_input": "Rome"})
+    first = queue.lease("a")
+    assert first["id"] == "j1" and first["attempts"] == 1
+    queue.checkpoint("j1", "a", "llm", {"travel_plan": "Day 1"})
+    assert queue.lease("b") is None
+
+    time.sleep(LEASE + 0.05)
+    second = queue.lease("b")
+    assert second["id"] == "j1"
+    assert second["attempts"] == 2
+    assert second["stage"] == "llm"
+    assert second["checkpoint"] == {"travel_plan": "Day 1"}
+
+    # The old owner finds out on its next heartbeat and can no longer finish the job
+    with pytest.raises(LeaseLost):
+        queue.heartbeat("j1", "a")
+    with pytest.raises(LeaseLost):
+        queue.checkpoint("j1", "a", "parser", {})
+    assert not queue.complete("j1", "a", {"map_id": "stale"})
+
+    assert queue.complete("j1", "b", {"map_id": "m1"})
+    status = queue.status("j1")
+    assert status["status"] == "completed"
+    assert status["result"] == {"map_id": "m1"}
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    queue.enqueue("j1", {})
+    queue.lease("a")
+    for _ in range(3):
+        time.sleep(LEASE / 2)
+        queue.heartbeat("j1", "a")
+    assert queue.lease("b") is None
+
+
+def test_lease_expiring_on_the_last_attempt_fails_the_job(queue):
+    queue.enqueue("j1", {})
+    for attempt in range(3):
+        assert queue.lease(f"w{attempt}")["attempts"] == attempt + 1
+        time.sleep(LEASE + 0.05)
+    assert queue.lease("w3") is None
+    status = queue.status("j1")
+    assert status["status"] == "error"
+    assert "Lease expired" in status["error"]
+
+
+def test_released_job_does_not_use_up_an_attempt(queue):
+    queue.enqueue("j1", {})
+    queue.lease("a")
+    queue.release("j1", "a")
+    assert queue.lease("b")["attempts"] == 1
+
+
+def test_failed_attempts_are_retried_until_the_limit(queue):
+    queue.enqueue("j1", {})
+    for attempt in range(3):
+        queue.lease("a")
+        assert queue.fail("j1", "a", f"boom {attempt}")
+    assert queue.lease("a") is None
+    assert queue.status("j1")["status"] == "error"
+
+
+def test_worker_survives_transient_heartbeat_errors(queue, monkeypatch):
+    heartbeat = queue.heartbeat
+    calls = []
+
+    def flaky_heartbeat(job_id, owner):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        heartbeat(job_id, owner)
+
+    monkeypatch.setattr(queue, "heartbeat", flaky_heartbeat)
+
+    async def handler(job, checkpoint):
+        await asyncio.sleep(LEASE)
+        return {"map_id": "m1"}
+
+    async def scenario():
+        queue.enqueue("j1", {})
+        job_worker = JobWorker(queue, handler)
+        await job_worker._run_job(queue.lease(job_worker.owner))
+
+    asyncio.run(scenario())
+    assert len(calls) >= 2
+    assert queue.status("j1")["status"] == "completed"
+
+
+async def _beat_now(self, job_id):
+    # Heartbeat right away instead of after a third of the lease
+    await asyncio.to_thread(self.queue.heartbeat, job_id, self.owner)
+
+
+def test_worker_leaves_a_lost_job_to_its_new_owner(queue, monkeypatch):
+    monkeypatch.setattr(worker.JobWorker, "_heartbeat", _beat_now)
+
+    async def handler(job, checkpoint):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        queue.enqueue("j1", {})
+        job_worker = JobWorker(queue, handler)
+        job = queue.lease(job_worker.owner)
+        time.sleep(LEASE + 0.05)
+        assert queue.lease("other")["id"] == "j1"
+        await asyncio.wait_for(job_worker._run_job(job), 5)
+
+    asyncio.run(scenario())
+    status = queue.status("j1")
+    # Neither completed nor failed by the old owner; still running under "other"
+    assert status["status"] == "processing"
+    assert status["attempts"] == 2
@@ -0,0 +1,114 @@
+# tests/test_ollama_scheduler.py
+import asyncio
+import sqlite3
+
+import pytest
+
+from common import ollama_scheduler
+from common.ollama_scheduler import LocalScheduler, QueueFull, SQLiteScheduler
+
+
+async def _run_order(first, second):
+    """One long generation holds the only slot while generations, then parses, queue up"""
+    order = []
+
+    async def job(scheduler, priority, name, seconds):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(seconds)
+
+    tasks = [asyncio.create_task(job(first, "generate", "g0", 0.2))]
+    await asyncio.sleep(0.05)
+    for i in range(2):
+        tasks.append(asyncio.create_task(job(first, "generate", f"g{i + 1}", 0.02)))
+        await asyncio.sleep(0.01)
+    for i in range(2):
+        tasks.append(asyncio.create_task(job(second, "parse", f"p{i + 1}", 0.02)))
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_local_parses_overtake_generations():
+    scheduler = LocalScheduler(capacity=1)
+    assert asyncio.run(_run_order(scheduler, scheduler)) == ["g0", "p1", "p2", "g1", "g2"]
+
+
+def test_sqlite_orders_across_processes(tmp_path):
+    path = str(tmp_path / "scheduler.db")
+    # Two schedulers on one file stand in for llm_api and parser_api
+    order = asyncio.run(_run_order(SQLiteScheduler(path, capacity=1), SQLiteScheduler(path, capacity=1)))
+    assert order == ["g0", "p1", "p2", "g1", "g2"]
+
+
+@pytest.mark.parametrize("make", [
+    lambda tmp_path: LocalScheduler(capacity=1, max_queue=1, timeout=0.1),
+    lambda tmp_path: SQLiteScheduler(str(tmp_path / "scheduler.db"), capacity=1, max_queue=1, timeout=0.1),
+])
+def test_queue_full_and_timeout(tmp_path, make):
+    scheduler = make(tmp_path)
+
+    async def attempt():
+        try:
+            async with scheduler.slot("parse"):
+                return "ok"
+        except QueueFull as e:
+            return e.reason
+
+    async def scenario():
+        async with scheduler.slot("generate"):
+            return sorted(await asyncio.gather(attempt(), attempt()))
+
+    assert asyncio.run(scenario()) == ["queue_full", "timeout"]
+    # Nothing is left behind: the slot is free again
+    assert asyncio.run(attempt()) == "ok"
+
+
+def test_scale_grants_new_capacity_to_waiters():
+    scheduler = LocalScheduler(capacity=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("generate"):
+                await release.wait()
+
+        first = asyncio.create_task(hold())
+        second = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        assert scheduler._running == 1
+        scheduler.scale(2)
+        await asyncio.sleep(0.01)
+        running = scheduler._running
+        release.set()
+        await asyncio.gather(first, second)
+        return running
+
+    assert asyncio.run(scenario()) == 2
+    assert scheduler.capacity == 2
+    scheduler.scale(0)
+    assert scheduler.capacity == 1
+
+
+def test_heartbeat_survives_a_failed_renewal(tmp_path, monkeypatch):
+    monkeypatch.setattr(ollama_scheduler, "SLOT_LEASE", 0.03)
+    scheduler = SQLiteScheduler(str(tmp_path / "scheduler.db"))
+    renewals = []
+
+    def renew(ticket):
+        renewals.append(ticket)
+        if len(renewals) == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(scheduler, "_renew", renew)
+
+    async def scenario():
+        heartbeat = asyncio.create_task(scheduler._heartbeat("t1"))
+        await asyncio.sleep(0.1)
+        alive = not heartbeat.done()
+        heartbeat.cancel()
+        return alive
+
+    assert asyncio.run(scenario())
+    assert len(renewals) >= 2
@@ -0,0 +1,69 @@
+# tests/test_similarity.py
+import pytest
+
+from llm_api.similarity import SimilarIdeaIndex, idea_tokens
+
+NAMESPACE = "llama3|0.7|500"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SimilarIdeaIndex(threshold=0.9, max_entries=100, path=str(tmp_path / "index.json"), enabled=True)
+
+
+def test_reordered_idea_matches(index):
+    index.add("5 days Rome and Florence by train", NAMESPACE, "plan")
+    text, idea, score = index.lookup("Rome + Florence, 5 days, train", NAMESPACE)
+    assert (text, idea, score) == ("plan", "5 days Rome and Florence by train", 1.0)
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("Rome to Florence", "Florence to Rome"),
+    ("from Rome to Florence", "from Florence to Rome"),
+    ("to Florence from Rome", "Florence to Rome"),
+    ("10 days museums food and wine from Rome to Florence by train",
+     "10 days museums food and wine from Florence to Rome by train"),
+])
+def test_reversed_route_never_matches(stored, query):
+    # Even a threshold that accepts anything in the same LSH bucket must not return the reverse trip
+    index = SimilarIdeaIndex(threshold=0.0, path="", enabled=True)
+    index.add(stored, NAMESPACE, "plan")
+    assert index.lookup(query, NAMESPACE) is None
+
+
+def test_route_phrasings_are_equivalent():
+    assert idea_tokens("Rome to Florence") == idea_tokens("from Rome to Florence") == idea_tokens("to Florence from Rome")
+
+
+def test_from_without_a_destination_is_no_route():
+    assert not any(">" in token for token in idea_tokens("food and wine from Rome"))
+
+
+def test_numbers_must_match(index):
+    index.add("5 days in Lisbon", NAMESPACE, "plan")
+    assert index.lookup("7 days in Lisbon", NAMESPACE) is None
+
+
+def test_namespaces_are_separate(index):
+    index.add("Rome to Florence", NAMESPACE, "plan")
+    assert index.lookup("Rome to Florence", "mistral|0.7|500") is None
+
+
+def test_lru_eviction():
+    index = SimilarIdeaIndex(threshold=0.9, max_entries=2, path="", enabled=True)
+    index.add("Rome", NAMESPACE, "a")
+    index.add("Paris", NAMESPACE, "b")
+    index.lookup("Rome", NAMESPACE)
+    index.add("Berlin", NAMESPACE, "c")
+    assert len(index) == 2
+    assert index.lookup("Paris", NAMESPACE) is None
+    assert index.lookup("Rome", NAMESPACE)[0] == "a"
+
+
+def test_snapshot_round_trip(index):
+    index.add("Rome to Florence", NAMESPACE, "plan")
+    index.save()
+    restored = SimilarIdeaIndex(threshold=0.9, path=index.path, enabled=True)
+    restored.load()
+    assert restored.lookup("from Rome to Florence", NAMESPACE)[0] == "plan"
+    assert restored.lookup("Florence to Rome", NAMESPACE) is None
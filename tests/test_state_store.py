@@ -0,0 +1,213 @@
+# tests/test_state_store.py
+import threading
+import time
+
+import pytest
+
+from orchestrator.state_store import BatchedStateStore, RedisStateStore, SQLiteStateStore
+
+# Flushes are driven by the tests, never by the background interval
+NO_AUTO_FLUSH = 3600
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for RedisStateStore: hashes, EXPIRE and non-transactional pipelines"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.expires = {}
+        self.closed = False
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.hashes.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.hashes
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.expires.pop(key, None)
+
+    def hset(self, key, mapping):
+        self._alive(key)
+        self.hashes.setdefault(key, {}).update({k.encode(): v for k, v in mapping.items()})
+
+    def expire(self, key, seconds):
+        if key in self.hashes:
+            self.expires[key] = time.time() + seconds
+
+    def hgetall(self, key):
+        return dict(self.hashes[key]) if self._alive(key) else {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def close(self):
+        self.closed = True
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        for name, args, kwargs in self.commands:
+            getattr(self.client, name)(*args, **kwargs)
+        self.commands = []
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval", NO_AUTO_FLUSH)
+        if request.param == "sqlite":
+            store = SQLiteStateStore(path=str(tmp_path / "state.db"), **kwargs)
+        else:
+            store = RedisStateStore(client=kwargs.pop("client", None) or FakeRedis(), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_put_update_get_before_and_after_flush(make_store):
+    store = make_store()
+    store.put("r1", {"status": "processing", "stage": "llm"})
+    store.update("r1", {"stage": "parser"})
+    assert store.get("r1") == {"status": "processing", "stage": "parser"}
+
+    store.flush()
+    assert store.get("r1") == {"status": "processing", "stage": "parser"}
+
+    store.update("r1", {"stage": "geo"})
+    assert store.get("r1") == {"status": "processing", "stage": "geo"}
+    store.flush()
+    assert store.get("r1") == {"status": "processing", "stage": "geo"}
+    assert store.stats()["pending_writes"] == 0
+
+
+def test_put_replaces_stored_entry(make_store):
+    store = make_store()
+    store.put("r1", {"status": "processing", "stage": "llm"})
+    store.flush()
+    store.put("r1", {"status": "queued"})
+    assert store.get("r1") == {"status": "queued"}
+    store.flush()
+    assert store.get("r1") == {"status": "queued"}
+
+
+def test_result_round_trip(make_store):
+    store = make_store()
+    result = {"map_id": "abc", "locations": [{"name": "Rome", "lat": 41.9, "lon": 12.5}]}
+    store.put("r1", {"status": "processing"})
+    store.flush()
+    store.update("r1", {"status": "completed", "result": result})
+    store.flush()
+    assert store.get("r1") == {"status": "completed", "result": result}
+
+
+def test_update_of_unknown_request_creates_it(make_store):
+    store = make_store()
+    store.update("r1", {"status": "error"})
+    store.flush()
+    assert store.get("r1") == {"status": "error"}
+    assert store.get("missing") is None
+
+
+def test_finished_entries_expire(make_store):
+    store = make_store(ttl=1, inflight_ttl=60)
+    store.put("done", {"status": "completed"})
+    store.put("running", {"status": "processing"})
+    store.flush()
+    assert store.get("done") == {"status": "completed"}
+    time.sleep(1.1)
+    assert store.get("done") is None
+    assert store.get("running") == {"status": "processing"}
+
+
+def test_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    writer = SQLiteStateStore(path=path, flush_interval=NO_AUTO_FLUSH)
+    reader = SQLiteStateStore(path=path, flush_interval=NO_AUTO_FLUSH)
+    try:
+        writer.put("r1", {"status": "processing"})
+        assert reader.get("r1") is None
+        writer.flush()
+        assert reader.get("r1") == {"status": "processing"}
+    finally:
+        writer.close()
+        reader.close()
+
+
+class SlowStore(BatchedStateStore):
+    """In-memory backend whose writes block until the test lets them commit"""
+
+    def __init__(self, **kwargs):
+        self.rows = {}
+        self.writing = threading.Event()
+        self.commit = threading.Event()
+        self.fail = False
+        super().__init__(flush_interval=NO_AUTO_FLUSH, **kwargs)
+
+    def _write_batch(self, writes):
+        self.writing.set()
+        self.commit.wait(5)
+        if self.fail:
+            raise RuntimeError("backend down")
+        for request_id, replace, fields in writes:
+            self.rows[request_id] = {**({} if replace else self.rows.get(request_id, {})), **fields}
+
+    def _read(self, request_id):
+        row = self.rows.get(request_id)
+        return dict(row) if row is not None else None
+
+
+def _flush_in_background(store):
+    thread = threading.Thread(target=store.flush)
+    thread.start()
+    assert store.writing.wait(5)
+    return thread
+
+
+def test_writes_stay_visible_while_flushing():
+    store = SlowStore()
+    try:
+        store.put("r1", {"status": "processing", "stage": "llm"})
+        thread = _flush_in_background(store)
+        # Taken off the pending queue but not committed yet
+        assert store.get("r1") == {"status": "processing", "stage": "llm"}
+        store.update("r1", {"stage": "parser"})
+        assert store.get("r1") == {"status": "processing", "stage": "parser"}
+        store.commit.set()
+        thread.join(5)
+        # The same flush picks up the update in its next batch
+        assert store.rows["r1"] == {"status": "processing", "stage": "parser"}
+        assert store.stats()["pending_writes"] == 0
+    finally:
+        store.close()
+
+
+def test_failed_flush_keeps_writes_and_newer_updates():
+    store = SlowStore()
+    try:
+        store.put("r1", {"status": "processing", "stage": "llm"})
+        store.fail = True
+        thread = _flush_in_background(store)
+        store.update("r1", {"stage": "parser"})
+        store.commit.set()
+        thread.join(5)
+        assert store.counters["flush_errors"] == 1
+        assert store.get("r1") == {"status": "processing", "stage": "parser"}
+        store.fail = False
+        store.flush()
+        assert store.rows["r1"] == {"status": "processing", "stage": "parser"}
+    finally:
+        store.close()